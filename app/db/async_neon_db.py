@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from psycopg import AsyncConnection, pq
+from psycopg_pool import AsyncConnectionPool
+from db.backend import database_url
+from db.query_stats import registrar
+
+load_dotenv()  # garante que o .env seja carregado
+
+_pool: AsyncConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+_CHECK_INTERVAL = float(os.getenv("DB_POOL_CHECK_INTERVAL", "30"))
+
+
+class _ConexaoAsync(AsyncConnection):
+    """Conexão assíncrona que registra quando voltou ao pool"""
+    devolvida_em: float = 0.0
+
+
+async def _configurar_conexao(conn: _ConexaoAsync) -> None:
+    conn.devolvida_em = time.monotonic()
+
+
+async def _checar_conexao(conn: _ConexaoAsync) -> None:
+    """Health check no checkout; só faz round trip se a conexão ficou ociosa"""
+    if time.monotonic() - conn.devolvida_em >= _CHECK_INTERVAL:
+        await AsyncConnectionPool.check_connection(conn)
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Retorna o pool assíncrono do processo, abrindo-o na primeira chamada"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                db_url = database_url()
+                pool = AsyncConnectionPool(
+                    db_url,
+                    connection_class=_ConexaoAsync,
+                    min_size=int(os.getenv("DB_ASYNC_POOL_MIN", os.getenv("DB_POOL_MIN", "1"))),
+                    max_size=int(os.getenv("DB_ASYNC_POOL_MAX", os.getenv("DB_POOL_MAX", "10"))),
+                    max_idle=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                    configure=_configurar_conexao,
+                    check=_checar_conexao,
+                    open=False,
+                )
+                await pool.open()
+                _pool = pool
+    return _pool
+
+
+async def fechar_async_pool() -> None:
+    """Fecha o pool assíncrono (usado no shutdown da aplicação)"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+def async_pool_stats() -> dict:
+    """Estatísticas do pool assíncrono (vazio se ainda não foi aberto)"""
+    if _pool is None:
+        return {}
+    return _pool.get_stats()
+
+
+class AsyncNeonDB:
+    """Contraparte assíncrona do NeonDB, com a mesma interface de consulta.
+
+    Uso: `async with AsyncNeonDB() as db: row = await db.fetchone(...)`
+    """
+
+    def __init__(self):
+        self._pool = None
+        self.conn = None
+        self.cursor = None
+
+    async def __aenter__(self):
+        self._pool = await get_async_pool()
+        self.conn = await self._pool.getconn()
+        self.cursor = self.conn.cursor()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
+
+    async def close(self):
+        try: await self.cursor.close()
+        except: pass
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+        # mesma semântica do NeonDB: o que não foi commitado é descartado
+        try:
+            if conn.info.transaction_status != pq.TransactionStatus.IDLE:
+                await conn.rollback()
+        except: pass
+        conn.devolvida_em = time.monotonic()
+        await self._pool.putconn(conn)
+
+    # mesmas medições do NeonDB (db.query_stats)
+    async def query(self, sql: str, params: list | None = None) -> list[tuple]:
+        inicio = time.perf_counter()
+        await self.cursor.execute(sql, params)
+        rows = await self.cursor.fetchall()
+        registrar(sql, time.perf_counter() - inicio, len(rows))
+        return rows
+
+    async def fetchone(self, sql: str, params: list | None = None) -> tuple:
+        inicio = time.perf_counter()
+        await self.cursor.execute(sql, params)
+        row = await self.cursor.fetchone()
+        registrar(sql, time.perf_counter() - inicio, 1 if row is not None else 0)
+        return row
+
+    async def execute(self, sql: str, params: list | None = None) -> None:
+        inicio = time.perf_counter()
+        await self.cursor.execute(sql, params)
+        registrar(sql, time.perf_counter() - inicio, max(self.cursor.rowcount, 0))
+
+    async def fetchall(self, sql: str, params: list | None = None) -> list[tuple]:
+        return await self.query(sql, params)
+
+    async def commit(self):
+        await self.conn.commit()
+
+
+async def get_async_db():
+    async with AsyncNeonDB() as db:
+        yield db
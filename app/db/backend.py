@@ -0,0 +1,46 @@
+"""Escolha do banco usado pela aplicação (DB_BACKEND no .env).
+
+neon (padrão): conecta em DATABASE_URL.
+local: sobe um Postgres embutido (pacote `pgserver`) em DB_LOCAL_DIR, sem rede e
+sem conta no Neon. É o mesmo Postgres, então SQL, índices, partições e EXPLAIN
+se comportam como na nuvem; use com `python -m db.seed` para benchmarks e testes.
+"""
+import os
+import pathlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKENDS = ("neon", "local")
+DB_BACKEND = os.getenv("DB_BACKEND", "neon").lower()
+_PASTA_LOCAL = os.getenv("DB_LOCAL_DIR", str(pathlib.Path(__file__).resolve().parents[2] / ".pgdata"))
+
+_servidor = None
+_lock = threading.Lock()
+
+
+def _url_local() -> str:
+    global _servidor
+    with _lock:
+        if _servidor is None:
+            try:
+                import pgserver
+            except ImportError:
+                raise ValueError("DB_BACKEND=local precisa do pacote pgserver (pip install pgserver)")
+            # o servidor é compartilhado entre processos e para quando o último sai
+            _servidor = pgserver.get_server(_PASTA_LOCAL)
+            print(f"[DB] Postgres local em {_PASTA_LOCAL}")
+        return _servidor.get_uri()
+
+
+def database_url() -> str:
+    """URL de conexão do backend configurado"""
+    if DB_BACKEND not in BACKENDS:
+        raise ValueError(f"DB_BACKEND inválido: {DB_BACKEND} (use {' ou '.join(BACKENDS)})")
+    if DB_BACKEND == "local":
+        return _url_local()
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        raise ValueError("DATABASE_URL não está definido no .env")
+    return db_url
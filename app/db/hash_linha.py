@@ -0,0 +1,69 @@
+"""Hash de conteúdo das linhas de estoque/faturamento, para reingestão idempotente.
+
+`hash_linha` é o md5 de todas as colunas de dados da linha (a forma texto do ROW,
+nas colunas e na ordem de COLUNAS_HASH — a única fonte usada pela migração, pelo
+seed e pelo upload de CSV, então o valor é o mesmo nos três). O
+índice único (data, hash_linha) — `data` entra por causa do particionamento —
+permite gravar com `INSERT ... ON CONFLICT DO NOTHING` e pular as linhas que já
+estão no banco. Linhas antigas repetidas ficam com hash NULL e não são apagadas.
+"""
+COLUNA = "hash_linha"
+
+# colunas (e ordem) que entram no hash; mudar a ordem muda o hash de toda linha nova e
+# as já gravadas deixam de ser reconhecidas como repetidas
+COLUNAS_HASH: dict[str, list[str]] = {
+    "estoque": ["data", "cod_cliente", "es_centro", "tipo_material", "origem", "cod_produto", "lote",
+                "dias_em_estoque", "produto", "grupo_mercadoria", "es_totalestoque", "sku"],
+    "faturamento": ["data", "cod_cliente", "lote", "origem", "zs_gr_mercad", "produto", "cod_produto",
+                    "zs_centro", "zs_cidade", "zs_uf", "zs_peso_liquido", "giro_sku_cliente", "sku"],
+}
+
+
+def nome_indice(tabela: str) -> str:
+    return f"idx_{tabela}_hash_linha"
+
+
+def expressao_hash(tabela: str) -> str:
+    """SQL que calcula o hash da linha a partir das COLUNAS_HASH da tabela"""
+    return f"md5(ROW({', '.join(COLUNAS_HASH[tabela])})::text)::uuid"
+
+
+def tem_hash_linha(cursor, tabela: str) -> bool:
+    """O índice único existe (migração 4 aplicada)?"""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [nome_indice(tabela)])
+    return cursor.fetchone()[0]
+
+
+def preencher_hash_linha(cursor, tabela: str, lote: int = 50000) -> tuple[int, int]:
+    """Calcula o hash das linhas sem hash, em faixas de id; retorna (preenchidas, repetidas).
+
+    Só a primeira ocorrência (menor id) de cada conteúdo recebe o hash; as
+    repetidas continuam NULL para não violar o índice único. Com o cursor em
+    autocommit cada faixa é uma transação.
+    """
+    cursor.execute(f"SELECT MIN(id), MAX(id) FROM {tabela} WHERE {COLUNA} IS NULL")
+    id_min, id_max = cursor.fetchone()
+    if id_min is None:
+        return 0, 0
+    preenchidas = 0
+    for inicio in range(id_min, id_max + 1, lote):
+        fim = inicio + lote - 1
+        cursor.execute(
+            f"""
+            UPDATE {tabela} AS t SET {COLUNA} = n.h
+            FROM (
+                SELECT DISTINCT ON (s.data, s.h) s.id, s.h
+                FROM (SELECT id, data, {expressao_hash(tabela)} AS h FROM {tabela}
+                      WHERE {COLUNA} IS NULL AND id BETWEEN %s AND %s) s
+                WHERE NOT EXISTS (SELECT 1 FROM {tabela} e WHERE e.data = s.data AND e.{COLUNA} = s.h)
+                ORDER BY s.data, s.h, s.id
+            ) n
+            WHERE t.id = n.id AND t.id BETWEEN %s AND %s
+            """,
+            [inicio, fim, inicio, fim],
+        )
+        preenchidas += cursor.rowcount
+    cursor.execute(f"SELECT COUNT(*) FROM {tabela} WHERE {COLUNA} IS NULL AND id <= %s", [id_max])
+    repetidas = cursor.fetchone()[0]
+    print(f"[HASH] {tabela}: {preenchidas} linhas com hash, {repetidas} repetidas mantidas sem hash")
+    return preenchidas, repetidas
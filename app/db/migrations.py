@@ -0,0 +1,309 @@
+"""Migrações versionadas do banco (índices das consultas quentes).
+
+Cada migração tem uma versão, uma descrição e uma lista de passos (SQL ou
+funções que recebem o cursor). As versões aplicadas ficam em
+`schema_migrations`; rodar de novo não faz nada. Os índices são criados com
+CONCURRENTLY para não travar escrita em estoque/faturamento durante o deploy.
+
+Uso (a partir da pasta app/):
+    python -m db.migrations            # aplica as pendentes
+    python -m db.migrations --status   # lista aplicadas/pendentes
+    python -m db.migrations --check    # EXPLAIN das consultas quentes
+"""
+import argparse
+import json
+import sys
+from typing import Callable, NamedTuple
+
+from db.hash_linha import COLUNA as COLUNA_HASH, nome_indice as indice_hash, preencher_hash_linha
+from db.pool import get_pool
+from db.rollups import reconstruir as reconstruir_rollup
+
+# chave do advisory lock: impede dois workers migrando ao mesmo tempo
+_LOCK_MIGRACOES = 73112025
+
+
+class Migracao(NamedTuple):
+    versao: int
+    descricao: str
+    passos: list  # str (SQL) ou Callable[[cursor], None]
+    # opcional: se falhar (ex.: extensão indisponível) é pulada e tentada de novo na próxima execução
+    opcional: bool = False
+
+
+def _indices_com_prefixo(cursor, tabela: str, colunas: list[str]) -> list[str]:
+    """Índices válidos já existentes que começam pelas mesmas colunas (ex.: UNIQUE em email)"""
+    cursor.execute(
+        """
+        SELECT c.relname,
+               ARRAY(SELECT a.attname FROM unnest(i.indkey) WITH ORDINALITY AS k(attnum, pos)
+                     JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                     ORDER BY k.pos)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass AND i.indisvalid AND i.indexprs IS NULL
+        """,
+        [tabela],
+    )
+    return sorted(nome for nome, colunas_indice in cursor.fetchall() if list(colunas_indice[:len(colunas)]) == colunas)
+
+
+def _indice(nome: str, tabela: str, definicao: str, metodo: str = "btree", unico: bool = False) -> Callable:
+    """Passo que cria o índice com CONCURRENTLY, removendo antes uma tentativa inválida"""
+    # colunas simples: dá para reaproveitar um índice equivalente já existente (mas não no lugar de um UNIQUE)
+    simples = metodo == "btree" and "(" not in definicao and not unico
+    colunas = [c.strip() for c in definicao.split(",")] if simples else None
+
+    def passo(cursor):
+        if colunas:
+            cobertos = _indices_com_prefixo(cursor, tabela, colunas)
+            if cobertos:
+                if nome not in cobertos:
+                    print(f"[MIGRAÇÃO] {nome} dispensado: {tabela} já tem o índice {cobertos[0]}")
+                return
+        cursor.execute(
+            """
+            SELECT i.indisvalid
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s
+            """,
+            [nome],
+        )
+        existente = cursor.fetchone()
+        if existente and existente[0]:
+            return
+        if existente:
+            # CREATE INDEX CONCURRENTLY interrompido deixa um índice inválido com o mesmo nome
+            print(f"[MIGRAÇÃO] Removendo índice inválido {nome}")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+        print(f"[MIGRAÇÃO] Criando índice {nome} em {tabela}")
+        # tabela particionada (db.particionamento) não aceita CONCURRENTLY; o índice
+        # é criado no pai e propagado para as partições
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [tabela])
+        concorrente = "" if cursor.fetchone()[0] else "CONCURRENTLY "
+        tipo = "UNIQUE INDEX" if unico else "INDEX"
+        cursor.execute(f"CREATE {tipo} {concorrente}IF NOT EXISTS {nome} ON {tabela} USING {metodo} ({definicao})")
+    passo.__name__ = f"indice_{nome}"
+    passo.indice, passo.tabela, passo.colunas = nome, tabela, colunas
+    return passo
+
+
+def _indices_aceitos(cursor, indice: str) -> set[str]:
+    """O índice da migração ou qualquer outro que comece pelas mesmas colunas.
+
+    Ex.: o índice único (data, hash_linha) da migração 4 atende os filtros por
+    data tão bem quanto idx_*_data, e o planner pode escolher qualquer um dos dois.
+    """
+    aceitos = {indice}
+    for migracao in MIGRACOES:
+        for passo in migracao.passos:
+            if getattr(passo, "indice", None) == indice and passo.colunas:
+                aceitos.update(_indices_com_prefixo(cursor, passo.tabela, passo.colunas))
+    # em tabela particionada o plano cita os índices de cada partição, filhos do índice do pai
+    cursor.execute(
+        """
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = ANY(ARRAY(SELECT to_regclass(n) FROM unnest(%s::text[]) AS n))
+        """,
+        [list(aceitos)],
+    )
+    aceitos.update(row[0] for row in cursor.fetchall())
+    return aceitos
+
+
+MIGRACOES: list[Migracao] = [
+    Migracao(1, "índices de data em estoque e faturamento", [
+        _indice("idx_estoque_data", "estoque", "data"),
+        _indice("idx_faturamento_data", "faturamento", "data"),
+    ]),
+    Migracao(2, "índices de mensagem por usuário e usuário por email", [
+        _indice("idx_mensagem_usuario_envio", "mensagem", "id_usuario, envio"),
+        _indice("idx_usuario_email", "usuario", "email"),
+    ]),
+    Migracao(3, "índices trigram para LIKE em produto e SKU", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        _indice("idx_estoque_produto_trgm", "estoque", "LOWER(produto) gin_trgm_ops", "gin"),
+        _indice("idx_faturamento_produto_trgm", "faturamento", "LOWER(produto) gin_trgm_ops", "gin"),
+        _indice("idx_estoque_sku_trgm", "estoque", "UPPER(sku) gin_trgm_ops", "gin"),
+        _indice("idx_faturamento_sku_trgm", "faturamento", "UPPER(sku) gin_trgm_ops", "gin"),
+    ], opcional=True),
+    Migracao(4, "hash de conteúdo das linhas para reingestão idempotente de CSV", [
+        f"ALTER TABLE estoque ADD COLUMN IF NOT EXISTS {COLUNA_HASH} UUID",
+        f"ALTER TABLE faturamento ADD COLUMN IF NOT EXISTS {COLUNA_HASH} UUID",
+        # `data` na chave: índice único de tabela particionada precisa da coluna de partição
+        _indice(indice_hash("estoque"), "estoque", f"data, {COLUNA_HASH}", unico=True),
+        _indice(indice_hash("faturamento"), "faturamento", f"data, {COLUNA_HASH}", unico=True),
+        lambda cursor: preencher_hash_linha(cursor, "estoque"),
+        lambda cursor: preencher_hash_linha(cursor, "faturamento"),
+    ]),
+    Migracao(5, "rollups de estoque por semana e faturamento por mês mantidos por gatilho", [
+        lambda cursor: reconstruir_rollup(cursor, "estoque"),
+        lambda cursor: reconstruir_rollup(cursor, "faturamento"),
+    ]),
+]
+
+
+def _garantir_tabela(cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def _versoes_aplicadas(cursor) -> set[int]:
+    cursor.execute("SELECT versao FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def aplicar_migracoes() -> list[int]:
+    """Aplica as migrações pendentes em ordem e retorna as versões aplicadas agora"""
+    pool = get_pool()
+    conn = pool.getconn()
+    aplicadas_agora = []
+    try:
+        # CONCURRENTLY não roda dentro de transação
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_lock(%s)", [_LOCK_MIGRACOES])
+        try:
+            _garantir_tabela(cursor)
+            aplicadas = _versoes_aplicadas(cursor)
+            for migracao in sorted(MIGRACOES, key=lambda m: m.versao):
+                if migracao.versao in aplicadas:
+                    continue
+                print(f"[MIGRAÇÃO] {migracao.versao}: {migracao.descricao}")
+                try:
+                    for passo in migracao.passos:
+                        if callable(passo):
+                            passo(cursor)
+                        else:
+                            cursor.execute(passo)
+                except Exception as e:
+                    if not migracao.opcional:
+                        raise
+                    print(f"⚠️ Migração opcional {migracao.versao} pulada: {e}")
+                    continue
+                cursor.execute(
+                    "INSERT INTO schema_migrations (versao, descricao) VALUES (%s, %s) ON CONFLICT (versao) DO NOTHING",
+                    [migracao.versao, migracao.descricao],
+                )
+                aplicadas_agora.append(migracao.versao)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [_LOCK_MIGRACOES])
+            cursor.close()
+    finally:
+        pool.putconn(conn)
+
+    if aplicadas_agora:
+        print(f"✅ Migrações aplicadas: {aplicadas_agora}")
+    else:
+        print("✅ Banco já está na última versão")
+    return aplicadas_agora
+
+
+def status_migracoes() -> list[dict]:
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        _garantir_tabela(cursor)
+        conn.commit()
+        aplicadas = _versoes_aplicadas(cursor)
+        cursor.close()
+    finally:
+        pool.putconn(conn)
+    return [
+        {"versao": m.versao, "descricao": m.descricao, "aplicada": m.versao in aplicadas, "opcional": m.opcional}
+        for m in sorted(MIGRACOES, key=lambda m: m.versao)
+    ]
+
+
+# Consultas quentes do serviço com parâmetros de exemplo e o índice que deveriam usar
+CONSULTAS_QUENTES = [
+    ("login / usuário por email",
+     "SELECT id, email, senha, recebe_boletim, admin FROM usuario WHERE email = %s",
+     ["usuario@exemplo.com"], "idx_usuario_email"),
+    ("histórico de mensagens",
+     "SELECT id, mensagem, ia, envio FROM mensagem WHERE id_usuario = %s",
+     [1], "idx_mensagem_usuario_envio"),
+    ("boletim: faturamento do período",
+     "SELECT * FROM faturamento WHERE data BETWEEN %s AND %s",
+     ["2024-01-01", "2024-01-07"], "idx_faturamento_data"),
+    ("boletim: estoque das últimas 52 semanas",
+     "SELECT * FROM estoque WHERE data IS NULL OR data >= %s",
+     ["2100-01-01"], "idx_estoque_data"),
+    ("chat: produto por substring",
+     "SELECT SUM(es_totalestoque) FROM estoque WHERE LOWER(produto) LIKE %s",
+     ["%milho%"], "idx_estoque_produto_trgm"),
+    ("chat: SKU por substring",
+     "SELECT COUNT(*) FROM faturamento WHERE UPPER(sku) LIKE %s",
+     ["%SKU_1%"], "idx_faturamento_sku_trgm"),
+]
+
+
+def _indices_no_plano(no: dict) -> set[str]:
+    indices = {no["Index Name"]} if "Index Name" in no else set()
+    for filho in no.get("Plans", []):
+        indices |= _indices_no_plano(filho)
+    return indices
+
+
+def verificar_indices() -> list[dict]:
+    """EXPLAIN das consultas quentes: o índice é escolhido hoje e é utilizável pelo planner?
+
+    `usa_indice` reflete o plano real (em tabela pequena o seq scan pode ganhar);
+    `indice_utilizavel` repete o EXPLAIN com enable_seqscan=off para provar que a
+    consulta consegue usar o índice.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    resultado = []
+    try:
+        cursor = conn.cursor()
+        for nome, sql, params, indice in CONSULTAS_QUENTES:
+            item = {"consulta": nome, "indice_esperado": indice}
+            try:
+                aceitos = _indices_aceitos(cursor, indice)
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                usados = _indices_no_plano(cursor.fetchone()[0][0]["Plan"])
+                item["usa_indice"] = bool(usados & aceitos)
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                usados_sem_seqscan = _indices_no_plano(cursor.fetchone()[0][0]["Plan"])
+                item["indice_utilizavel"] = bool(usados_sem_seqscan & aceitos)
+                item["indices_no_plano"] = sorted(usados_sem_seqscan)
+                conn.rollback()
+            except Exception as e:
+                conn.rollback()
+                item["usa_indice"] = item["indice_utilizavel"] = False
+                item["erro"] = str(e).strip()
+            resultado.append(item)
+        cursor.close()
+    finally:
+        pool.putconn(conn)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrações de índices do banco")
+    parser.add_argument("--status", action="store_true", help="lista as migrações aplicadas e pendentes")
+    parser.add_argument("--check", action="store_true", help="verifica via EXPLAIN se as consultas quentes usam os índices")
+    args = parser.parse_args()
+
+    if args.status:
+        for m in status_migracoes():
+            marca = "✅" if m["aplicada"] else ("⏭️" if m["opcional"] else "⏳")
+            print(f"{marca} {m['versao']}: {m['descricao']}")
+        return
+    if args.check:
+        resultado = verificar_indices()
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+        sys.exit(0 if all(r["indice_utilizavel"] for r in resultado) else 1)
+    aplicar_migracoes()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,56 @@
-import psycopg2
+import csv
+import io
 import os
+import re
+import time
+import uuid
+from typing import Iterable, Iterator, NamedTuple
 from dotenv import load_dotenv
+from psycopg2 import errors
+from db.pool import get_pool
+from db.query_stats import registrar
 
 load_dotenv()  # garante que o .env seja carregado
 
+# PREPARE/EXECUTE em SQL não funciona atrás do pooler do Neon (PgBouncer em modo
+# transação): por padrão só liga quando a URL não aponta para o host "-pooler"
+_PREPARED_ATIVO = os.getenv(
+    "DB_PREPARED_STATEMENTS",
+    "0" if "-pooler" in os.getenv("DATABASE_URL", "") else "1"
+).lower() in ("1", "true", "sim")
+_PREPARED_MAX = int(os.getenv("DB_PREPARED_CACHE_SIZE", "64"))
+
+
+class ConsultaBloqueadaError(Exception):
+    """Consulta recusada ou interrompida pelos limites do modo protegido"""
+
+    def __init__(self, motivo: str, mensagem: str):
+        super().__init__(mensagem)
+        self.motivo = motivo  # "somente_leitura", "custo" ou "tempo"
+
+
+class LimitesConsulta(NamedTuple):
+    """Limites do modo protegido de execute_query (padrões vêm do .env)"""
+    timeout_ms: int = int(os.getenv("DB_GUARD_TIMEOUT_MS", "5000"))
+    custo_max: float = float(os.getenv("DB_GUARD_MAX_COST", "1000000"))
+    linhas_max: int = int(os.getenv("DB_GUARD_MAX_ROWS", "1000"))
+
+
+class LinhasLimitadas(list):
+    """Lista de dicts (mode="rows") com a indicação de corte pelo limite de linhas"""
+    truncado = False
+
+
+def _placeholders_pg(sql: str) -> str:
+    """Troca os %s do psycopg2 por $1..$n (formato exigido pelo PREPARE)"""
+    contador = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%%|%s", lambda m: "%" if m.group(0) == "%%" else f"${next(contador)}", sql)
+
 class NeonDB:
     def __init__(self):
-        # pega a URL do banco do .env
-        db_url = os.getenv("DATABASE_URL")
-        if not db_url:
-            raise ValueError("DATABASE_URL não está definido no .env")
-        self.conn = psycopg2.connect(db_url)
+        # empresta uma conexão do pool do processo (DATABASE_URL vem do .env)
+        self._pool = get_pool()
+        self.conn = self._pool.getconn()
         self.cursor = self.conn.cursor()
 
     def __enter__(self):
@@ -23,35 +63,168 @@ class NeonDB:
         self.__close()
     
     def __close(self):
+        # devolve a conexão ao pool em vez de fechá-la; idempotente (exit + __del__)
         try: self.cursor.close()
         except: pass
-        try: self.conn.close()
-        except: pass
+        conn = getattr(self, "conn", None)
+        self.conn = None
+        if conn is not None:
+            try: self._pool.putconn(conn)
+            except: pass
     
     def __cursor(self):
         return self.cursor or self.conn.cursor()
 
+    # Cada método registra tempo, linhas e fingerprint em db.query_stats
     def query(self, sql: str, params: list | None = None) -> list[tuple]:
+        inicio = time.perf_counter()
         c = self.__cursor()
         c.execute(sql, params)
-        return c.fetchall()
+        rows = c.fetchall()
+        registrar(sql, time.perf_counter() - inicio, len(rows))
+        return rows
     
     def fetchone(self, sql: str, params: list | None = None) -> tuple:
+        inicio = time.perf_counter()
         c = self.__cursor()
         c.execute(sql, params)
-        return c.fetchone()
+        row = c.fetchone()
+        registrar(sql, time.perf_counter() - inicio, 1 if row is not None else 0)
+        return row
     
-    def execute(self, sql: str, params: list | None = None) -> None:
+    def execute(self, sql: str, params: list | None = None) -> int:
+        """Executa sem retorno de linhas; devolve quantas foram afetadas"""
+        inicio = time.perf_counter()
         c = self.__cursor()
         c.execute(sql, params)
+        afetadas = max(c.rowcount, 0)
+        registrar(sql, time.perf_counter() - inicio, afetadas)
+        return afetadas
     
     def fetchall(self, sql: str, params: list | None = None) -> list[tuple]:
+        inicio = time.perf_counter()
         cursor = self.__cursor()
         cursor.execute(sql, params)
-        return cursor.fetchall()
+        rows = cursor.fetchall()
+        registrar(sql, time.perf_counter() - inicio, len(rows))
+        return rows
     
+    def execute_prepared(self, template_id: str, sql: str, params: list | None = None):
+        """Executa a SQL parametrizada via prepared statement da conexão e devolve o cursor.
+
+        O PREPARE acontece só na primeira vez que o template aparece nesta conexão;
+        depois é só EXECUTE, sem novo planejamento. Se o servidor não aceitar
+        PREPARE, ou não tiver mais o prepared statement no EXECUTE, cai para a
+        execução parametrizada normal.
+        """
+        c = self.__cursor()
+        nome = self.__preparar(template_id, sql) if _PREPARED_ATIVO else None
+        inicio = time.perf_counter()
+        if nome is None:
+            c.execute(sql, params or None)
+        else:
+            # savepoint no mesmo envio: se o EXECUTE falhar, a transação segue utilizável;
+            # o RELEASE vai por outro cursor para não descartar o resultado de c
+            argumentos = f" ({', '.join(['%s'] * len(params))})" if params else ""
+            try:
+                c.execute(f"SAVEPOINT antes_execute; EXECUTE {nome}{argumentos}", params or None)
+            except errors.InvalidSqlStatementName:
+                # a sessão do servidor não é a mesma do PREPARE (pooler em modo transação):
+                # desliga o PREPARE nesta conexão e roda a mesma SQL parametrizada
+                c.execute("ROLLBACK TO SAVEPOINT antes_execute")
+                print(f"[SQL] {nome} não existe no servidor; usando SQL parametrizada nesta conexão")
+                self.conn.preparados.clear()
+                self.conn.prepare_disponivel = False
+                c.execute(sql, params or None)
+            else:
+                with self.conn.cursor() as controle:
+                    controle.execute("RELEASE SAVEPOINT antes_execute")
+        # registrado pela SQL do template, não pelo "EXECUTE tpl_n"
+        registrar(sql, time.perf_counter() - inicio, max(c.rowcount, 0))
+        return c
+
+    def __preparar(self, template_id: str, sql: str) -> str | None:
+        conn = self.conn
+        if not getattr(conn, "prepare_disponivel", False):
+            return None
+        chave = (template_id, sql)
+        nome = conn.preparados.get(chave)
+        if nome is not None:
+            conn.preparados.move_to_end(chave)
+            return nome
+
+        nome = f"tpl_{conn.proximo_preparado}"
+        conn.proximo_preparado += 1
+        c = self.__cursor()
+        # savepoint: um PREPARE com erro não pode abortar a transação em andamento
+        c.execute("SAVEPOINT antes_prepare")
+        try:
+            c.execute(f"PREPARE {nome} AS {_placeholders_pg(sql)}")
+        except Exception as e:
+            c.execute("ROLLBACK TO SAVEPOINT antes_prepare")
+            print(f"[SQL] PREPARE falhou para {template_id}, usando SQL parametrizada: {e}")
+            return None
+        c.execute("RELEASE SAVEPOINT antes_prepare")
+        print(f"[SQL] PREPARE {nome} ({template_id})")
+
+        conn.preparados[chave] = nome
+        if len(conn.preparados) > _PREPARED_MAX:
+            _, antigo = conn.preparados.popitem(last=False)
+            c.execute(f"DEALLOCATE {antigo}")
+        return nome
+
+    def stream(self, sql: str, params: list | None = None, batch_size: int = 2000) -> Iterator[list[tuple]]:
+        """Executa a consulta num cursor nomeado (server-side) e devolve as linhas em lotes.
+
+        Só `batch_size` linhas ficam em memória por vez; o cursor vive dentro da
+        transação corrente, então não use com autocommit nem faça commit no meio.
+        """
+        cursor = self.conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+        # só conta o tempo no banco, não o de quem consome os lotes
+        tempo_banco = 0.0
+        linhas = 0
+        try:
+            inicio = time.perf_counter()
+            cursor.execute(sql, params)
+            while True:
+                lote = cursor.fetchmany(batch_size)
+                tempo_banco += time.perf_counter() - inicio
+                if not lote:
+                    break
+                linhas += len(lote)
+                yield lote
+                inicio = time.perf_counter()
+        finally:
+            registrar(sql, tempo_banco, linhas)
+            try: cursor.close()
+            except: pass
+
+    def copy_rows(self, tabela: str, colunas: list[str], linhas: Iterable[tuple]) -> int:
+        """Grava as linhas com um único COPY ... FROM STDIN (formato CSV); retorna quantas foram enviadas.
+
+        Não faz commit. Um erro em qualquer linha aborta o COPY inteiro (e a transação).
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        quantidade = 0
+        for linha in linhas:
+            # \N é o NULL do COPY; string vazia continua sendo string vazia
+            writer.writerow([r"\N" if v is None else v for v in linha])
+            quantidade += 1
+        if not quantidade:
+            return 0
+        buffer.seek(0)
+        sql = f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        inicio = time.perf_counter()
+        self.__cursor().copy_expert(sql, buffer, size=1 << 16)
+        registrar(sql, time.perf_counter() - inicio, quantidade)
+        return quantidade
+
     def commit(self):
+        inicio = time.perf_counter()
         self.conn.commit()
+        registrar("COMMIT", time.perf_counter() - inicio, 0)
 
 def get_db():
     db = NeonDB()
@@ -60,14 +233,191 @@ def get_db():
     finally:
         db.__exit__(None, None, None)
 
-def execute_query(query: str):
-    """Executa uma query SQL e retorna os resultados formatados"""
+# OIDs do Postgres -> dtype equivalente (numpy/pandas); o resto fica como object
+_DTYPES_POR_OID = {
+    16: "bool",
+    20: "int64", 21: "int64", 23: "int64",
+    700: "float64", 701: "float64", 1700: "float64",
+    1082: "datetime64[ns]", 1114: "datetime64[ns]", 1184: "datetime64[ns]",
+}
+
+
+class ColumnarResult:
+    """Resultado de SELECT organizado por coluna (dict de listas) em vez de um dict por linha.
+
+    Continua indexável como a lista de dicts (`res[0]['total']`, `res[:5]`, `len(res)`),
+    materializando só as linhas acessadas. `column()` dá acesso direto à coluna.
+    """
+
+    def __init__(self, columns: list[str], data: dict[str, list], dtypes: dict[str, str]):
+        self.columns = columns
+        self.data = data
+        self.dtypes = dtypes
+        self._len = len(data[columns[0]]) if columns else 0
+        # True quando o modo protegido cortou o resultado em `linhas_max`
+        self.truncado = False
+
+    @classmethod
+    def from_cursor(cls, cursor, as_numpy: bool = False, limite: int | None = None) -> "ColumnarResult":
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        dtypes = {desc[0]: _DTYPES_POR_OID.get(desc[1], "object") for desc in (cursor.description or [])}
+        rows = cursor.fetchall()
+        truncado = limite is not None and len(rows) > limite
+        if truncado:
+            rows = rows[:limite]
+        # transpõe as tuplas do cursor: uma lista por coluna, sem dict por linha
+        valores = list(zip(*rows)) if rows else [() for _ in columns]
+        data = {col: list(vals) for col, vals in zip(columns, valores)}
+        result = cls(columns, data, dtypes)
+        if as_numpy:
+            result = result.to_numpy()
+        result.truncado = truncado
+        return result
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._linha(i) for i in range(*idx.indices(self._len))]
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("índice fora do resultado")
+        return self._linha(idx)
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._linha(i)
+
+    def __repr__(self) -> str:
+        return f"ColumnarResult({self._len} linhas, colunas={self.columns})"
+
+    def _linha(self, i: int) -> dict:
+        return {col: self.data[col][i] for col in self.columns}
+
+    def column(self, name: str) -> list:
+        return self.data[name]
+
+    def to_rows(self) -> list[dict]:
+        """Formato antigo de execute_query (lista de dicts)"""
+        return list(self)
+
+    def to_numpy(self) -> "ColumnarResult":
+        """Converte as colunas para arrays NumPy usando os dtypes do cursor (NULL vira NaN/NaT)"""
+        import numpy as np
+        data = {}
+        for col in self.columns:
+            dtype = self.dtypes.get(col, "object")
+            valores = self.data[col]
+            if dtype != "object" and None in valores:
+                # inteiros/bools com NULL não cabem no dtype nativo
+                dtype = "float64" if dtype in ("int64", "bool") else dtype
+            try:
+                data[col] = np.asarray(valores, dtype=dtype)
+            except (TypeError, ValueError):
+                data[col] = np.asarray(valores, dtype=object)
+        result = ColumnarResult(self.columns, data, {c: str(a.dtype) for c, a in data.items()})
+        result.truncado = self.truncado
+        return result
+
+    def to_dataframe(self):
+        """DataFrame com os dtypes do cursor (numeric -> float64, date/timestamp -> datetime64)"""
+        import pandas as pd
+        df = pd.DataFrame(self.data, columns=self.columns)
+        for col, dtype in self.dtypes.items():
+            if str(df[col].dtype) == dtype:
+                continue
+            if dtype == "float64":
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            elif dtype.startswith("datetime64"):
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+        df.attrs["truncado"] = self.truncado
+        return df
+
+
+_RE_SQL_LEITURA = re.compile(r"^\s*(SELECT|WITH)\b", re.I)
+# trechos onde um ; não separa comandos: comentários, strings ('...', E'...', $tag$...$tag$) e
+# identificadores entre aspas; a busca da esquerda para a direita segue a ordem do lexer do Postgres
+_RE_SQL_SEM_COMANDO = re.compile(
+    r"--[^\n]*"
+    r"|/\*.*?(?:\*/|$)"
+    r"|(?<![\w$])[eE]'(?:[^'\\]|''|\\.)*(?:'|$)"
+    r"|'(?:[^']|'')*(?:'|$)"
+    r"|\$([A-Za-z_]\w*)?\$.*?(?:\$\1\$|$)"
+    r'|"(?:[^"]|"")*(?:"|$)',
+    re.S,
+)
+
+
+def _sql_protegida(query: str, linhas_max: int) -> str:
+    """Valida que é um único SELECT e limita o resultado a linhas_max + 1 no próprio banco"""
+    # mesmo comprimento da query, com comentários em branco e literais apagados: sobram só os ; que separam comandos
+    codigo = _RE_SQL_SEM_COMANDO.sub(
+        lambda m: (" " if m.group().startswith(("--", "/*")) else "_") * len(m.group()), query)
+    fim = len(codigo.rstrip().rstrip(";").rstrip())
+    sql = query[:fim].strip()
+    if not _RE_SQL_LEITURA.match(codigo[:fim]) or ";" in codigo[:fim]:
+        raise ConsultaBloqueadaError("somente_leitura", "Apenas um único SELECT é permitido no modo protegido")
+    # a linha extra só serve para saber se houve corte; a quebra de linha fecha um comentário -- no fim
+    return f"SELECT * FROM ({sql}\n) AS consulta_limitada LIMIT {int(linhas_max) + 1}"
+
+
+def _iniciar_protecao(db: NeonDB, sql: str, params: list | None, limites: LimitesConsulta) -> None:
+    """Transação somente leitura com statement_timeout e teto de custo do EXPLAIN"""
+    c = db._NeonDB__cursor()
+    # SET LOCAL vale só para esta transação; a conexão volta ao pool sem o timeout
+    c.execute(f"SET TRANSACTION READ ONLY; SET LOCAL statement_timeout = {int(limites.timeout_ms)}")
+    # com os parâmetros já no texto: o plano é o dos valores desta pergunta (um template sem filtro custa caro)
+    c.execute(f"EXPLAIN (FORMAT JSON) {sql}", params or None)
+    plano = c.fetchone()[0]
+    custo = plano[0]["Plan"]["Total Cost"]
+    if custo > limites.custo_max:
+        print(f"[SQL] Consulta recusada: custo estimado {custo:.0f} > {limites.custo_max:.0f}")
+        raise ConsultaBloqueadaError("custo", f"Custo estimado da consulta ({custo:.0f}) acima do limite ({limites.custo_max:.0f})")
+
+
+def execute_query(query: str, mode: str = "rows", params: list | None = None, template_id: str | None = None,
+                  limites: LimitesConsulta | None = None):
+    """Executa uma query SQL e retorna os resultados formatados
+
+    mode (só para SELECT): "rows" -> lista de dicts; "columns" -> ColumnarResult;
+    "numpy" -> ColumnarResult com arrays NumPy; "dataframe" -> pandas.DataFrame.
+    Com `template_id`, o SELECT usa o prepared statement da conexão para esse template.
+
+    Com `limites` (modo protegido, para SQL gerada pelo chat/IA): só aceita um SELECT,
+    roda em transação somente leitura com statement_timeout, recusa a consulta cujo
+    custo no EXPLAIN passe do teto e traz no máximo `linhas_max` linhas, marcando
+    `truncado` no resultado. Violações levantam ConsultaBloqueadaError.
+    """
+    if mode not in ("rows", "columns", "numpy", "dataframe"):
+        raise ValueError(f"mode inválido: {mode}")
+
     with NeonDB() as db:
         try:
+            limite = None
+            if limites is not None:
+                query = _sql_protegida(query, limites.linhas_max)
+                limite = limites.linhas_max
+                _iniciar_protecao(db, query, params, limites)
+
             # Se for SELECT, retornar dados formatados
             if query.strip().upper().startswith('SELECT'):
-                cursor = db._NeonDB__cursor()
-                cursor.execute(query)
+                if template_id:
+                    # execute_prepared já registra a medição
+                    cursor = db.execute_prepared(template_id, query, params)
+                else:
+                    inicio = time.perf_counter()
+                    cursor = db._NeonDB__cursor()
+                    cursor.execute(query, params or None)
+                    registrar(query, time.perf_counter() - inicio, max(cursor.rowcount, 0))
+
+                if mode == "columns":
+                    return ColumnarResult.from_cursor(cursor, limite=limite)
+                if mode == "numpy":
+                    return ColumnarResult.from_cursor(cursor, as_numpy=True, limite=limite)
+                if mode == "dataframe":
+                    return ColumnarResult.from_cursor(cursor, limite=limite).to_dataframe()
                 
                 # Obter nomes das colunas
                 columns = [desc[0] for desc in cursor.description] if cursor.description else []
@@ -76,7 +426,10 @@ def execute_query(query: str):
                 results = cursor.fetchall()
                 
                 # Converter para lista de dicionários
-                formatted_results = []
+                formatted_results = LinhasLimitadas() if limite is not None else []
+                if limite is not None and len(results) > limite:
+                    formatted_results.truncado = True
+                    results = results[:limite]
                 for row in results:
                     row_dict = dict(zip(columns, row))
                     formatted_results.append(row_dict)
@@ -84,10 +437,17 @@ def execute_query(query: str):
                 return formatted_results
             else:
                 # Para INSERT, UPDATE, DELETE
-                db.execute(query)
+                db.execute(query, params or None)
                 db.commit()
                 return {"success": True}
-                
+
+        except ConsultaBloqueadaError:
+            raise
+        except errors.QueryCanceled as e:
+            if limites is None:
+                raise Exception(f"Erro ao executar query: {str(e)}")
+            raise ConsultaBloqueadaError("tempo", f"Consulta interrompida após {limites.timeout_ms} ms")
+        except errors.ReadOnlySqlTransaction:
+            raise ConsultaBloqueadaError("somente_leitura", "A consulta tentou alterar dados no modo protegido")
         except Exception as e:
             raise Exception(f"Erro ao executar query: {str(e)}")
-
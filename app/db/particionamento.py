@@ -0,0 +1,294 @@
+"""Particionamento mensal (RANGE em `data`) das tabelas fato estoque e faturamento.
+
+A conversão troca a tabela por uma tabela particionada com o mesmo nome e as
+mesmas colunas, então os INSERTs do CsvService e os SELECTs de carregar_dados_*
+continuam iguais; o Postgres encaminha cada linha para a partição do mês.
+Linhas sem data ou fora das partições existentes caem na partição default e são
+redistribuídas pela manutenção, que também cria as partições dos próximos meses.
+
+Uso (a partir da pasta app/):
+    python -m db.particionamento converter estoque faturamento
+    python -m db.particionamento manter          # partições futuras + esvazia a default
+    python -m db.particionamento status
+    python -m db.particionamento check           # partições lidas pela consulta semanal do boletim
+"""
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+from db.pool import get_pool
+
+TABELAS_PARTICIONAVEIS = ("estoque", "faturamento")
+# quantos meses à frente manter criados
+MESES_FUTUROS = int(os.getenv("DB_PARTITION_MONTHS_AHEAD", "3"))
+
+
+def _mes(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _proximo_mes(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _nome_particao(tabela: str, inicio: date) -> str:
+    return f"{tabela}_p{inicio:%Y_%m}"
+
+
+def _validar_tabela(tabela: str) -> None:
+    # os nomes entram no SQL, então só as tabelas conhecidas são aceitas
+    if tabela not in TABELAS_PARTICIONAVEIS:
+        raise ValueError(f"Tabela não particionável: {tabela}")
+
+
+def esta_particionada(cursor, tabela: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+        [tabela],
+    )
+    return cursor.fetchone() is not None
+
+
+def _particao_existe(cursor, nome: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [nome])
+    return cursor.fetchone()[0]
+
+
+def _criar_particao(cursor, tabela: str, inicio: date) -> bool:
+    """Cria a partição do mês; se a default já tiver linhas desse mês, elas são movidas para ela"""
+    nome = _nome_particao(tabela, inicio)
+    if _particao_existe(cursor, nome):
+        return False
+    fim = _proximo_mes(inicio)
+    default = f"{tabela}_default"
+
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE data >= %s AND data < %s)", [inicio, fim])
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {nome} PARTITION OF {tabela} FOR VALUES FROM (%s) TO (%s)", [inicio, fim])
+    else:
+        # não dá para criar a partição com linhas do intervalo na default:
+        # cria solta, move as linhas e só então anexa
+        cursor.execute(f"CREATE TABLE {nome} (LIKE {tabela} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH movidas AS (DELETE FROM {default} WHERE data >= %s AND data < %s RETURNING *) "
+            f"INSERT INTO {nome} SELECT * FROM movidas",
+            [inicio, fim],
+        )
+        cursor.execute(f"ALTER TABLE {tabela} ATTACH PARTITION {nome} FOR VALUES FROM (%s) TO (%s)", [inicio, fim])
+    print(f"[PARTIÇÃO] {nome} criada ({inicio} a {fim})")
+    return True
+
+
+def converter_para_particionada(tabela: str, manter_legado: bool = False) -> bool:
+    """Converte a tabela em particionada por mês, copiando os dados, numa única transação.
+
+    A tabela fica bloqueada durante a cópia; rode numa janela de manutenção.
+    Retorna False se ela já estava particionada.
+    """
+    _validar_tabela(tabela)
+    legado = f"{tabela}_legado"
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        if esta_particionada(cursor, tabela):
+            print(f"[PARTIÇÃO] {tabela} já é particionada")
+            conn.rollback()
+            return False
+
+        cursor.execute(f"LOCK TABLE {tabela} IN ACCESS EXCLUSIVE MODE")
+
+        # índices (exceto a PK) para recriar na tabela particionada com os mesmos nomes
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_indexdef(i.indexrelid),
+                   i.indisunique AND NOT EXISTS (
+                       SELECT 1 FROM pg_attribute a
+                       WHERE a.attrelid = i.indrelid AND a.attname = 'data' AND a.attnum = ANY(i.indkey)
+                   )
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+            """,
+            [tabela],
+        )
+        indices = cursor.fetchall()
+        # sequências das colunas serial, que precisam sobreviver à tabela antiga
+        cursor.execute(
+            """
+            SELECT a.attname, pg_get_serial_sequence(%s, a.attname)
+            FROM pg_attribute a
+            WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+              AND pg_get_serial_sequence(%s, a.attname) IS NOT NULL
+            """,
+            [tabela, tabela, tabela],
+        )
+        sequencias = cursor.fetchall()
+        # gatilhos (ex.: os que mantêm os rollups de db/rollups.py); recriados depois da cópia,
+        # que não deve contar as linhas de novo
+        cursor.execute(
+            "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+            [tabela],
+        )
+        gatilhos = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT MIN(data), MAX(data) FROM {tabela}")
+        data_min, data_max = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {tabela} RENAME TO {legado}")
+        for nome, _, _ in indices:
+            cursor.execute(f"ALTER INDEX {nome} RENAME TO {nome}_legado")
+
+        # PK/UNIQUE de tabela particionada precisam incluir `data` (que aceita NULL),
+        # então a tabela nova fica só com as colunas, defaults e CHECKs
+        cursor.execute(
+            f"CREATE TABLE {tabela} (LIKE {legado} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (data)"
+        )
+        cursor.execute(f"CREATE TABLE {tabela}_default PARTITION OF {tabela} DEFAULT")
+
+        hoje = _mes(date.today())
+        inicio = _mes(data_min) if data_min else hoje
+        fim = max(_mes(data_max) if data_max else hoje, hoje)
+        for _ in range(MESES_FUTUROS):
+            fim = _proximo_mes(fim)
+        mes = inicio
+        while mes <= fim:
+            _criar_particao(cursor, tabela, mes)
+            mes = _proximo_mes(mes)
+
+        cursor.execute(f"INSERT INTO {tabela} SELECT * FROM {legado}")
+        copiadas = cursor.rowcount
+
+        # as definições foram lidas antes do RENAME, então já apontam para o nome da tabela nova
+        for _, definicao, unico_sem_data in indices:
+            # índices únicos sem `data` na chave não valem na tabela particionada; viram índices comuns
+            if unico_sem_data:
+                definicao = definicao.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1)
+            cursor.execute(definicao)
+        for coluna, sequencia in sequencias:
+            cursor.execute(f"ALTER SEQUENCE {sequencia} OWNED BY {tabela}.{coluna}")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {tabela}_{coluna}_idx ON {tabela} ({coluna})")
+        for definicao in gatilhos:
+            cursor.execute(definicao)
+
+        if not manter_legado:
+            cursor.execute(f"DROP TABLE {legado}")
+        conn.commit()
+        print(f"✅ {tabela} convertida para particionada por mês ({copiadas} linhas copiadas)")
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def manter_particoes(meses_futuros: int = MESES_FUTUROS) -> dict:
+    """Cria as partições até `meses_futuros` à frente e move da default as linhas com data"""
+    pool = get_pool()
+    conn = pool.getconn()
+    criadas = {}
+    try:
+        cursor = conn.cursor()
+        for tabela in TABELAS_PARTICIONAVEIS:
+            if not esta_particionada(cursor, tabela):
+                continue
+            meses = set()
+            mes = _mes(date.today())
+            for _ in range(meses_futuros + 1):
+                meses.add(mes)
+                mes = _proximo_mes(mes)
+            # meses que hoje estão parados na default (ex.: CSV com dados antigos)
+            cursor.execute(f"SELECT DISTINCT date_trunc('month', data)::date FROM {tabela}_default WHERE data IS NOT NULL")
+            meses.update(row[0] for row in cursor.fetchall())
+
+            criadas[tabela] = [str(m) for m in sorted(meses) if _criar_particao(cursor, tabela, m)]
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+    return criadas
+
+
+def status_particoes() -> dict:
+    """Partições de cada tabela com a faixa de datas e a estimativa de linhas"""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        resultado = {}
+        for tabela in TABELAS_PARTICIONAVEIS:
+            if not esta_particionada(cursor, tabela):
+                resultado[tabela] = None
+                continue
+            cursor.execute(
+                """
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = %s::regclass
+                ORDER BY c.relname
+                """,
+                [tabela],
+            )
+            resultado[tabela] = [
+                {"particao": nome, "limites": limites, "linhas_estimadas": max(linhas, 0)}
+                for nome, limites, linhas in cursor.fetchall()
+            ]
+        conn.rollback()
+        return resultado
+    finally:
+        pool.putconn(conn)
+
+
+def _relacoes_no_plano(no: dict) -> set[str]:
+    relacoes = {no["Relation Name"]} if "Relation Name" in no else set()
+    for filho in no.get("Plans", []):
+        relacoes |= _relacoes_no_plano(filho)
+    return relacoes
+
+
+def verificar_poda(data_fim: date | None = None) -> dict:
+    """EXPLAIN da consulta semanal de faturamento do boletim: quais partições ela lê"""
+    data_fim = data_fim or date.today()
+    data_inicio = data_fim - timedelta(days=6)
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "EXPLAIN (FORMAT JSON) SELECT * FROM faturamento WHERE data BETWEEN %s AND %s",
+            [data_inicio, data_fim],
+        )
+        relacoes = sorted(_relacoes_no_plano(cursor.fetchone()[0][0]["Plan"]))
+        conn.rollback()
+        return {"periodo": f"{data_inicio} a {data_fim}", "particoes_lidas": relacoes}
+    finally:
+        pool.putconn(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particionamento mensal de estoque/faturamento")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    conv = sub.add_parser("converter", help="converte as tabelas em particionadas por mês")
+    conv.add_argument("tabelas", nargs="*", default=list(TABELAS_PARTICIONAVEIS))
+    conv.add_argument("--manter-legado", action="store_true", help="mantém a tabela antiga como <tabela>_legado")
+    manter = sub.add_parser("manter", help="cria partições futuras e redistribui a partição default")
+    manter.add_argument("--meses", type=int, default=MESES_FUTUROS)
+    sub.add_parser("status", help="lista as partições")
+    sub.add_parser("check", help="mostra as partições lidas pela consulta semanal do boletim")
+    args = parser.parse_args()
+
+    if args.comando == "converter":
+        for tabela in args.tabelas:
+            converter_para_particionada(tabela, manter_legado=args.manter_legado)
+    elif args.comando == "manter":
+        print(json.dumps(manter_particoes(args.meses), ensure_ascii=False, indent=2))
+    elif args.comando == "status":
+        print(json.dumps(status_particoes(), ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(verificar_poda(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import psycopg2
+from psycopg2 import extensions
+from dotenv import load_dotenv
+from db.backend import database_url
+
+load_dotenv()
+
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite de espera"""
+
+
+class PooledConnection(extensions.connection):
+    """Conexão psycopg2 que guarda metadados usados pelo pool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.criada_em = time.monotonic()
+        self.devolvida_em = self.criada_em
+        # prepared statements desta sessão: (template_id, sql) -> nome no servidor (LRU)
+        self.preparados: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.proximo_preparado = 0
+        self.prepare_disponivel = True
+
+
+class NeonPool:
+    """Pool de conexões compartilhado pelo processo inteiro.
+
+    Mantém entre `min_size` e `max_size` conexões abertas, fecha as que ficam
+    ociosas por mais de `idle_timeout` segundos (respeitando o mínimo) e
+    valida a conexão no checkout antes de entregá-la.
+    """
+
+    def __init__(self,
+            dsn: str,
+            min_size: int = 1,
+            max_size: int = 10,
+            idle_timeout: float = 300.0,
+            checkout_timeout: float = 30.0,
+            check_interval: float = 30.0
+        ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamanhos do pool inválidos (0 <= min <= max, max >= 1)")
+        self._dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.check_interval = check_interval
+
+        self._cond = threading.Condition()
+        self._ociosas: list[PooledConnection] = []  # pilha LIFO: a mais recente sai primeiro
+        self._total = 0
+        self._em_uso = 0
+        self._fechado = False
+
+        # Estatísticas
+        self._checkouts = 0
+        self._esperas = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._timeouts = 0
+        self._criadas = 0
+        self._falhas_saude = 0
+        self._fechadas_ociosas = 0
+
+    def _conectar(self) -> PooledConnection:
+        conn = psycopg2.connect(self._dsn, connection_factory=PooledConnection)
+        with self._cond:
+            self._criadas += 1
+        return conn
+
+    @staticmethod
+    def _fechar(conn) -> None:
+        try: conn.close()
+        except: pass
+
+    def _saudavel(self, conn: PooledConnection) -> bool:
+        """Verifica se a conexão ainda pode ser usada"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        # Só faz round trip se a conexão ficou parada tempo suficiente para o servidor derrubá-la
+        if time.monotonic() - conn.devolvida_em < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _descartar_ociosas(self) -> list:
+        """Remove conexões ociosas além do idle_timeout (chamar com o lock)"""
+        if not self.idle_timeout:
+            return []
+        agora = time.monotonic()
+        descartadas = []
+        # As mais antigas ficam no começo da pilha
+        while self._ociosas and self._total > self.min_size:
+            conn = self._ociosas[0]
+            if agora - conn.devolvida_em < self.idle_timeout:
+                break
+            self._ociosas.pop(0)
+            self._total -= 1
+            self._fechadas_ociosas += 1
+            descartadas.append(conn)
+        return descartadas
+
+    def getconn(self) -> PooledConnection:
+        """Empresta uma conexão, esperando até checkout_timeout se o pool estiver cheio"""
+        inicio = time.monotonic()
+        esperou = False
+        while True:
+            with self._cond:
+                if self._fechado:
+                    raise PoolEsgotadoError("Pool de conexões já foi fechado")
+                descartadas = self._descartar_ociosas()
+                conn = None
+                nova = False
+                while True:
+                    if self._ociosas:
+                        conn = self._ociosas.pop()
+                        break
+                    if self._total < self.max_size:
+                        self._total += 1
+                        nova = True
+                        break
+                    esperou = True
+                    restante = self.checkout_timeout - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self._timeouts += 1
+                        raise PoolEsgotadoError(
+                            f"Nenhuma conexão livre após {self.checkout_timeout:.1f}s "
+                            f"(máximo de {self.max_size} conexões em uso)"
+                        )
+                    self._cond.wait(restante)
+                self._em_uso += 1
+
+            for antiga in descartadas:
+                self._fechar(antiga)
+
+            if nova:
+                try:
+                    conn = self._conectar()
+                except Exception:
+                    self._liberar_vaga()
+                    raise
+            elif not self._saudavel(conn):
+                with self._cond:
+                    self._falhas_saude += 1
+                self._fechar(conn)
+                self._liberar_vaga()
+                continue
+
+            espera = time.monotonic() - inicio
+            with self._cond:
+                self._checkouts += 1
+                if esperou:
+                    self._esperas += 1
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+            return conn
+
+    def _liberar_vaga(self) -> None:
+        """Desconta uma conexão em uso que foi descartada"""
+        with self._cond:
+            self._total -= 1
+            self._em_uso -= 1
+            self._cond.notify()
+
+    def putconn(self, conn: PooledConnection) -> None:
+        """Devolve a conexão ao pool, desfazendo transações pendentes"""
+        reutilizavel = not conn.closed
+        if reutilizavel:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                reutilizavel = False
+
+        with self._cond:
+            self._em_uso -= 1
+            if reutilizavel and not self._fechado:
+                conn.devolvida_em = time.monotonic()
+                self._ociosas.append(conn)
+                conn = None
+            else:
+                self._total -= 1
+            self._cond.notify()
+        if conn is not None:
+            self._fechar(conn)
+
+    def warmup(self) -> None:
+        """Abre conexões até atingir o tamanho mínimo"""
+        while True:
+            with self._cond:
+                if self._fechado or self._total >= self.min_size:
+                    return
+                self._total += 1
+            try:
+                conn = self._conectar()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                raise
+            with self._cond:
+                self._ociosas.insert(0, conn)
+                self._cond.notify()
+
+    def close(self) -> None:
+        """Fecha as conexões ociosas; as emprestadas são fechadas ao voltar"""
+        with self._cond:
+            self._fechado = True
+            ociosas, self._ociosas = self._ociosas, []
+            self._total -= len(ociosas)
+            self._cond.notify_all()
+        for conn in ociosas:
+            self._fechar(conn)
+
+    def stats(self) -> dict:
+        """Retorna o estado atual e os contadores acumulados do pool"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "total": self._total,
+                "em_uso": self._em_uso,
+                "ociosas": len(self._ociosas),
+                "checkouts": checkouts,
+                "checkouts_com_espera": self._esperas,
+                "espera_media_ms": round(self._espera_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "espera_max_ms": round(self._espera_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "conexoes_criadas": self._criadas,
+                "falhas_health_check": self._falhas_saude,
+                "fechadas_por_ociosidade": self._fechadas_ociosas,
+            }
+
+
+_pool: NeonPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> NeonPool:
+    """Retorna o pool do processo, criando-o a partir do .env na primeira chamada"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_url = database_url()
+                _pool = NeonPool(
+                    db_url,
+                    min_size=int(os.getenv("DB_POOL_MIN", "1")),
+                    max_size=int(os.getenv("DB_POOL_MAX", "10")),
+                    idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+                    checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                    check_interval=float(os.getenv("DB_POOL_CHECK_INTERVAL", "30")),
+                )
+    return _pool
+
+
+def fechar_pool() -> None:
+    """Fecha o pool do processo (usado no shutdown da aplicação)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,125 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import deque, defaultdict
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Janela de medições mantida em memória (ring buffer) e limite da slow-query log
+_TAMANHO_JANELA = int(os.getenv("DB_QUERY_STATS_SIZE", "5000"))
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+_TAMANHO_LENTAS = int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", "200"))
+
+_lock = threading.Lock()
+# (timestamp, fingerprint, duração ms, linhas)
+_medicoes: deque[tuple[float, str, float, int]] = deque(maxlen=_TAMANHO_JANELA)
+_lentas: deque[dict] = deque(maxlen=_TAMANHO_LENTAS)
+# execuções desde o início do processo (não limitado pela janela): idas ao banco nos benchmarks
+_total_execucoes = 0
+
+_RE_COMENTARIO = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_PLACEHOLDER = re.compile(r"%s|\$\d+")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA_IN = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.I)
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """Normaliza a SQL para agrupar execuções do mesmo formato (literais e parâmetros viram ?)"""
+    fp = _RE_COMENTARIO.sub(" ", sql)
+    fp = _RE_STRING.sub("?", fp)
+    fp = _RE_PLACEHOLDER.sub("?", fp)
+    fp = _RE_NUMERO.sub("?", fp)
+    fp = _RE_LISTA_IN.sub("IN (?+)", fp)
+    return _RE_ESPACOS.sub(" ", fp).strip().rstrip(";").strip()
+
+
+def registrar(sql: str, duracao_s: float, linhas: int) -> None:
+    """Registra uma execução; acima de DB_SLOW_QUERY_MS também vai para a slow-query log"""
+    global _total_execucoes
+    ms = duracao_s * 1000.0
+    fp = fingerprint(sql)
+    agora = time.time()
+    with _lock:
+        _total_execucoes += 1
+        _medicoes.append((agora, fp, ms, linhas))
+        if ms >= SLOW_QUERY_MS:
+            _lentas.append({
+                "quando": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(agora)),
+                "duracao_ms": round(ms, 1),
+                "linhas": linhas,
+                "fingerprint": fp,
+            })
+    if ms >= SLOW_QUERY_MS:
+        print(f"[SLOW SQL] {ms:.1f}ms linhas={linhas} {fp[:500]}")
+
+
+def _percentil(ordenados: list[float], perc: float) -> float:
+    # nearest-rank
+    k = max(0, math.ceil(perc / 100.0 * len(ordenados)) - 1)
+    return ordenados[k]
+
+
+def top(n: int = 10, ordem: str = "total") -> list[dict]:
+    """Fingerprints mais custosos da janela atual, ordenados por tempo total ou p95"""
+    if ordem not in ("total", "p95"):
+        raise ValueError("ordem deve ser 'total' ou 'p95'")
+    with _lock:
+        medicoes = list(_medicoes)
+
+    duracoes = defaultdict(list)
+    linhas = defaultdict(int)
+    for _, fp, ms, qtd in medicoes:
+        duracoes[fp].append(ms)
+        linhas[fp] += qtd
+
+    resumo = []
+    for fp, valores in duracoes.items():
+        valores.sort()
+        total = sum(valores)
+        resumo.append({
+            "fingerprint": fp,
+            "execucoes": len(valores),
+            "total_ms": round(total, 1),
+            "media_ms": round(total / len(valores), 2),
+            "p95_ms": round(_percentil(valores, 95), 2),
+            "max_ms": round(valores[-1], 2),
+            "linhas": linhas[fp],
+        })
+    chave = "total_ms" if ordem == "total" else "p95_ms"
+    resumo.sort(key=lambda r: r[chave], reverse=True)
+    return resumo[:n]
+
+
+def total_execucoes() -> int:
+    """Execuções registradas desde o início do processo (cada uma é uma ida ao banco)"""
+    with _lock:
+        return _total_execucoes
+
+
+def lentas() -> list[dict]:
+    """Últimas execuções acima do limite, da mais recente para a mais antiga"""
+    with _lock:
+        return list(reversed(_lentas))
+
+
+def resumo_janela() -> dict:
+    with _lock:
+        return {
+            "medicoes": len(_medicoes),
+            "capacidade": _medicoes.maxlen,
+            "desde": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_medicoes[0][0])) if _medicoes else None,
+            "slow_query_ms": SLOW_QUERY_MS,
+        }
+
+
+def limpar() -> None:
+    with _lock:
+        _medicoes.clear()
+        _lentas.clear()
@@ -0,0 +1,288 @@
+"""Rollups de estoque e faturamento, mantidos na mesma transação da ingestão.
+
+- rollup_estoque: por (sku, cod_cliente, semana) — soma e contagem do estoque,
+  aging (dias_em_estoque) e o valor da linha mais recente do balde;
+- rollup_faturamento: por (sku, cod_cliente, mes) — somas de peso e giro.
+
+Gatilhos por instrução (com tabelas de transição) na tabela fato agregam as
+linhas gravadas por qualquer caminho — COPY e INSERT ... ON CONFLICT do CSV,
+seed, ingestão paralela — e somam no rollup dentro da própria transação: se ela
+volta, o rollup volta junto. DELETE/UPDATE recalculam os baldes afetados a
+partir da tabela fato e TRUNCATE esvazia o rollup.
+
+Os leitores (boletim, contexto do chat) somam os baldes inteiros da janela e só
+leem da tabela fato as linhas do balde incompleto na borda, então o resultado é
+o mesmo de agregar a tabela fato inteira.
+
+Uso (a partir da pasta app/):
+    python -m db.rollups --status
+    python -m db.rollups --verificar      # compara com a agregação da tabela fato
+    python -m db.rollups --reconstruir    # recria gatilhos e recalcula do zero
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+from db.pool import get_pool
+
+# chaves do balde além da data truncada (mesmos tipos das tabelas fato)
+_CHAVES = (("sku", "VARCHAR(50)"), ("cod_cliente", "INT"))
+
+
+class Rollup(NamedTuple):
+    tabela: str  # tabela fato
+    nome: str  # tabela do rollup
+    unidade: str  # do DATE_TRUNC: week ou month
+    coluna_balde: str  # semana ou mes
+    # (coluna, tipo, agregação sobre as linhas da tabela fato, combinação no upsert: soma, min ou max)
+    medidas: tuple[tuple[str, str, str, str], ...]
+    # colunas da tabela fato lidas pelas medidas: um UPDATE que não muda nenhuma delas não recalcula nada
+    fonte: tuple[str, ...]
+    # valor da linha mais recente (data, id) do balde, em ultimo_valor; None se o rollup não guarda
+    ultimo: Optional[str] = None
+
+    @property
+    def colunas(self) -> list[str]:
+        colunas = [c for c, _ in _CHAVES] + [self.coluna_balde] + [m[0] for m in self.medidas]
+        if self.ultimo:
+            colunas += ["ultimo_data", "ultimo_id", "ultimo_valor"]
+        return colunas
+
+    def balde(self, d: date) -> date:
+        """Início do balde (segunda-feira ou dia 1) que contém a data"""
+        if self.unidade == "week":
+            return d - timedelta(days=d.weekday())
+        return d.replace(day=1)
+
+    def proximo_balde(self, d: date) -> date:
+        """Primeiro balde que começa em `d` ou depois"""
+        inicio = self.balde(d)
+        if inicio == d:
+            return d
+        if self.unidade == "week":
+            return inicio + timedelta(weeks=1)
+        return date(inicio.year + (inicio.month == 12), inicio.month % 12 + 1, 1)
+
+
+ROLLUPS: dict[str, Rollup] = {
+    "estoque": Rollup("estoque", "rollup_estoque", "week", "semana", (
+        ("linhas", "BIGINT", "COUNT(*)", "soma"),
+        ("soma_estoque", "NUMERIC", "SUM(COALESCE(es_totalestoque, 0))", "soma"),
+        ("nao_zero", "BIGINT", "COUNT(*) FILTER (WHERE COALESCE(es_totalestoque, 0) <> 0)", "soma"),
+        ("dias_qtd", "BIGINT", "COUNT(dias_em_estoque)", "soma"),
+        ("dias_soma", "BIGINT", "COALESCE(SUM(dias_em_estoque), 0)", "soma"),
+        ("dias_min", "INT", "MIN(dias_em_estoque)", "min"),
+        ("dias_max", "INT", "MAX(dias_em_estoque)", "max"),
+    ), ("es_totalestoque", "dias_em_estoque"), ultimo="COALESCE(es_totalestoque, 0)"),
+    "faturamento": Rollup("faturamento", "rollup_faturamento", "month", "mes", (
+        ("linhas", "BIGINT", "COUNT(*)", "soma"),
+        ("soma_peso", "NUMERIC", "SUM(COALESCE(zs_peso_liquido, 0))", "soma"),
+        ("com_peso", "BIGINT", "COUNT(*) FILTER (WHERE zs_peso_liquido > 0)", "soma"),
+        ("giro_qtd", "BIGINT", "COUNT(giro_sku_cliente)", "soma"),
+        ("giro_soma", "NUMERIC", "COALESCE(SUM(giro_sku_cliente), 0)", "soma"),
+    ), ("zs_peso_liquido", "giro_sku_cliente")),
+}
+
+_COMBINACOES = {
+    "soma": "r.{c} + EXCLUDED.{c}",
+    "min": "LEAST(r.{c}, EXCLUDED.{c})",
+    "max": "GREATEST(r.{c}, EXCLUDED.{c})",
+}
+
+
+def _agregar(rollup: Rollup, origem: str) -> str:
+    """SELECT que agrega as linhas de `origem` (tabela fato, de transição ou subconsulta) por balde"""
+    expressoes = [c for c, _ in _CHAVES] + [f"DATE_TRUNC('{rollup.unidade}', data::timestamp)::date"]
+    expressoes += [m[2] for m in rollup.medidas]
+    if rollup.ultimo:
+        # dentro do balde as datas são da mesma semana/mês (ou todas NULL)
+        ordem = "ORDER BY data DESC, id DESC"
+        expressoes += [f"(ARRAY_AGG(data {ordem}))[1]", f"(ARRAY_AGG(id {ordem}))[1]",
+                       f"(ARRAY_AGG({rollup.ultimo} {ordem}))[1]"]
+    # ordem das chaves: gravações concorrentes travam as linhas do rollup na mesma sequência
+    return f"SELECT {', '.join(expressoes)} FROM {origem} GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+
+
+def _somar(rollup: Rollup, origem: str) -> str:
+    """Upsert do agregado de `origem` no rollup"""
+    chave = ", ".join([c for c, _ in _CHAVES] + [rollup.coluna_balde])
+    atribuicoes = [f"{m[0]} = {_COMBINACOES[m[3]].format(c=m[0])}" for m in rollup.medidas]
+    if rollup.ultimo:
+        mais_recente = ("(COALESCE(EXCLUDED.ultimo_data, 'infinity'), EXCLUDED.ultimo_id) > "
+                        "(COALESCE(r.ultimo_data, 'infinity'), r.ultimo_id)")
+        atribuicoes += [f"{c} = CASE WHEN {mais_recente} THEN EXCLUDED.{c} ELSE r.{c} END"
+                        for c in ("ultimo_data", "ultimo_id", "ultimo_valor")]
+    return (
+        f"INSERT INTO {rollup.nome} AS r ({', '.join(rollup.colunas)}) {_agregar(rollup, origem)} "
+        f"ON CONFLICT ({chave}) DO UPDATE SET {', '.join(atribuicoes)}"
+    )
+
+
+def _ddl(rollup: Rollup) -> list[str]:
+    colunas = [f"{c} {tipo}" for c, tipo in _CHAVES] + [f"{rollup.coluna_balde} DATE"]
+    colunas += [f"{m[0]} {m[1]}" for m in rollup.medidas]
+    if rollup.ultimo:
+        colunas += ["ultimo_data DATE", "ultimo_id INT", "ultimo_valor NUMERIC"]
+    chave = ", ".join([c for c, _ in _CHAVES] + [rollup.coluna_balde])
+    return [
+        f"CREATE TABLE IF NOT EXISTS {rollup.nome} ({', '.join(colunas)})",
+        # linhas sem sku, cliente ou data também entram nos totais: NULL é um balde como outro
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {rollup.nome}_chave ON {rollup.nome} ({chave}) NULLS NOT DISTINCT",
+        f"CREATE INDEX IF NOT EXISTS {rollup.nome}_{rollup.coluna_balde} ON {rollup.nome} ({rollup.coluna_balde})",
+    ]
+
+
+def _funcoes(rollup: Rollup) -> list[str]:
+    t, r = rollup.tabela, rollup.nome
+    # linhas em que alguma coluna do agregado mudou (um UPDATE só de hash_linha não recalcula nada)
+    relevantes = ["data"] + [c for c, _ in _CHAVES] + list(rollup.fonte)
+    mudadas = (f"antigas a JOIN novas n USING (id) "
+               f"WHERE ({', '.join('a.' + c for c in relevantes)}) IS DISTINCT FROM "
+               f"({', '.join('n.' + c for c in relevantes)})")
+    recalculadas = (
+        f"(SELECT e.* FROM unnest(baldes) AS b(inicio) JOIN {t} e "
+        f"ON e.data >= b.inicio AND e.data < (b.inicio + INTERVAL '1 {rollup.unidade}')::date "
+        f"UNION ALL SELECT e.* FROM {t} e WHERE sem_data AND e.data IS NULL) AS e"
+    )
+    balde = f"DATE_TRUNC('{rollup.unidade}', data::timestamp)::date"
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {r}_inserir() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            {_somar(rollup, 'novas')};
+            RETURN NULL;
+        END $$
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION {r}_recalcular() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            baldes date[];
+            sem_data boolean;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                SELECT ARRAY_AGG(DISTINCT {balde}) FILTER (WHERE data IS NOT NULL), COALESCE(BOOL_OR(data IS NULL), false)
+                INTO baldes, sem_data FROM antigas;
+            ELSE
+                SELECT ARRAY_AGG(DISTINCT {balde}) FILTER (WHERE data IS NOT NULL), COALESCE(BOOL_OR(data IS NULL), false)
+                INTO baldes, sem_data
+                FROM (SELECT a.data FROM {mudadas} UNION ALL SELECT n.data FROM {mudadas}) m;
+            END IF;
+            IF baldes IS NULL AND NOT sem_data THEN
+                RETURN NULL;
+            END IF;
+            DELETE FROM {r} WHERE {rollup.coluna_balde} = ANY(baldes) OR (sem_data AND {rollup.coluna_balde} IS NULL);
+            INSERT INTO {r} ({', '.join(rollup.colunas)}) {_agregar(rollup, recalculadas)};
+            RETURN NULL;
+        END $$
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION {r}_truncar() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            TRUNCATE {r};
+            RETURN NULL;
+        END $$
+        """,
+    ]
+
+
+def _gatilhos(rollup: Rollup) -> list[str]:
+    t, r = rollup.tabela, rollup.nome
+    # tabela de transição só vale para gatilho de um evento: um por operação
+    definicoes = {
+        f"{r}_inserir": f"AFTER INSERT ON {t} REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION {r}_inserir()",
+        f"{r}_apagar": f"AFTER DELETE ON {t} REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION {r}_recalcular()",
+        f"{r}_atualizar": (f"AFTER UPDATE ON {t} REFERENCING OLD TABLE AS antigas NEW TABLE AS novas "
+                           f"FOR EACH STATEMENT EXECUTE FUNCTION {r}_recalcular()"),
+        f"{r}_truncar": f"AFTER TRUNCATE ON {t} FOR EACH STATEMENT EXECUTE FUNCTION {r}_truncar()",
+    }
+    passos = []
+    for nome, definicao in definicoes.items():
+        passos.append(f"DROP TRIGGER IF EXISTS {nome} ON {t}")
+        passos.append(f"CREATE TRIGGER {nome} {definicao}")
+    return passos
+
+
+def tem_rollup(cursor, tabela: str) -> bool:
+    """O rollup da tabela existe (migração 5 aplicada)?"""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [ROLLUPS[tabela].nome])
+    return cursor.fetchone()[0]
+
+
+def reconstruir(cursor, tabela: str) -> int:
+    """Cria (ou recria) rollup, funções e gatilhos e recalcula tudo a partir da tabela fato.
+
+    Numa transação só, com a tabela fato travada para escrita: nenhuma linha
+    gravada durante o cálculo fica de fora ou conta duas vezes. Espera um cursor
+    em autocommit, como o das migrações. Retorna o número de baldes.
+    """
+    rollup = ROLLUPS[tabela]
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute(f"LOCK TABLE {tabela} IN SHARE MODE")
+        for passo in _ddl(rollup) + _funcoes(rollup) + _gatilhos(rollup):
+            cursor.execute(passo)
+        cursor.execute(f"TRUNCATE {rollup.nome}")
+        cursor.execute(f"INSERT INTO {rollup.nome} ({', '.join(rollup.colunas)}) {_agregar(rollup, tabela)}")
+        baldes = cursor.rowcount
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute(f"ANALYZE {rollup.nome}")
+    print(f"[ROLLUP] {rollup.nome}: {baldes} baldes a partir de {tabela}")
+    return baldes
+
+
+def verificar(cursor, tabela: str) -> int:
+    """Baldes em que o rollup difere da agregação da tabela fato (0 = consistente)"""
+    rollup = ROLLUPS[tabela]
+    colunas = ", ".join(rollup.colunas)
+    calculado = f"SELECT {colunas} FROM ({_agregar(rollup, tabela)}) AS a({colunas})"
+    cursor.execute(
+        f"SELECT (SELECT COUNT(*) FROM (SELECT {colunas} FROM {rollup.nome} EXCEPT {calculado}) x) + "
+        f"(SELECT COUNT(*) FROM ({calculado} EXCEPT SELECT {colunas} FROM {rollup.nome}) y)"
+    )
+    return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollups de estoque/faturamento")
+    parser.add_argument("--status", action="store_true", help="baldes e linhas cobertas por rollup")
+    parser.add_argument("--verificar", action="store_true", help="compara cada rollup com a tabela fato")
+    parser.add_argument("--reconstruir", action="store_true", help="recria gatilhos e recalcula os rollups")
+    parser.add_argument("tabelas", nargs="*", help=f"padrão: {' '.join(ROLLUPS)}")
+    args = parser.parse_args()
+    desconhecidas = set(args.tabelas) - set(ROLLUPS)
+    if desconhecidas:
+        parser.error(f"sem rollup: {', '.join(sorted(desconhecidas))}")
+
+    pool = get_pool()
+    conn = pool.getconn()
+    divergentes = 0
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        for tabela in args.tabelas or list(ROLLUPS):
+            rollup = ROLLUPS[tabela]
+            if args.reconstruir:
+                reconstruir(cursor, tabela)
+            if not tem_rollup(cursor, tabela):
+                print(f"⚠️ {rollup.nome} não existe (rode python -m db.migrations)")
+                continue
+            if args.verificar:
+                n = verificar(cursor, tabela)
+                divergentes += n
+                print(f"{'✅' if not n else '❌'} {rollup.nome}: {n} baldes divergentes")
+            if args.status or not (args.verificar or args.reconstruir):
+                cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(linhas), 0) FROM {rollup.nome}")
+                baldes, linhas = cursor.fetchone()
+                print(f"{rollup.nome}: {baldes} baldes ({rollup.coluna_balde}) cobrindo {linhas} linhas de {tabela}")
+        cursor.close()
+    finally:
+        pool.putconn(conn)
+    sys.exit(1 if divergentes else 0)
+
+
+if __name__ == "__main__":
+    main()
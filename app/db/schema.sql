@@ -0,0 +1,57 @@
+-- Esquema das tabelas usadas pela aplicação (mesmas colunas do banco do Neon).
+-- Aplicado por `python -m db.seed` no banco local; seguro para rodar de novo.
+
+CREATE TABLE IF NOT EXISTS usuario (
+    id SERIAL PRIMARY KEY,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    senha VARCHAR(255) NOT NULL,
+    recebe_boletim BOOLEAN DEFAULT TRUE,
+    admin BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS mensagem (
+    id SERIAL PRIMARY KEY,
+    id_usuario INT REFERENCES usuario(id) ON DELETE CASCADE,
+    mensagem TEXT,
+    ia BOOLEAN,
+    envio TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS semanaboletim (
+    id SERIAL PRIMARY KEY,
+    data_inicio DATE,
+    data_fim DATE
+);
+
+CREATE TABLE IF NOT EXISTS estoque (
+    id SERIAL PRIMARY KEY,
+    data DATE,
+    cod_cliente INT,
+    es_centro VARCHAR(50),
+    tipo_material VARCHAR(100),
+    origem VARCHAR(50),
+    cod_produto VARCHAR(50),
+    lote VARCHAR(50),
+    dias_em_estoque INT,
+    produto VARCHAR(100),
+    grupo_mercadoria VARCHAR(100),
+    es_totalestoque NUMERIC,
+    sku VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS faturamento (
+    id SERIAL PRIMARY KEY,
+    data DATE,
+    cod_cliente INT,
+    lote VARCHAR(50),
+    origem VARCHAR(50),
+    zs_gr_mercad VARCHAR(100),
+    produto VARCHAR(100),
+    cod_produto VARCHAR(50),
+    zs_centro VARCHAR(50),
+    zs_cidade VARCHAR(100),
+    zs_uf VARCHAR(2),
+    zs_peso_liquido NUMERIC,
+    giro_sku_cliente NUMERIC,
+    sku VARCHAR(50)
+);
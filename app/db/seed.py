@@ -0,0 +1,158 @@
+"""Carga de dados sintéticos de estoque/faturamento para benchmarks e testes.
+
+As combinações de produto, centro, cidade etc. são sorteadas das linhas dos CSVs
+de exemplo desta pasta, então a cardinalidade das colunas fica parecida com a
+real; datas, clientes e quantidades variam. A mesma `--semente` gera os mesmos dados.
+
+Uso (a partir da pasta app/, normalmente com DB_BACKEND=local):
+    python -m db.seed --estoque 100000 --faturamento 500000
+    python -m db.seed --recriar --dias 730 --email admin@local.dev --senha admin
+"""
+import argparse
+import csv
+import pathlib
+import random
+import time
+from datetime import date, timedelta
+
+from psycopg2.extras import execute_values
+
+from db.backend import DB_BACKEND
+from db.hash_linha import COLUNAS_HASH, preencher_hash_linha, tem_hash_linha
+from db.pool import get_pool
+
+_PASTA = pathlib.Path(__file__).resolve().parent
+_SCHEMA = _PASTA / "schema.sql"
+_CSV_EXEMPLO = {"estoque": _PASTA / "estoque 1.csv", "faturamento": _PASTA / "faturamento 1.csv"}
+
+# as linhas saem nas colunas (e na ordem) do hash de conteúdo
+_COLUNAS = COLUNAS_HASH
+# variam ±50% sobre o valor da linha de exemplo; as colunas de texto são copiadas dela
+_NUMERICAS = {"es_totalestoque", "zs_peso_liquido", "giro_sku_cliente"}
+
+
+def _linhas_exemplo(tabela: str) -> list[dict]:
+    with open(_CSV_EXEMPLO[tabela], encoding="utf-8") as f:
+        linhas = []
+        for linha in csv.DictReader(f, delimiter="|"):
+            linha = {k.lower(): (v or "").strip() for k, v in linha.items()}
+            linhas.append(linha)
+    return linhas
+
+
+def gerar_linhas(tabela: str, quantidade: int, dias: int, rng: random.Random):
+    """Gera tuplas na ordem de _COLUNAS[tabela]"""
+    exemplos = _linhas_exemplo(tabela)
+    clientes = sorted({int(l["cod_cliente"]) for l in exemplos})
+    hoje = date.today()
+    for _ in range(quantidade):
+        base = rng.choice(exemplos)
+        linha = []
+        for coluna in _COLUNAS[tabela]:
+            if coluna == "data":
+                linha.append(hoje - timedelta(days=rng.randrange(dias)))
+            elif coluna == "cod_cliente":
+                linha.append(rng.choice(clientes))
+            elif coluna == "dias_em_estoque":
+                linha.append(rng.randrange(400))
+            elif coluna in _NUMERICAS:
+                linha.append(round(float(base[coluna]) * rng.uniform(0.5, 1.5), 3))
+            else:
+                linha.append(base[coluna])
+        yield tuple(linha)
+
+
+def aplicar_schema(recriar: bool = False) -> None:
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        if recriar:
+            cursor.execute("DROP TABLE IF EXISTS estoque, faturamento, mensagem, semanaboletim, usuario CASCADE")
+        cursor.execute(_SCHEMA.read_text(encoding="utf-8"))
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+
+
+def popular(tabela: str, quantidade: int, dias: int = 365, semente: int = 42, lote: int = 5000) -> int:
+    """Insere `quantidade` linhas sintéticas na tabela; retorna quantas foram inseridas"""
+    rng = random.Random(f"{semente}-{tabela}")
+    sql = f"INSERT INTO {tabela} ({', '.join(_COLUNAS[tabela])}) VALUES %s"
+    pool = get_pool()
+    conn = pool.getconn()
+    inseridas = 0
+    try:
+        cursor = conn.cursor()
+        pendentes = []
+        for linha in gerar_linhas(tabela, quantidade, dias, rng):
+            pendentes.append(linha)
+            if len(pendentes) >= lote:
+                execute_values(cursor, sql, pendentes, page_size=lote)
+                inseridas += len(pendentes)
+                pendentes = []
+        if pendentes:
+            execute_values(cursor, sql, pendentes, page_size=lote)
+            inseridas += len(pendentes)
+        conn.commit()
+        conn.autocommit = True
+        # com a migração 4 aplicada, as linhas novas também ganham hash_linha
+        if tem_hash_linha(cursor, tabela):
+            preencher_hash_linha(cursor, tabela)
+        # estatísticas atualizadas para o planner (EXPLAIN das consultas quentes)
+        cursor.execute(f"ANALYZE {tabela}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+    return inseridas
+
+
+def criar_usuario(email: str, senha: str) -> None:
+    """Cria (ou mantém) um administrador para logar nos benchmarks de rota"""
+    from services.auth_service import get_password_hash
+
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO usuario (email, senha, recebe_boletim, admin) VALUES (%s, %s, TRUE, TRUE) "
+            "ON CONFLICT (email) DO NOTHING",
+            [email, get_password_hash(senha)],
+        )
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula o banco com dados sintéticos de estoque/faturamento")
+    parser.add_argument("--estoque", type=int, default=50000, help="linhas de estoque")
+    parser.add_argument("--faturamento", type=int, default=200000, help="linhas de faturamento")
+    parser.add_argument("--dias", type=int, default=365, help="datas espalhadas pelos últimos N dias")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--recriar", action="store_true", help="apaga e recria as tabelas antes da carga")
+    parser.add_argument("--email", help="cria um usuário administrador com este email")
+    parser.add_argument("--senha", default="admin")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="permite popular um banco que não seja o local (DB_BACKEND=neon)")
+    args = parser.parse_args()
+
+    if DB_BACKEND != "local" and not args.permitir_remoto:
+        parser.error("DB_BACKEND não é 'local'; use --permitir-remoto para popular DATABASE_URL mesmo assim")
+
+    aplicar_schema(args.recriar)
+    for tabela, quantidade in (("estoque", args.estoque), ("faturamento", args.faturamento)):
+        inicio = time.perf_counter()
+        inseridas = popular(tabela, quantidade, args.dias, args.semente)
+        duracao = time.perf_counter() - inicio
+        print(f"✅ {tabela}: {inseridas} linhas em {duracao:.1f}s ({inseridas / max(duracao, 1e-9):.0f} linhas/s)")
+    if args.email:
+        criar_usuario(args.email, args.senha)
+        print(f"✅ usuário {args.email} disponível")
+
+
+if __name__ == "__main__":
+    main()
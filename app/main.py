@@ -8,6 +8,7 @@ if str(_BASE_DIR) not in sys.path:
     sys.path.insert(0, str(_BASE_DIR))
 
 import asyncio
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.auth import router as auth_router  
@@ -15,6 +16,13 @@ from routes.user import router as user_router
 from routes.csv import router as csv_router  
 from routes.envio_relatorio import router as envio_relatorio_router, verificar_envio_semanal
 from routes.password_recovery import router as password_router
+from routes.admin import router as admin_router
+from db.pool import get_pool, fechar_pool
+from db.async_neon_db import get_async_pool, fechar_async_pool
+from db.migrations import aplicar_migracoes
+from db.particionamento import manter_particoes
+from services.csv_jobs import encerrar_jobs
+from services.modelos import precarregar
 from contextlib import asynccontextmanager
 
 # Função de verificação periódica
@@ -22,7 +30,8 @@ async def agendar_verificacao_boletim():
     while True:
         try:
             print("Executando verificação automática do boletim...")
-            verificar_envio_semanal()
+            # fora do event loop: gerar o boletim não trava as requisições
+            await asyncio.to_thread(verificar_envio_semanal)
         except Exception as e:
             print(f"Erro ao executar verificação do boletim: {e}")
         
@@ -30,18 +39,59 @@ async def agendar_verificacao_boletim():
         # ou: await asyncio.sleep(60 * 60 * 24)  # uma vez por dia
 
 
+# Cria as partições mensais dos próximos meses (só age se estoque/faturamento forem particionadas)
+async def agendar_manutencao_particoes():
+    while True:
+        try:
+            await asyncio.to_thread(manter_particoes)
+        except Exception as e:
+            print(f"Erro na manutenção das partições: {e}")
+
+        await asyncio.sleep(60 * 60 * 24)  # uma vez por dia
+
+
 # Define ciclo de vida da aplicação (startup/shutdown)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Iniciando aplicação e agendando boletim automático...")
 
+    # Migrações de índices (opcional; também dá para rodar `python -m db.migrations`)
+    if os.getenv("DB_MIGRATE_ON_STARTUP", "0").lower() in ("1", "true", "sim"):
+        try:
+            await asyncio.to_thread(aplicar_migracoes)
+        except Exception as e:
+            print(f"Aviso: falha ao aplicar migrações: {e}")
+
+    # Abre as conexões mínimas do pool antes do primeiro request
+    try:
+        get_pool().warmup()
+    except Exception as e:
+        print(f"Aviso: não foi possível pré-abrir o pool de conexões: {e}")
+    try:
+        await get_async_pool()
+    except Exception as e:
+        print(f"Aviso: não foi possível abrir o pool assíncrono: {e}")
+
+    # Carrega o modelo do boletim/chat antes do primeiro uso (opcional; senão carrega no primeiro boletim)
+    if os.getenv("LLM_PRELOAD_ON_STARTUP", "0").lower() in ("1", "true", "sim"):
+        try:
+            await asyncio.to_thread(precarregar)
+        except Exception as e:
+            print(f"Aviso: falha ao pré-carregar o modelo: {e}")
+
     # Inicia a tarefa em background (não bloqueia o servidor)
     task = asyncio.create_task(agendar_verificacao_boletim())
+    task_particoes = asyncio.create_task(agendar_manutencao_particoes())
 
     yield  # mantém o app rodando normalmente
 
     # Encerra ao desligar o app
     task.cancel()
+    task_particoes.cancel()
+    # espera os uploads em andamento antes de fechar o pool
+    await asyncio.to_thread(encerrar_jobs)
+    fechar_pool()
+    await fechar_async_pool()
     print("Encerrando aplicação e parando agendamento.")
 
 app = FastAPI(lifespan=lifespan)
@@ -63,12 +113,18 @@ app.include_router(user_router)
 app.include_router(csv_router) 
 app.include_router(envio_relatorio_router)
 app.include_router(password_router)
+app.include_router(admin_router)
 
 
 if __name__ == "__main__":
     import uvicorn
     print("Iniciando servidor FastAPI sem reload...")
+    # O driver assíncrono do psycopg não funciona com o ProactorEventLoop padrão do Windows
+    loop = "auto"
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        loop = "none"
     try:
-        uvicorn.run(app, host="127.0.0.1", port=8000, reload=False, log_level="info")
+        uvicorn.run(app, host="127.0.0.1", port=8000, reload=False, log_level="info", loop=loop)
     except Exception as e:
         print(f"Falha ao iniciar uvicorn: {e}")
\ No newline at end of file
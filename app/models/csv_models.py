@@ -1,8 +1,32 @@
 from pydantic import BaseModel, field_validator
 from datetime import date
+from typing import Any, ClassVar, NamedTuple
 from models.estoque_model import EstoqueModel
 from models.faturamento_model import FaturamentoModel
 
+
+class RegraCampo(NamedTuple):
+    """Regra de validação de um campo do CSV.
+
+    Aplicada pelos validadores dos modelos abaixo (linha a linha) e, em lote, por
+    services/validacao_csv.py; declarar a regra aqui mantém os dois caminhos iguais.
+    """
+    tipo: str  # "nao_negativo" ou "uf"
+    mensagem: str
+
+
+def aplicar_regra(regra: RegraCampo, v: Any) -> Any:
+    if regra.tipo == "nao_negativo":
+        if v < 0:
+            raise ValueError(regra.mensagem)
+        return v
+    if regra.tipo == "uf":
+        if len(v) != 2:
+            raise ValueError(regra.mensagem)
+        return v.upper()
+    raise ValueError(f"Regra desconhecida: {regra.tipo}")
+
+
 class EstoqueCsvModel(BaseModel):
     """Modelo Pydantic para validação de dados CSV de estoque"""
     data: date
@@ -18,19 +42,20 @@ class EstoqueCsvModel(BaseModel):
     es_totalestoque: float
     SKU: str
 
+    REGRAS: ClassVar[dict[str, RegraCampo]] = {
+        'dias_em_estoque': RegraCampo("nao_negativo", 'Dias em estoque não pode ser negativo'),
+        'es_totalestoque': RegraCampo("nao_negativo", 'Estoque total não pode ser negativo'),
+    }
+
     @field_validator('dias_em_estoque')
     @classmethod
     def validate_dias_estoque(cls, v):
-        if v < 0:
-            raise ValueError('Dias em estoque não pode ser negativo')
-        return v
+        return aplicar_regra(cls.REGRAS['dias_em_estoque'], v)
 
     @field_validator('es_totalestoque')
     @classmethod
     def validate_estoque(cls, v):
-        if v < 0:
-            raise ValueError('Estoque total não pode ser negativo')
-        return v
+        return aplicar_regra(cls.REGRAS['es_totalestoque'], v)
 
     def to_estoque_model(self) -> EstoqueModel:
         """Converte para o modelo original"""
@@ -65,19 +90,21 @@ class FaturamentoCsvModel(BaseModel):
     giro_sku_cliente: float
     SKU: str
 
+    REGRAS: ClassVar[dict[str, RegraCampo]] = {
+        'zs_uf': RegraCampo("uf", 'UF deve ter exatamente 2 caracteres'),
+        'zs_peso_liquido': RegraCampo("nao_negativo", 'Valores devem ser positivos'),
+        'giro_sku_cliente': RegraCampo("nao_negativo", 'Valores devem ser positivos'),
+    }
+
     @field_validator('zs_peso_liquido', 'giro_sku_cliente')
     @classmethod
-    def validate_positive_numbers(cls, v):
-        if v < 0:
-            raise ValueError('Valores devem ser positivos')
-        return v
+    def validate_positive_numbers(cls, v, info):
+        return aplicar_regra(cls.REGRAS[info.field_name], v)
 
     @field_validator('zs_uf')
     @classmethod
     def validate_uf(cls, v):
-        if len(v) != 2:
-            raise ValueError('UF deve ter exatamente 2 caracteres')
-        return v.upper()
+        return aplicar_regra(cls.REGRAS['zs_uf'], v)
 
     def to_faturamento_model(self) -> FaturamentoModel:
         """Converte para o modelo original"""
@@ -1,5 +1,5 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
-from statistics import mean
 import math
 
 from .estoque_model import EstoqueModel
@@ -50,132 +50,182 @@ class DadosBoletimModel:
 
     @staticmethod
     def from_raw_data(dados_estoque: list[EstoqueModel], dados_faturamento: list[FaturamentoModel]) -> DadosBoletimModel:
-        reference_date = datetime.now()
-        cutoff = reference_date - timedelta(weeks=52)
+        acumulador = AcumuladorBoletim()
+        for e in dados_estoque:
+            acumulador.adicionar_estoque(e)
+        for f in dados_faturamento:
+            acumulador.adicionar_faturamento(f)
+        return acumulador.gerar_modelo()
+
+    def get_report_str(self) -> str:
+        skus_alto = ", ".join(map(str, self.skus_alto_giro_sem_estoque)) or "nenhum"
+        itens_repor = ", ".join(map(str, self.itens_a_repor)) or "nenhum"
+        return (
+            f"A quantidade total de estoque consumido em toneladas nas últimas 52 semanas foi de {self.qtd_estoque_consumido_ton} t.\n"
+            f"A frequência de compra (meses com zs_peso_liquido > 0) nas últimas 52 semanas foi de {self.freq_compra} meses.\n"
+            f"O valor do aging de estoque (em semanas) mínimo, médio e máximo foram respectivamente {self.valor_aging_min}, {self.valor_aging_avg} e {self.valor_aging_max} semanas.\n"
+            f"O número de clientes que consomem o SKU_1 é {self.qtd_consomem_sku1}.\n"
+            f"Os SKUs de alto giro e alta frequência que estão sem estoque: {skus_alto}.\n"
+            f"Os itens que precisam ser repostos: {itens_repor}.\n"
+            f"O risco de desabastecimento do SKU_1 é: {self.risco_desabastecimento_sku1}."
+        )
 
-        estoque_filtered = []
-        faturamento_filtered = []
 
+class AcumuladorBoletim:
+    """Calcula os indicadores do boletim registro a registro, com agregados corridos.
+
+    Permite consumir estoque/faturamento em lotes (ex.: NeonDB.stream) sem manter
+    as listas inteiras em memória; o estado cresce só com o número de SKUs,
+    clientes do SKU_1 e meses distintos. Os métodos adicionar_agregado_* recebem
+    as mesmas somas já agregadas por SKU (rollups de db/rollups.py).
+    """
+
+    def __init__(self, reference_date: datetime | None = None):
+        self.reference_date = reference_date or datetime.now()
+        self.cutoff = self.reference_date - timedelta(weeks=52)
+
+        self.qtd_estoque_consumido = 0.0
+        self.meses_com_compra: set[tuple] = set()
+        self.aging_qtd = 0
+        self.aging_soma = 0.0
+        self.aging_min = math.inf
+        self.aging_max = -math.inf
+        self.clientes_sku1: set = set()
+        # por SKU: [soma, quantidade]
+        self.giro_por_sku = defaultdict(lambda: [0.0, 0])
+        # por SKU: [soma, quantidade, último valor, algum valor != 0]
+        self.estoque_por_sku = defaultdict(lambda: [0.0, 0, 0.0, False])
+
+    def _no_periodo(self, d) -> bool:
         # filtrar por últimas 52 semanas
-        for e in dados_estoque:
-            d = e.data
-            if d is None or d >= cutoff:
-                estoque_filtered.append(e)
+        return d is None or d >= self.cutoff
 
-        for f in dados_faturamento:
-            d = f.data
-            if d is None or d >= cutoff:
-                faturamento_filtered.append(f)
+    def adicionar_estoque(self, e: EstoqueModel) -> None:
+        if not self._no_periodo(e.data):
+            return
 
         # qtd_estoque_consumido_ton
-        qtd_estoque_consumido = sum(
-            float(e.es_totalestoque or 0) for e in estoque_filtered
-        )
-
-        # freq_compra: meses com zs_peso_liquido > 0
-        meses_com_compra: set[tuple] = set()
-        for f in faturamento_filtered:
-            peso = f.zs_peso_liquido or 0
-            d = f.data
-            if peso > 0:
-                if d:
-                    meses_com_compra.add((d.year, d.month))
-                else:pass
-        freq_compra = len(meses_com_compra)
+        self.qtd_estoque_consumido += float(e.es_totalestoque or 0)
 
         # aging (dias_em_estoque -> semanas)
-        dias_lista = []
-        for e in estoque_filtered:
-            val = e.dias_em_estoque
-            if val is None:
-                continue
+        if e.dias_em_estoque is not None:
             try:
-                dias_lista.append(float(val))
+                semanas = float(e.dias_em_estoque) / 7.0
+                self.aging_qtd += 1
+                self.aging_soma += semanas
+                self.aging_min = min(self.aging_min, semanas)
+                self.aging_max = max(self.aging_max, semanas)
             except Exception:
-                continue
+                pass
 
-        if dias_lista:
-            semanas = [d / 7.0 for d in dias_lista]
-            valor_aging_min = min(semanas)
-            valor_aging_avg = mean(semanas)
-            valor_aging_max = max(semanas)
-        else:
-            valor_aging_min = valor_aging_avg = valor_aging_max = 0.0
+        # clientes que consomem SKU_1
+        if e.SKU == "SKU_1" and e.cod_cliente is not None:
+            self.clientes_sku1.add(e.cod_cliente)
 
-        # qtd de clientes que consomem SKU_1
-        clientes_sku1 = {
-            e.cod_cliente
-            for e in estoque_filtered
-            if e.SKU == "SKU_1"
-            and e.cod_cliente is not None
-        }
-        qtd_consomem_sku1 = len(clientes_sku1)
-
-        # identificar SKUs de alto giro (top quantil)
-        # coletar giro por SKU a partir de faturamento (agregando média por SKU)
-        from collections import defaultdict
-
-        giro_vals_by_sku = defaultdict(list)
-        for f in faturamento_filtered:
-            sku = f.SKU
-            giro = f.giro_sku_cliente
-            if sku is None or giro is None:
-                continue
+        # estoque agregado e último registro por SKU
+        if e.SKU is not None:
             try:
-                giro_vals_by_sku[sku].append(float(giro))
+                valor = float(e.es_totalestoque or 0)
             except Exception:
-                continue
+                return
+            agregado = self.estoque_por_sku[e.SKU]
+            agregado[0] += valor
+            agregado[1] += 1
+            agregado[2] = valor
+            agregado[3] = agregado[3] or valor != 0
 
-        # média de giro por SKU
-        giro_media_por_sku = {}
-        for sku, vals in giro_vals_by_sku.items():
-            if vals:
-                giro_media_por_sku[sku] = mean(vals)
-        giro_medias_sorted = sorted(giro_media_por_sku.values())
+    def adicionar_faturamento(self, f: FaturamentoModel) -> None:
+        if not self._no_periodo(f.data):
+            return
+
+        # freq_compra: meses com zs_peso_liquido > 0
+        peso = f.zs_peso_liquido or 0
+        if peso > 0 and f.data:
+            self.meses_com_compra.add((f.data.year, f.data.month))
+
+        # giro por SKU (média calculada no final)
+        if f.SKU is None or f.giro_sku_cliente is None:
+            return
+        try:
+            giro = float(f.giro_sku_cliente)
+        except Exception:
+            return
+        agregado = self.giro_por_sku[f.SKU]
+        agregado[0] += giro
+        agregado[1] += 1
+
+    def adicionar_agregado_estoque(self, sku, linhas: int, soma, nao_zero: int, dias_qtd: int, dias_soma,
+                                   dias_min, dias_max, ultimo, clientes) -> None:
+        """Equivale a adicionar_estoque em todas as linhas do SKU na janela (ex.: somadas do rollup_estoque).
+
+        `ultimo` é o estoque da linha mais recente (data, id), então cada SKU entra uma
+        vez só e não se mistura com adicionar_estoque.
+        """
+        soma = float(soma or 0)
+        self.qtd_estoque_consumido += soma
+
+        if dias_qtd:
+            self.aging_qtd += dias_qtd
+            self.aging_soma += float(dias_soma) / 7.0
+            self.aging_min = min(self.aging_min, float(dias_min) / 7.0)
+            self.aging_max = max(self.aging_max, float(dias_max) / 7.0)
+
+        if sku == "SKU_1" and clientes:
+            self.clientes_sku1.update(clientes)
+
+        if sku is not None and linhas:
+            agregado = self.estoque_por_sku[sku]
+            agregado[0] += soma
+            agregado[1] += linhas
+            agregado[2] = float(ultimo or 0)
+            agregado[3] = agregado[3] or nao_zero > 0
+
+    def adicionar_agregado_faturamento(self, sku, mes, com_peso: int, giro_qtd: int, giro_soma) -> None:
+        """Equivale a adicionar_faturamento nas linhas de um (SKU, mês) da janela (ex.: do rollup_faturamento)"""
+        if com_peso:
+            self.meses_com_compra.add((mes.year, mes.month))
+        if sku is not None and giro_qtd:
+            agregado = self.giro_por_sku[sku]
+            agregado[0] += float(giro_soma)
+            agregado[1] += giro_qtd
+
+    def gerar_modelo(self) -> DadosBoletimModel:
+        if self.aging_qtd:
+            valor_aging_min = self.aging_min
+            valor_aging_avg = self.aging_soma / self.aging_qtd
+            valor_aging_max = self.aging_max
+        else:
+            valor_aging_min = valor_aging_avg = valor_aging_max = 0.0
 
-        # high_giro_quantile e giro_cutoff
-        # quantil a usar (75º percentil -> top 25%)
+        # identificar SKUs de alto giro (top quantil: 75º percentil -> top 25%)
+        giro_media_por_sku = {sku: soma / qtd for sku, (soma, qtd) in self.giro_por_sku.items() if qtd}
+        giro_medias_sorted = sorted(giro_media_por_sku.values())
         high_giro_quantile = 75.0
         giro_cutoff = DadosBoletimModel._percentile(giro_medias_sorted, high_giro_quantile) if giro_medias_sorted else float("inf")
         skus_alto_giro = {sku for sku, g in giro_media_por_sku.items() if g >= giro_cutoff}
 
-        # estoque atual por SKU (último registro) e estoque agregado
-        estoque_por_sku = defaultdict(list)
-        for e in estoque_filtered:
-            sku = e.SKU
-            if sku is None:
-                continue
-            try:
-                estoque_por_sku[sku].append(float(e.es_totalestoque or 0))
-            except Exception:
-                continue
-
-        # low_stock_threshold baseado nas médias de estoque por SKU
-        avg_stock_per_sku = [mean(vals) for vals in estoque_por_sku.values() if vals]
-        avg_stock_per_sku_sorted = sorted(avg_stock_per_sku)
-        # usamos 25º percentil das médias de estoque como threshold automático
+        # low_stock_threshold: 25º percentil das médias de estoque por SKU
+        media_estoque_por_sku = {sku: soma / qtd for sku, (soma, qtd, _, _) in self.estoque_por_sku.items() if qtd}
+        avg_stock_per_sku_sorted = sorted(media_estoque_por_sku.values())
         low_stock_threshold = DadosBoletimModel._percentile(avg_stock_per_sku_sorted, 25.0) if avg_stock_per_sku_sorted else 0.0
 
-        # definir SKUs de alto giro sem estoque (algum registro com es_totalestoque == 0 OU média 0)
-        skus_alto_giro_sem_estoque = []
-        for sku in skus_alto_giro:
-            vals = estoque_por_sku.get(sku, [])
-            if not vals or all(v == 0 for v in vals):
-                skus_alto_giro_sem_estoque.append(sku)
+        # SKUs de alto giro sem estoque (nenhum registro ou todos com es_totalestoque == 0)
+        skus_alto_giro_sem_estoque = [
+            sku for sku in skus_alto_giro
+            if sku not in self.estoque_por_sku or not self.estoque_por_sku[sku][3]
+        ]
 
         # itens a repor: SKUs de alto giro com estoque médio baixo
-        itens_a_repor = []
-        for sku in skus_alto_giro:
-            vals = estoque_por_sku.get(sku, [])
-            avg_stock = mean(vals) if vals else 0.0
-            if avg_stock < low_stock_threshold:
-                itens_a_repor.append(sku)
+        itens_a_repor = [
+            sku for sku in skus_alto_giro
+            if media_estoque_por_sku.get(sku, 0.0) < low_stock_threshold
+        ]
 
         # risco de desabastecimento do SKU_1
-        sku1_vals = estoque_por_sku.get("SKU_1", [])
-        if sku1_vals:
-            atual = sku1_vals[-1]
-            media = mean(sku1_vals)
+        sku1 = self.estoque_por_sku.get("SKU_1")
+        if sku1 and sku1[1]:
+            atual = sku1[2]
+            media = sku1[0] / sku1[1]
             ratio = atual / media if media and media != 0 else float("inf") if atual > 0 else 0.0
             if media == 0 and atual == 0:
                 risco = "indefinido (não há histórico de estoque)"
@@ -191,26 +241,13 @@ class DadosBoletimModel:
             risco = "indefinido (nenhum registro de SKU_1 nas últimas 52 semanas)"
 
         return DadosBoletimModel(
-            qtd_estoque_consumido_ton=round(qtd_estoque_consumido, 3),
-            freq_compra=freq_compra,
+            qtd_estoque_consumido_ton=round(self.qtd_estoque_consumido, 3),
+            freq_compra=len(self.meses_com_compra),
             valor_aging_min=round(valor_aging_min, 2),
             valor_aging_avg=round(valor_aging_avg, 2),
             valor_aging_max=round(valor_aging_max, 2),
-            qtd_consomem_sku1=qtd_consomem_sku1,
+            qtd_consomem_sku1=len(self.clientes_sku1),
             skus_alto_giro_sem_estoque=sorted(skus_alto_giro_sem_estoque),
             itens_a_repor=sorted(itens_a_repor),
             risco_desabastecimento_sku1=risco,
         )
-
-    def get_report_str(self) -> str:
-        skus_alto = ", ".join(map(str, self.skus_alto_giro_sem_estoque)) or "nenhum"
-        itens_repor = ", ".join(map(str, self.itens_a_repor)) or "nenhum"
-        return (
-            f"A quantidade total de estoque consumido em toneladas nas últimas 52 semanas foi de {self.qtd_estoque_consumido_ton} t.\n"
-            f"A frequência de compra (meses com zs_peso_liquido > 0) nas últimas 52 semanas foi de {self.freq_compra} meses.\n"
-            f"O valor do aging de estoque (em semanas) mínimo, médio e máximo foram respectivamente {self.valor_aging_min}, {self.valor_aging_avg} e {self.valor_aging_max} semanas.\n"
-            f"O número de clientes que consomem o SKU_1 é {self.qtd_consomem_sku1}.\n"
-            f"Os SKUs de alto giro e alta frequência que estão sem estoque: {skus_alto}.\n"
-            f"Os itens que precisam ser repostos: {itens_repor}.\n"
-            f"O risco de desabastecimento do SKU_1 é: {self.risco_desabastecimento_sku1}."
-        )
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from db.pool import get_pool
+from db.async_neon_db import async_pool_stats
+from db import query_stats
+from db.migrations import status_migracoes, verificar_indices
+from models.user import User
+from services import cache_prefixo, lote_geracao, modelos
+from services.auth_service import get_current_active_user
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    responses={404: {"description": "Não encontrado"}},
+)
+
+
+def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    """Garante que o usuário autenticado é administrador"""
+    if not current_user.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores"
+        )
+    return current_user
+
+
+@router.get("/db/pool")
+def estatisticas_pool(current_user: User = Depends(get_current_admin_user)):
+    """Retorna o estado do pool de conexões (em uso, ociosas, tempo de espera)"""
+    return get_pool().stats()
+
+
+@router.get("/db/pool/async")
+def estatisticas_pool_async(current_user: User = Depends(get_current_admin_user)):
+    """Retorna as estatísticas do pool assíncrono usado pelas rotas async"""
+    return async_pool_stats()
+
+
+@router.get("/db/queries")
+def consultas_mais_custosas(
+    limite: int = Query(10, ge=1, le=100),
+    ordem: str = Query("total", pattern="^(total|p95)$"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Top-N fingerprints de SQL por tempo total ou p95 na janela em memória"""
+    return {
+        "janela": query_stats.resumo_janela(),
+        "consultas": query_stats.top(limite, ordem),
+    }
+
+
+@router.get("/db/queries/lentas")
+def consultas_lentas(current_user: User = Depends(get_current_admin_user)):
+    """Últimas execuções acima de DB_SLOW_QUERY_MS"""
+    return query_stats.lentas()
+
+
+@router.get("/db/indices")
+def verificar_indices_banco(current_user: User = Depends(get_current_admin_user)):
+    """Migrações aplicadas e EXPLAIN das consultas quentes (usam os índices?)"""
+    return {
+        "migracoes": status_migracoes(),
+        "consultas": verificar_indices(),
+    }
+
+
+@router.get("/modelos")
+def modelos_carregados(current_user: User = Depends(get_current_admin_user)):
+    """Modelos de linguagem carregados no processo (tempo de carga e RSS), prefixos de prompt em cache e lotes de geração"""
+    return {
+        **modelos.estatisticas(),
+        "prefixos_kv": cache_prefixo.estatisticas(),
+        "lotes_geracao": lote_geracao.estatisticas(),
+    }
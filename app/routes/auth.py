@@ -4,7 +4,7 @@ from datetime import timedelta
 
 from models.user import User
 from services.auth_service import (
-    authenticate_user,
+    authenticate_user_async,
     create_access_token,
     get_current_active_user,
 )
@@ -16,7 +16,7 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     # Autentica usuário
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user_async(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
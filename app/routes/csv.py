@@ -1,5 +1,13 @@
+import asyncio
+from enum import Enum
+from functools import lru_cache
+from typing import List
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from services.csv_service import CsvService
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from services.csv_jobs import FilaCheiaError, get_gerenciador
+from services.esquemas_ingestao import ESQUEMAS
+from services.formatos_upload import EXTENSOES, formato_upload
 from models.csv_models import CsvTextRequest
 
 router = APIRouter(
@@ -8,40 +16,65 @@ router = APIRouter(
     responses={404: {"description": "Não encontrado"}},
 )
 
-csv_service = CsvService()
 
-@router.post("/faturamento/upload")
-async def upload_csv_faturamento(file: UploadFile = File(...)):
-    """Faz upload de um arquivo CSV de faturamento e processa os dados."""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV")
-    
-    try:
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        return csv_service.processar_csv_faturamento(csv_content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar arquivo: {str(e)}")
+@lru_cache(maxsize=1)
+def get_csv_service():
+    """CsvService criado no primeiro uso (pandas/numpy da validação não pesam no startup da API)"""
+    from services.csv_service import CsvService
+    return CsvService()
+
+
+# uma rota de upload/texto por descritor em ESQUEMAS; tabela fora da lista dá 422
+TabelaIngestao = Enum("TabelaIngestao", {nome: nome for nome in ESQUEMAS}, type=str)
+
+async def _enfileirar(tabela: str, files: List[UploadFile], aguardar: bool, lote: bool = False):
+    for file in files:
+        if formato_upload(file.filename) is None:
+            raise HTTPException(status_code=400, detail=f"Arquivo deve ser um CSV ou Parquet/Arrow ({EXTENSOES}): {file.filename}")
 
-@router.post("/estoque/upload")
-async def upload_csv_estoque(file: UploadFile = File(...)):
-    """Faz upload de um arquivo CSV de estoque e processa os dados."""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV")
-    
     try:
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        return csv_service.processar_csv_estoque(csv_content)
+        # copia o upload para o job fora do event loop
+        if lote:
+            job = await run_in_threadpool(get_gerenciador().enviar_lote, tabela, [(f.filename, f.file) for f in files])
+        else:
+            job = await run_in_threadpool(get_gerenciador().enviar, tabela, files[0].filename, files[0].file)
+    except FilaCheiaError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar arquivo: {str(e)}")
 
-@router.post("/faturamento/text")
-def processar_csv_faturamento_text(request: CsvTextRequest):
-    """Processa CSV de faturamento a partir de texto."""
-    return csv_service.processar_csv_faturamento(request.csv_content)
+    if not aguardar:
+        return JSONResponse(status_code=202, content={
+            "job_id": job.id,
+            "status": job.status,
+            "url": f"/csv/jobs/{job.id}",
+        })
+
+    # modo antigo: responde só ao fim do processamento
+    await asyncio.wrap_future(job.future)
+    if job.resultado is None:
+        raise HTTPException(status_code=500, detail=job.erro)
+    return job.resultado
+
+@router.post("/{tabela}/upload")
+async def upload_csv(tabela: TabelaIngestao, file: UploadFile = File(...), aguardar: bool = False):
+    """Enfileira o processamento de um arquivo da tabela e devolve o id do job (ou o resultado, com aguardar=true)."""
+    return await _enfileirar(tabela.value, [file], aguardar)
+
+@router.post("/{tabela}/lote")
+async def upload_lote(tabela: TabelaIngestao, files: List[UploadFile] = File(...), aguardar: bool = False):
+    """Enfileira vários arquivos da tabela num job só, validados em paralelo num pool de processos."""
+    return await _enfileirar(tabela.value, files, aguardar, lote=True)
+
+@router.get("/jobs/{job_id}")
+def status_job(job_id: str):
+    """Progresso de um job de upload: registros gravados e recusados, linhas/s e tempo restante estimado."""
+    job = get_gerenciador().obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.to_dict()
 
-@router.post("/estoque/text")
-def processar_csv_estoque_text(request: CsvTextRequest):
-    """Processa CSV de estoque a partir de texto."""
-    return csv_service.processar_csv_estoque(request.csv_content)
+@router.post("/{tabela}/text")
+def processar_csv_text(tabela: TabelaIngestao, request: CsvTextRequest):
+    """Processa CSV da tabela a partir de texto."""
+    return get_csv_service().processar_csv(ESQUEMAS[tabela.value], request.csv_content)
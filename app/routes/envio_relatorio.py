@@ -1,5 +1,4 @@
-import os
-from datetime import datetime, timedelta, date, time
+from datetime import datetime, timedelta
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
@@ -7,18 +6,14 @@ from pydantic import BaseModel
 from services.enviar_email import enviar_email
 from models.relatorio_model import get_usuarios_boletim
 from services.boletim_service import BoletimService
-from models.dados_boletim_model import DadosBoletimModel
-from models.estoque_model import EstoqueModel
-from models.faturamento_model import FaturamentoModel
+from models.dados_boletim_model import AcumuladorBoletim
 from models.envio_semanal_model import _ler_periodo_banco
 from models.envio_semanal_model import _salvar_periodo_banco
 from db.neon_db import NeonDB
-from services.carregar_dados_db import CarregadorDadosDB
+from services.dados_boletim import acumular_linhas, acumular_rollups, tem_rollups
 
 router = APIRouter()
 
-
-
 def _gerar_periodo_boletim() -> tuple[datetime, datetime]:
     """Gera período do boletim a partir do banco, sempre retornando datetime."""
     data_inicio, data_fim = _ler_periodo_banco()
@@ -125,6 +120,9 @@ def verificar_envio_semanal():
         if not data_fim_antiga:
             print("Nenhum envio anterior encontrado. Gerando primeiro boletim...")
 
+            # pandas só é importado aqui, no primeiro boletim
+            from services.carregar_dados_db import CarregadorDadosDB
+
             carregador = CarregadorDadosDB()
             primeira_data = carregador.obter_primeira_data()
 
@@ -178,84 +176,21 @@ def enviar_relatorio():
         # 2️⃣ Período atual do boletim
         data_inicio, data_fim = _gerar_periodo_boletim()
 
-        # 3️⃣ Buscar dados no banco Neon
+        # 3️⃣ Buscar dados no banco Neon e 4️⃣ processar indicadores
+        # com a migração 5 os indicadores saem dos rollups (algumas linhas por SKU);
+        # sem ela as linhas chegam em lotes (cursor server-side) e alimentam o acumulador
         print("Conectando ao banco Neon...")
+        acumulador = AcumuladorBoletim()
         with NeonDB() as db:
-            # 🔹 Query Estoque
-            estoque_rows = db.query("""
-                SELECT
-                    data,
-                    cod_cliente,
-                    es_centro,
-                    tipo_material,
-                    origem,
-                    cod_produto,
-                    lote,
-                    dias_em_estoque,
-                    produto,
-                    grupo_mercadoria,
-                    es_totalestoque,
-                    sku AS "SKU"
-                FROM estoque
-            """)
-
-            # 🔹 Query Faturamento
-            faturamento_rows = db.query("""
-                SELECT
-                    data,
-                    cod_cliente,
-                    lote,
-                    origem,
-                    zs_gr_mercad,
-                    produto,
-                    cod_produto,
-                    zs_centro,
-                    zs_cidade,
-                    zs_uf,
-                    zs_peso_liquido,
-                    giro_sku_cliente,
-                    sku AS "SKU"
-                FROM faturamento
-                WHERE data BETWEEN %s AND %s
-            """, [data_inicio, data_fim])
-
-        print(f"✅ {len(estoque_rows)} registros de estoque, {len(faturamento_rows)} de faturamento")
-
-        # 4️⃣ Converter para modelos — garantindo compatibilidade com campos
-        colunas_estoque = [
-            "data", "cod_cliente", "es_centro", "tipo_material", "origem", "cod_produto",
-            "lote", "dias_em_estoque", "produto", "grupo_mercadoria",
-            "es_totalestoque", "SKU"
-        ]
-        colunas_faturamento = [
-            "data", "cod_cliente", "lote", "origem", "zs_gr_mercad", "produto",
-            "cod_produto", "zs_centro", "zs_cidade", "zs_uf",
-            "zs_peso_liquido", "giro_sku_cliente", "SKU"
-        ]
-
-        if estoque_rows:
-            print("🔍 Exemplo linha estoque:", dict(zip(colunas_estoque, estoque_rows[0])))
-        if faturamento_rows:
-            print("🔍 Exemplo linha faturamento:", dict(zip(colunas_faturamento, faturamento_rows[0])))
-
-        dados_estoque = [
-            EstoqueModel(**dict(zip(colunas_estoque, row)))
-            for row in estoque_rows
-        ]
-        dados_faturamento = []
-        for row in faturamento_rows:
-            # Converte a lista de tuplas em um dicionário para fácil manipulação
-            data_dict = dict(zip(colunas_faturamento, row))
-            
-            # Se 'data' é um datetime.date (sem hora), converte para datetime.datetime (com hora 00:00:00)
-            if isinstance(data_dict['data'], date) and not isinstance(data_dict['data'], datetime):
-                data_dict['data'] = datetime.combine(data_dict['data'], datetime.min.time())
-                
-            dados_faturamento.append(FaturamentoModel(**data_dict))
+            if tem_rollups(db):
+                total_estoque, total_faturamento = acumular_rollups(db, acumulador, data_inicio, data_fim)
+                print(f"✅ Rollups: {total_estoque} SKUs de estoque, {total_faturamento} (SKU, mês) de faturamento")
+            else:
+                total_estoque, total_faturamento = acumular_linhas(db, acumulador, data_inicio, data_fim)
+                print(f"✅ {total_estoque} registros de estoque, {total_faturamento} de faturamento")
 
-        # 5️⃣ Processar indicadores
         print("📊 Calculando indicadores do boletim...")
-        dados_boletim = DadosBoletimModel.from_raw_data(dados_estoque, dados_faturamento)
+        dados_boletim = acumulador.gerar_modelo()
 
         # 6️⃣ Gerar texto do boletim
         boletim_service = BoletimService()
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Path
+from functools import lru_cache
 from typing import List
 from pydantic import BaseModel
 from db.neon_db import NeonDB, get_db
+from db.async_neon_db import AsyncNeonDB, get_async_db
 from models.user import User, UserRead, StatusBoletimRequest, AdminUserRequest, PerguntaCreate
 from services.user_service import UserService
 from services.mensagem_service import MensagemService
 from routes.auth import get_current_active_user
-from services.chat_service import ChatService
 from models.user import AtualizarPerfilRequest
 
 
@@ -19,9 +20,16 @@ router = APIRouter(
 
 # Instância do serviço
 user_service = UserService()
-chat_service = ChatService()
 mensagem_service = MensagemService()
 
+
+@lru_cache(maxsize=1)
+def get_chat_service():
+    """ChatService criado na primeira pergunta: torch, nltk e o modelo não pesam no startup da API"""
+    from services.chat_service import ChatService
+    return ChatService()
+
+
 class CriarUsuario(BaseModel):
     email: str
     senha: str
@@ -40,15 +48,15 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
     )
 
 @router.get("/", response_model=List[UserRead])
-def read_users(
+async def read_users(
     skip: int = 0, 
     limit: int = 100, 
-    db: NeonDB = Depends(get_db),
+    db: AsyncNeonDB = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Lista todos os usuários (requer autenticação)"""
     try:
-        users = user_service.get_users(skip, limit, db)
+        users = await user_service.get_users_async(skip, limit, db)
                
         return [
             UserRead(
@@ -152,26 +160,26 @@ def criar_usuario(request: CriarUsuario):
         raise HTTPException(status_code=500, detail="Erro ao criar usuário")
 
 @router.get("/mensagens/{user_id}")
-def historico_mensagens(
+async def historico_mensagens(
     user_id: int,
-    db: NeonDB = Depends(get_db)
+    db: AsyncNeonDB = Depends(get_async_db)
 ):
     """Lista o histórico de mensagens de um usuário (requer autenticação)"""
     try:
-        mensagens = mensagem_service.get_mensagens(user_id, db)
+        mensagens = await mensagem_service.get_mensagens_async(user_id, db)
         return mensagens
     except Exception as e:
         print(f"[Rota /mensagens/{{user_id}}] Erro: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar usuário")
 
 @router.get("/tipo/{user_id}")
-def tipo_usuario(
+async def tipo_usuario(
     user_id: int,
-    db: NeonDB = Depends(get_db)
+    db: AsyncNeonDB = Depends(get_async_db)
 ):
     """Retorna o tipo do usuário (requer autenticação)"""
     try:
-        user = user_service.get_user(user_id, db)
+        user = await user_service.get_user_async(user_id, db)
         return user
     except Exception as e:
         print(f"[Rota /tipo/{{user_id}}] Erro: {e}")
@@ -204,7 +212,7 @@ def enviar_pergunta(
     # Processar com IA
     try:
         print(f"[Rota enviar_pergunta] Processando pergunta com IA...")
-        result_resposta = chat_service.processar_pergunta(
+        result_resposta = get_chat_service().processar_pergunta(
             pergunta.id_usuario,
             pergunta.mensagem,
             db
@@ -2,16 +2,18 @@ import re
 from typing import Dict, List, Any, Set
 from datetime import datetime
 from difflib import get_close_matches  # Para correção ortográfica
-import nltk
-from nltk.stem import RSLPStemmer  # Stemmer específico para português
-from nltk.corpus import stopwords
+from functools import lru_cache
 
-# Baixar recursos necessários (executar uma vez)
-try:
-    nltk.download('rslp', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except Exception as e:
-    print(f"Aviso: Erro ao baixar recursos NLTK: {e}")
+
+@lru_cache(maxsize=1)
+def _baixar_recursos_nltk():
+    """Baixa os recursos necessários (uma vez por processo, no primeiro QueryAnalyzer)"""
+    import nltk
+    try:
+        nltk.download('rslp', quiet=True)
+        nltk.download('stopwords', quiet=True)
+    except Exception as e:
+        print(f"Aviso: Erro ao baixar recursos NLTK: {e}")
 
 class QueryAnalyzer:
     def __init__(self):
@@ -60,8 +62,11 @@ class QueryAnalyzer:
         # Lista de produtos conhecidos para correção ortográfica
         self.produtos_conhecidos = ['bobina', 'chapa', 'rolo', 'tira', 'laminado', 'aço']
         
-        # Inicializar stemmer e stopwords
+        # Inicializar stemmer e stopwords (nltk só é importado aqui, não no startup da API)
         try:
+            from nltk.stem import RSLPStemmer  # Stemmer específico para português
+            from nltk.corpus import stopwords
+            _baixar_recursos_nltk()
             self.stemmer = RSLPStemmer()
             self.stop_words = set(stopwords.words('portuguese'))
         except Exception as e:
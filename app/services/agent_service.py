@@ -1,19 +1,50 @@
 import os
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, NamedTuple
 from dotenv import load_dotenv
-from db.neon_db import execute_query
+from db.neon_db import execute_query, ColumnarResult, ConsultaBloqueadaError, LimitesConsulta
 import re
 from decimal import Decimal
 from services.QueryAnalyzer import QueryAnalyzer
-from google import genai
+from services import lote_geracao
+from services.modelos import obter_modelo
 
 load_dotenv()
 
+# Toda SQL do chat roda no modo protegido (timeout, teto de custo e de linhas)
+_LIMITES_SQL = LimitesConsulta()
+
+_MENSAGENS_BLOQUEIO = {
+    "tempo": "A consulta para essa pergunta demorou mais do que o permitido. Tente restringir por período, produto ou SKU.",
+    "custo": "Essa pergunta exigiria uma consulta muito pesada na base. Tente restringir por período, produto ou SKU.",
+    "somente_leitura": "Desculpe, só consigo consultar dados, não alterá-los.",
+}
+
+# Começos fixos dos prompts do modelo local: o KV cache deles é reaproveitado entre perguntas
+_PREFIXO_PERGUNTA_SIMPLES = "Você é um assistente de análise de dados empresariais. O usuário fez um questionamento:\n        \n"
+_PREFIXO_PERGUNTA_CONTEXTO = "Você é um assistente de análise de dados empresariais especializado em estoque e faturamento.\n\n"
+# Geração do modelo local no chat (pad/eos vêm do tokenizer)
+_PARAMETROS_GERACAO = dict(max_new_tokens=100, temperature=0.1, do_sample=False, repetition_penalty=2.0)
+
+
+@lru_cache(maxsize=1)
+def _cliente_genai():
+    """Cliente da API do Gemma, criado na primeira chamada (google.genai não é importado no startup)"""
+    from google import genai
+    return genai.Client(api_key=os.getenv("GEMMA_API_KEY"))
+
+
+class ConsultaSQL(NamedTuple):
+    """SQL parametrizada gerada pelos templates; template_id identifica o modelo da consulta"""
+    template_id: str
+    sql: str
+    params: list
+
+
 class AgentService:
     def __init__(self):
         import random
+        import torch
         SEED = 52  # Valor fixo para garantir determinismo
         torch.manual_seed(SEED)
         random.seed(SEED)
@@ -41,16 +72,8 @@ class AgentService:
         cache_key = f"simple_{hash(pergunta)}"
         if cache_key in self._cache:
             return self._cache[cache_key]
-        prompt = f"""Você é um assistente de análise de dados empresariais. O usuário fez um questionamento:
-        
-PERGUNTA DO USUÁRIO: {pergunta}
-
-Responda de forma clara, objetiva e profissional em português.
-Se não for uma pergunta retorne: Faça uma pergunta válida.
-Se a pergunta não for sobre análise de dados empresariais responda: Não domino esse assunto, faça outra pergunta.
-"""
         try:
-            response = self._generate_response(prompt)
+            response = self._generate_response(self._montar_prompt_simples(pergunta), _PREFIXO_PERGUNTA_SIMPLES)
             if len(self._cache) >= self._cache_max_size:
                 oldest_key = next(iter(self._cache))
                 del self._cache[oldest_key]
@@ -59,12 +82,19 @@ Se a pergunta não for sobre análise de dados empresariais responda: Não domin
         except Exception as e:
             return f"Erro ao processar pergunta: {str(e)}"
     
+    @staticmethod
+    def _montar_prompt_simples(pergunta: str) -> str:
+        return _PREFIXO_PERGUNTA_SIMPLES + f"""PERGUNTA DO USUÁRIO: {pergunta}
+
+Responda de forma clara, objetiva e profissional em português.
+Se não for uma pergunta retorne: Faça uma pergunta válida.
+Se a pergunta não for sobre análise de dados empresariais responda: Não domino esse assunto, faça outra pergunta.
+"""
+
     def processar_pergunta_com_contexto(self, pergunta: str, contexto: str) -> str:
         if not pergunta or not pergunta.strip():
             return "Por favor, faça uma pergunta válida."
-        prompt = f"""Você é um assistente de análise de dados empresariais especializado em estoque e faturamento.
-
-{contexto}
+        prompt = _PREFIXO_PERGUNTA_CONTEXTO + f"""{contexto}
 
 PERGUNTA DO USUÁRIO: {pergunta}
 
@@ -72,25 +102,25 @@ Responda de forma clara e objetiva, baseando-se apenas nos dados fornecidos no c
 Se a pergunta não puder ser respondida com os dados disponíveis, informe isso claramente.
 """
         try:
-            return self._generate_response(prompt)
+            return self._generate_response(prompt, _PREFIXO_PERGUNTA_CONTEXTO)
         except Exception as e:
             return f"Erro ao processar pergunta: {str(e)}"
     
-    def _generate_response(self, prompt: str) -> str:
+    def _generate_response(self, prompt: str, prefixo: str = "") -> str:
         try:
-            input_ids = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=512)
-            input_ids = {k: v.to(self.device) for k, v in input_ids.items()}
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **input_ids,
-                    max_new_tokens=100,
-                    temperature=0.1,
-                    do_sample=False,
-                    repetition_penalty=2.0,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id
-                )
-            output_str = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Modelo compartilhado do processo (o mesmo do boletim); `prefixo` é o começo fixo do prompt.
+            # Perguntas simultâneas vão juntas num generate só (services/lote_geracao.py)
+            modelo = obter_modelo()
+            output_ids = lote_geracao.gerar(
+                modelo,
+                prompt,
+                prefixo,
+                max_length=512,
+                pad_token_id=modelo.tokenizer.eos_token_id,
+                eos_token_id=modelo.tokenizer.eos_token_id,
+                **_PARAMETROS_GERACAO,
+            )
+            output_str = modelo.tokenizer.decode(output_ids, skip_special_tokens=True)
             response = output_str.replace(prompt, "").strip()
             response = re.sub(r'Responda de forma.*?:\s*', '', response, flags=re.IGNORECASE)
             response = re.sub(r'Resposta:\s*', '', response, flags=re.IGNORECASE)
@@ -114,26 +144,30 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
     def clear_cache(self):
         self._cache.clear()
     
-    def generate_sql(self, pergunta: str, contexto: str, analise: dict = None) -> str:
+    def generate_sql(self, pergunta: str, contexto: str, analise: dict = None) -> ConsultaSQL:
         """Gera SQL usando análise PLN + templates inteligentes"""
         if analise is None:
             analise = self.query_analyzer.analyze_query(pergunta)
 
         if not analise:
-            return "SELECT COUNT(*) as total FROM estoque"
+            return ConsultaSQL("contagem", "SELECT COUNT(*) as total FROM estoque", [])
 
         filters = analise.get("filters", {})
         focus = analise.get("focus", [])
         pergunta_lower = pergunta.lower()
 
         # Estratégia: usar templates SQL baseados em padrões de pergunta + filtros PLN
-        sql_query = self._generate_sql_from_template(pergunta_lower, filters, focus)
+        consulta = self._generate_sql_from_template(pergunta_lower, filters, focus)
+
+        print(f"[SQL Template] {consulta.template_id}: {consulta.sql} {consulta.params}")
+        return consulta
 
-        print(f"[SQL Template] Query gerada: {sql_query}")
-        return sql_query
+    def _generate_sql_from_template(self, pergunta: str, filters: dict, focus: list) -> ConsultaSQL:
+        """Gera SQL parametrizada usando templates inteligentes baseados em padrões.
 
-    def _generate_sql_from_template(self, pergunta: str, filters: dict, focus: list) -> str:
-        """Gera SQL usando templates inteligentes baseados em padrões"""
+        Os valores dos filtros vão em `params` (nunca no texto da SQL), então o mesmo
+        template gera sempre o mesmo texto e pode ser preparado uma vez por conexão.
+        """
 
         # Determinar tabela prioritária baseada na pergunta explícita
         pergunta_lower = pergunta.lower()
@@ -156,15 +190,15 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
             base_query = f"SELECT COUNT(*) as total FROM {table}"
 
             # Adicionar filtros
-            conditions = self._build_conditions(filters, table)
+            conditions, params = self._build_conditions(filters, table)
             if conditions:
                 base_query += f" WHERE {' AND '.join(conditions)}"
 
-            return base_query
+            return ConsultaSQL("contagem", base_query, params)
 
         # Template 3: Listar produtos únicos
         elif any(word in pergunta for word in ['quais produtos', 'listar produtos', 'produtos disponíveis', 'tipos de produto', 'todos os produtos', 'nome de todos os produtos', 'informe o nome', 'informe']):
-            return f"SELECT DISTINCT produto FROM {table} ORDER BY produto"
+            return ConsultaSQL("listar_produtos", f"SELECT DISTINCT produto FROM {table} ORDER BY produto", [])
 
         # Template 2: Soma de valores - ajustar para não capturar perguntas sobre data
         elif any(word in pergunta for word in ['quanto', 'qual o total', 'soma', 'valor total', 'faturamento', 'qual o faturamento', 'faturamento total']) and not any(word in pergunta for word in ['data', 'registros mais antig', 'mais antig']):
@@ -176,24 +210,24 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
             base_query = f"SELECT SUM({column}) as total FROM {table}"
 
             # Adicionar filtros
-            conditions = self._build_conditions(filters, table)
+            conditions, params = self._build_conditions(filters, table)
             if conditions:
                 base_query += f" WHERE {' AND '.join(conditions)}"
 
-            return base_query
+            return ConsultaSQL("soma", base_query, params)
         elif any(word in pergunta for word in ['maior', 'mais alto', 'máximo', 'melhor']):
             if table == 'estoque':
-                return "SELECT produto, es_totalestoque FROM estoque ORDER BY es_totalestoque DESC LIMIT 1"
+                return ConsultaSQL("maior", "SELECT produto, es_totalestoque FROM estoque ORDER BY es_totalestoque DESC LIMIT 1", [])
             else:
-                return "SELECT produto, zs_peso_liquido FROM faturamento ORDER BY zs_peso_liquido DESC LIMIT 1"
+                return ConsultaSQL("maior", "SELECT produto, zs_peso_liquido FROM faturamento ORDER BY zs_peso_liquido DESC LIMIT 1", [])
 
         # Template 5: Data mais antiga
         elif any(word in pergunta for word in ['mais antigo', 'mais antiga', 'primeiro registro', 'data inicial']):
-            return f"SELECT data FROM {table} ORDER BY data ASC LIMIT 1"
+            return ConsultaSQL("data_mais_antiga", f"SELECT data FROM {table} ORDER BY data ASC LIMIT 1", [])
 
         # Template 6: Listar SKUs
         elif any(word in pergunta for word in ['quais os diferentes skus', 'quais skus', 'listar skus']):
-            return f"SELECT DISTINCT SKU FROM {table} ORDER BY SKU"
+            return ConsultaSQL("listar_skus", f"SELECT DISTINCT SKU FROM {table} ORDER BY SKU", [])
 
         # Template 7: Buscar produto por SKU específico
         elif (any(word in pergunta for word in ['qual o nome', 'nome do produto', 'qual o produto', 'produto de código', 'a qual produto', 'se refere', 'é de qual produto', 'qual produto']) and 
@@ -201,7 +235,7 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
             # Usar filtros extraídos pelo QueryAnalyzer
             if 'skus' in filters and filters['skus']:
                 sku_value = filters['skus'][0]  # Já normalizado pelo QueryAnalyzer
-                return f"SELECT produto, SKU FROM {table} WHERE UPPER(SKU) = '{sku_value.upper()}' LIMIT 1"
+                return ConsultaSQL("produto_por_sku", f"SELECT produto, SKU FROM {table} WHERE UPPER(SKU) = %s LIMIT 1", [sku_value.upper()])
             else:
                 # Fallback: tentar extrair SKU da pergunta diretamente
                 import re
@@ -209,9 +243,9 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
                 if sku_match:
                     sku_num = sku_match.group(1)
                     sku_value = f"SKU_{sku_num}"
-                    return f"SELECT produto, SKU FROM {table} WHERE UPPER(SKU) = '{sku_value}' LIMIT 1"
+                    return ConsultaSQL("produto_por_sku", f"SELECT produto, SKU FROM {table} WHERE UPPER(SKU) = %s LIMIT 1", [sku_value])
                 else:
-                    return f"SELECT DISTINCT SKU FROM {table} ORDER BY SKU"
+                    return ConsultaSQL("listar_skus", f"SELECT DISTINCT SKU FROM {table} ORDER BY SKU", [])
 
         # Template 8: Grupo de mercadoria
         elif any(word in pergunta for word in ['grupo', 'mercadoria', 'pertence']):
@@ -223,11 +257,11 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
             base_query = f"SELECT produto, {column_grupo} FROM {table}"
             
             # Adicionar filtros de produto se existirem
-            conditions = self._build_conditions(filters, table)
+            conditions, params = self._build_conditions(filters, table)
             if conditions:
                 base_query += f" WHERE {' AND '.join(conditions)}"
             
-            return base_query + " LIMIT 1"
+            return ConsultaSQL("grupo_mercadoria", base_query + " LIMIT 1", params)
 
         # Template 9: Dados específicos de produto - ajustar para perguntas sobre quantidade
         elif 'produtos' in filters and filters['produtos'] and any(word in pergunta for word in ['quantidade', 'quantas', 'quantos', 'quanto']):
@@ -235,31 +269,35 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
             column = 'es_totalestoque' if table == 'estoque' else 'zs_peso_liquido'
 
             # Para perguntas sobre quantidade, fazer SUM
-            base_query = f"SELECT SUM({column}) as total FROM {table} WHERE LOWER(produto) LIKE '%{produto}%'"
+            base_query = f"SELECT SUM({column}) as total FROM {table} WHERE LOWER(produto) LIKE %s"
+            params = [f"%{produto}%"]
 
             # Adicionar outros filtros
             other_conditions = []
             if 'data_inicio' in filters and 'data_fim' in filters:
-                other_conditions.append(f"data >= '{filters['data_inicio']}' AND data <= '{filters['data_fim']}'")
+                other_conditions.append("data >= %s AND data <= %s")
+                params += [filters['data_inicio'], filters['data_fim']]
 
             if other_conditions:
                 base_query += f" AND {' AND '.join(other_conditions)}"
 
-            return base_query
+            return ConsultaSQL("quantidade_produto", base_query, params)
 
         # Template padrão: fallback
         else:
-            return f"SELECT COUNT(*) as total FROM {table}"
+            return ConsultaSQL("contagem", f"SELECT COUNT(*) as total FROM {table}", [])
 
-    def _build_conditions(self, filters: dict, table: str) -> list:
-        """Constrói condições WHERE baseadas nos filtros"""
+    def _build_conditions(self, filters: dict, table: str) -> tuple[list, list]:
+        """Constrói condições WHERE (com placeholders) e a lista de parâmetros correspondente"""
         conditions = []
+        params = []
 
         # Filtro de produtos
         if 'produtos' in filters and filters['produtos']:
             produto_conditions = []
             for produto in filters['produtos']:
-                produto_conditions.append(f"LOWER(produto) LIKE '%{produto}%'")
+                produto_conditions.append("LOWER(produto) LIKE %s")
+                params.append(f"%{produto}%")
             if produto_conditions:
                 conditions.append(f"({' OR '.join(produto_conditions)})")
 
@@ -267,146 +305,33 @@ Se a pergunta não puder ser respondida com os dados disponíveis, informe isso
         if 'skus' in filters and filters['skus']:
             sku_conditions = []
             for sku in filters['skus']:
-                sku_conditions.append(f"UPPER(SKU) LIKE '%{sku.upper()}%'")
+                sku_conditions.append("UPPER(SKU) LIKE %s")
+                params.append(f"%{sku.upper()}%")
             if sku_conditions:
                 conditions.append(f"({' OR '.join(sku_conditions)})")
 
         # Filtro temporal
         if 'data_inicio' in filters and 'data_fim' in filters:
-            conditions.append(f"data >= '{filters['data_inicio']}' AND data <= '{filters['data_fim']}'")
-
-        return conditions
-        
-    def _generate_sql_with_ai(self, pergunta: str, contexto: str) -> str:
-        schema_info = """
-ESQUEMA DAS TABELAS:
-
-ESTOQUE:
-- data (date): Data do registro
-- cod_cliente (int): Código do cliente  
-- es_centro (text): Centro
-- tipo_material (text): Tipo do material
-- origem (text): Origem
-- cod_produto (text): Código do produto
-- lote (text): Lote
-- dias_em_estoque (int): Dias em estoque
-- produto (text): Nome do produto (ex: Bobina, Rolo, Chapa, Tira)
-- grupo_mercadoria (text): Grupo da mercadoria (ex: Laminado a Frio, Zincado)
-- es_totalestoque (decimal): Valor numérico em estoque
-- SKU (text): SKU do produto
-
-FATURAMENTO:
-- data (date): Data do faturamento
-- cod_cliente (int): Código do cliente
-- lote (text): Lote
-- origem (text): Origem
-- zs_gr_mercad (text): Grupo mercadoria
-- produto (text): Nome do produto
-- cod_produto (text): Código do produto
-- zs_centro (text): Centro
-- zs_cidade (text): Cidade
-- zs_uf (text): UF/Estado
-- zs_peso_liquido (decimal): Peso líquido numérico
-- giro_sku_cliente (decimal): Valor de giro numérico
-- SKU (text): SKU do produto
-"""
-        prompt = f"""Você é um especialista em SQL PostgreSQL para análise de dados empresariais.
+            conditions.append("data >= %s AND data <= %s")
+            params += [filters['data_inicio'], filters['data_fim']]
 
-{schema_info}
-
-PERGUNTA DO USUÁRIO: {pergunta}
-
-INSTRUÇÕES:
-- Gere APENAS a query SQL válida para PostgreSQL
-- Use as tabelas "estoque" ou "faturamento" conforme apropriado
-- Para perguntas sobre quantidade/estoque use SUM(es_totalestoque)
-- Para perguntas sobre vendas/faturamento use SUM(zs_peso_liquido) ou SUM(giro_sku_cliente)
-- Para contar registros use COUNT(*)
-- Para listar produtos únicos use SELECT DISTINCT produto
-- Sempre use nomes de colunas exatos
-- Adicione WHERE clauses apropriados baseados na pergunta
-- Use ORDER BY e LIMIT quando fizer sentido
-- Responda apenas com a query SQL, sem explicações
-
-Query SQL:"""
+        return conditions, params
         
-        try:   
-            client = genai.Client(api_key=os.getenv("GEMMA_API_KEY"))
-            outputs = client.models.generate_content(
-                model="gemma-3-27b-it",
-                contents=prompt,
-            )
-            
-            response = outputs.text
-            sql_query = response.strip()
-            
-            # Limpar resposta - remover tags HTML e texto extra
-            sql_query = re.sub(r'<[^>]+>', '', sql_query).strip()
-            sql_query = re.sub(r'```sql|```', '', sql_query).strip()
-            sql_query = re.sub(r'^Query SQL:\s*', '', sql_query, flags=re.IGNORECASE)
-            sql_query = re.sub(r'RESULTADO DA QUERY.*', '', sql_query, flags=re.IGNORECASE | re.DOTALL)
-            sql_query = re.sub(r'^\s*SELECT\s+', 'SELECT ', sql_query, flags=re.IGNORECASE)
-            
-            # Garantir que começa com SELECT
-            if not sql_query.upper().startswith('SELECT'):
-                sql_query = f"SELECT {sql_query}"
-            
-            # Remover placeholders como ?
-            sql_query = re.sub(r'\?', '', sql_query)
-            
-            # Limpar linhas vazias extras
-            sql_query = re.sub(r'\n\s*\n', '\n', sql_query)
-            
-            # Se ainda tiver problemas, usar fallback
-            if '<code>' in sql_query or 'RESULTADO' in sql_query or sql_query.count('SELECT') > 1:
-                pergunta_lower = pergunta.lower()
-                if 'quantos' in pergunta_lower and 'registros' in pergunta_lower:
-                    if 'faturamento' in pergunta_lower:
-                        sql_query = "SELECT COUNT(*) as total FROM faturamento"
-                    else:
-                        sql_query = "SELECT COUNT(*) as total FROM estoque"
-                elif 'todos os produtos' in pergunta_lower or 'listar produtos' in pergunta_lower:
-                    if 'faturamento' in pergunta_lower:
-                        sql_query = "SELECT DISTINCT produto FROM faturamento ORDER BY produto"
-                    else:
-                        sql_query = "SELECT DISTINCT produto FROM estoque ORDER BY produto"
-                elif 'maior' in pergunta_lower and 'es_totalestoque' in pergunta_lower:
-                    sql_query = "SELECT produto, es_totalestoque FROM estoque ORDER BY es_totalestoque DESC LIMIT 1"
-                elif 'data' in pergunta_lower and ('mais antigos' in pergunta_lower or 'mais antiga' in pergunta_lower):
-                    if 'faturamento' in pergunta_lower:
-                        sql_query = "SELECT data FROM faturamento ORDER BY data ASC LIMIT 1"
-                    else:
-                        sql_query = "SELECT data FROM estoque ORDER BY data ASC LIMIT 1"
-                elif 'quais' in pergunta_lower and 'skus' in pergunta_lower:
-                    if 'faturamento' in pergunta_lower:
-                        sql_query = "SELECT DISTINCT SKU FROM faturamento ORDER BY SKU"
-                    else:
-                        sql_query = "SELECT DISTINCT SKU FROM estoque ORDER BY SKU"
-                else:
-                    # Fallback genérico
-                    if 'faturamento' in pergunta_lower or 'vendas' in pergunta_lower:
-                        sql_query = "SELECT SUM(zs_peso_liquido) as total FROM faturamento"
-                    else:
-                        sql_query = "SELECT SUM(es_totalestoque) as total FROM estoque"
-            
-            print(f"[SQL AI] Query final: {sql_query}")
-            return sql_query
-            
-        except Exception as e:
-            print(f"[ERRO SQL AI] {e}")
-            # Fallback simples
-            pergunta_lower = pergunta.lower()
-            if 'estoque' in pergunta_lower:
-                return "SELECT SUM(es_totalestoque) as total FROM estoque"
-            else:
-                return "SELECT SUM(zs_peso_liquido) as total FROM faturamento"
-    
     def process_input(self, pergunta: str, contexto: str, analise: dict = None) -> str:
         try:
-            sql_query = self.generate_sql(pergunta, contexto, analise=analise)
-            print(f"\nSQL gerada: {sql_query}")
-            sql_result = execute_query(sql_query)
-            print(f"Resultado SQL: {sql_result}")
+            consulta = self.generate_sql(pergunta, contexto, analise=analise)
+            print(f"\nSQL gerada: {consulta.sql} {consulta.params}")
+            # resultado por coluna: evita montar um dict para cada linha;
+            # template_id permite reaproveitar o prepared statement da conexão
+            try:
+                sql_result = execute_query(
+                    consulta.sql, mode="columns", params=consulta.params,
+                    template_id=consulta.template_id, limites=_LIMITES_SQL
+                )
+            except ConsultaBloqueadaError as e:
+                print(f"[SQL] Consulta bloqueada ({e.motivo}): {e}")
+                return _MENSAGENS_BLOQUEIO.get(e.motivo, "Desculpe, não foi possível consultar a base para essa pergunta.")
+            print(f"Resultado SQL: {sql_result}{' (truncado)' if getattr(sql_result, 'truncado', False) else ''}")
             
             # Para perguntas factuais simples, usar resposta direta sem AI
             pergunta_lower = pergunta.lower()
@@ -438,7 +363,7 @@ Query SQL:"""
             print(f"Erro: {str(e)}")
             return f"Desculpe, ocorreu um erro ao processar sua pergunta: {str(e)}"
     
-    def _generate_conversational_response(self, pergunta: str, sql_result: list, contexto: str, analise: dict = None) -> str:
+    def _generate_conversational_response(self, pergunta: str, sql_result: list | ColumnarResult, contexto: str, analise: dict = None) -> str:
         if not sql_result:
             return "Não encontrei dados relevantes para sua pergunta nos registros disponíveis."
 
@@ -462,7 +387,7 @@ INSTRUÇÕES:
 Resposta:"""
 
         try:
-            client = genai.Client(api_key=os.getenv("GEMMA_API_KEY"))
+            client = _cliente_genai()
             outputs = client.models.generate_content(
                 model="gemma-3-27b-it",
                 contents=prompt,
@@ -485,7 +410,20 @@ Resposta:"""
             return self._format_fallback_response(pergunta, sql_result, analise.get("filters", {}) if analise else {})
 
     
-    def _format_fallback_response(self, pergunta: str, sql_result: list, filters: dict) -> str:
+    @staticmethod
+    def _valores_coluna(sql_result: list | ColumnarResult, coluna: str) -> list:
+        """Valores de uma coluna, tanto para lista de dicts quanto para ColumnarResult"""
+        if isinstance(sql_result, ColumnarResult):
+            return sql_result.column(coluna)
+        return [row[coluna] for row in sql_result]
+
+    @staticmethod
+    def _aviso_parcial(sql_result) -> str:
+        if getattr(sql_result, "truncado", False):
+            return f", entre outros (lista limitada a {len(sql_result)} itens)"
+        return ""
+
+    def _format_fallback_response(self, pergunta: str, sql_result: list | ColumnarResult, filters: dict) -> str:
         pergunta_lower = pergunta.lower()
 
         # Detecção específica para perguntas factuais (ajustada para variações)
@@ -499,8 +437,8 @@ Resposta:"""
 
         elif 'todos os produtos' in pergunta_lower or 'listar produtos' in pergunta_lower or ('informe o nome' in pergunta_lower and 'produtos' in pergunta_lower) or 'quais produtos' in pergunta_lower:
             if sql_result:
-                produtos = [row['produto'] for row in sql_result]
-                return f"Os produtos disponíveis em nosso sistema são: {', '.join(produtos)}."
+                produtos = self._valores_coluna(sql_result, 'produto')
+                return f"Os produtos disponíveis em nosso sistema são: {', '.join(produtos)}{self._aviso_parcial(sql_result)}."
 
         elif 'data' in pergunta_lower and ('mais antigos' in pergunta_lower or 'mais antiga' in pergunta_lower or 'registros mais antigos' in pergunta_lower):
             if sql_result and 'data' in sql_result[0]:
@@ -514,8 +452,8 @@ Resposta:"""
 
         elif 'quais os diferentes skus' in pergunta_lower or 'quais skus' in pergunta_lower:
             if sql_result:
-                skus = [row['sku'] for row in sql_result]
-                return f"Os códigos SKU disponíveis são: {', '.join(skus)}."
+                skus = self._valores_coluna(sql_result, 'sku')
+                return f"Os códigos SKU disponíveis são: {', '.join(skus)}{self._aviso_parcial(sql_result)}."
 
         # Detecção específica para perguntas sobre quantidade de produtos específicos
         elif ('quantas' in pergunta_lower or 'quantos' in pergunta_lower) and 'produtos' in filters and filters['produtos']:
@@ -578,7 +516,7 @@ Resposta:"""
             return f"O valor identificado foi de {unidade} {self._format_number_br(total)}."
         return "Não foram encontrados resultados para esta consulta em nossa base de dados."
     
-    def _format_sql_for_ai(self, sql_result: list, filters: dict) -> str:
+    def _format_sql_for_ai(self, sql_result: list | ColumnarResult, filters: dict) -> str:
         if not sql_result:
             return "Nenhum dado encontrado."
         formatted = ""
@@ -598,7 +536,10 @@ Resposta:"""
                 total = float(total)
             formatted += f"Valor total encontrado: {self._format_number_br(total)}"
         else:
-            formatted += f"Registros encontrados: {len(sql_result)}\n"
+            if getattr(sql_result, "truncado", False):
+                formatted += f"Registros encontrados: mais de {len(sql_result)} (resultado parcial, limitado pelo sistema)\n"
+            else:
+                formatted += f"Registros encontrados: {len(sql_result)}\n"
             for i, row in enumerate(sql_result[:5]):
                 formatted += f"Registro {i+1}: {', '.join([f'{k}: {v}' for k, v in row.items()])}\n"
         return formatted
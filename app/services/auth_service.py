@@ -5,10 +5,12 @@ from typing import Optional, Dict
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
 # Importar NeonDB para acesso ao banco
 from db.neon_db import NeonDB, get_db
+from db.async_neon_db import AsyncNeonDB
 from models.user import User
 
 load_dotenv()
@@ -30,33 +32,40 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+_SQL_USER_POR_EMAIL = "SELECT id, email, senha, recebe_boletim, admin FROM usuario WHERE email = %s"
+
+
+def _montar_user(user_row: tuple | None) -> Optional[User]:
+    """Mapeia a linha da tabela usuario para o modelo User"""
+    if not user_row:
+        return None
+
+    email_parts = user_row[1].split('@')
+    username = email_parts[0] if email_parts else user_row[1]
+
+    user_dict = {
+        "id": user_row[0],
+        "email": user_row[1],
+        "username": username,
+        "hashed_password": user_row[2],
+        "is_active": True,
+        "admin": user_row[4],
+    }
+    return User(**user_dict)
+
+
 def get_user(email: str, db: NeonDB = None) -> Optional[User]:
     """Busca um usuário no banco de dados pelo e-mail"""
-    if not db:
-        db = NeonDB()  
-    
+    conexao_propria = db is None
+    if conexao_propria:
+        db = NeonDB()
+
     try:
-        
-        user_row = db.fetchone("SELECT id, email, senha, recebe_boletim, admin FROM usuario WHERE email = %s", [email])
-        if not user_row:
-            return None
-        
-        
-        email_parts = user_row[1].split('@')
-        username = email_parts[0] if email_parts else user_row[1]
-        
-        # Mapeia os resultados do banco para o modelo User
-        user_dict = {
-            "id": user_row[0],
-            "email": user_row[1],
-            "username": username,  
-            "hashed_password": user_row[2],  
-            "is_active": True,
-            "admin": user_row[4],
-        }
-        return User(**user_dict)
+        user_row = db.fetchone(_SQL_USER_POR_EMAIL, [email])
+        return _montar_user(user_row)
     finally:
-        if not db:
+        # devolve ao pool apenas a conexão aberta aqui
+        if conexao_propria:
             db.__exit__(None, None, None)
 
 def authenticate_user(email: str, password: str, db: NeonDB = None) -> Optional[User]:
@@ -69,6 +78,24 @@ def authenticate_user(email: str, password: str, db: NeonDB = None) -> Optional[
     return user
 
 
+async def get_user_async(email: str, db: AsyncNeonDB = None) -> Optional[User]:
+    """Versão assíncrona de get_user, para rotas que não podem bloquear o event loop"""
+    if db is None:
+        async with AsyncNeonDB() as db:
+            return _montar_user(await db.fetchone(_SQL_USER_POR_EMAIL, [email]))
+    return _montar_user(await db.fetchone(_SQL_USER_POR_EMAIL, [email]))
+
+
+async def authenticate_user_async(email: str, password: str, db: AsyncNeonDB = None) -> Optional[User]:
+    """Versão assíncrona de authenticate_user; o bcrypt roda no threadpool"""
+    user = await get_user_async(email, db)
+    if not user:
+        return False
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
+        return False
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -80,7 +107,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: NeonDB = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
@@ -94,7 +121,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: NeonDB = Dep
     except JWTError:
         raise credentials_exception
     
-    user = get_user(email, db)
+    # a conexão do pool fica emprestada só durante a consulta, não o request inteiro
+    user = await get_user_async(email)
     if user is None:
         raise credentials_exception
     return user
@@ -1,41 +1,29 @@
 import re
 import random
 from datetime import datetime, timedelta
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
 
 from models.dados_boletim_model import DadosBoletimModel
 from models.envio_semanal_model import _ler_periodo_banco
+from services import cache_prefixo
+from services.modelos import ModeloCarregado, obter_modelo
+
+# Começo fixo do prompt da análise: o KV cache dele é reaproveitado entre boletins
+_PREFIXO_PROMPT = """Analise os indicadores de supply chain abaixo e escreva 2-3 parágrafos destacando os principais riscos e oportunidades:
+
+"""
 
 
 class BoletimService:
     def __init__(self):
+        # torch só é importado quando um boletim é gerado, não no startup da API
+        import torch
+
         # Definindo seed fixa para reprodutibilidade
         seed_value = 42
         random.seed(seed_value)
         torch.manual_seed(seed_value)
         if torch.cuda.is_available():
             torch.cuda.manual_seed_all(seed_value)
-            
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print("BoletimService using device:", self.device)
-
-        if self.device.type == "cuda":
-            self.model = AutoModelForCausalLM.from_pretrained(
-                "google/gemma-3-1b-pt",
-                device_map="auto",
-                dtype=torch.bfloat16,
-            )
-        else:
-            self.model = AutoModelForCausalLM.from_pretrained(
-                "google/gemma-3-1b-pt",
-                low_cpu_mem_usage=True,
-            )
-            self.model.to(self.device, dtype=torch.float32)
-            
-        # Ativando modo de avaliação para desativar dropout e garantir consistência
-        self.model.eval()
-        self.tokenizer = AutoTokenizer.from_pretrained("google/gemma-3-1b-pt")
 
     def _gerar_periodo_boletim(self) -> tuple[str, str]:
         """Gera período do boletim a partir do banco"""
@@ -115,40 +103,42 @@ Período Analisado: {data_inicio} a {data_fim}
         
         return "".join(analise)
 
-    def gerar_str_boletim(self, dados: DadosBoletimModel) -> str:
-        """Gera o boletim corporativo com análise da IA"""
-        
-        # Primeiro, cria o relatório estruturado
-        relatorio_estruturado = self._formatar_dados_estruturados(dados)
-        
-        # Prompt mais direto e focado
-        prompt = f"""Analise os indicadores de supply chain abaixo e escreva 2-3 parágrafos destacando os principais riscos e oportunidades:
-
-Estoque consumido: {dados.qtd_estoque_consumido_ton} toneladas
+    def _montar_prompt(self, dados: DadosBoletimModel) -> str:
+        """Prompt da análise da IA, mais direto e focado"""
+        return _PREFIXO_PROMPT + f"""Estoque consumido: {dados.qtd_estoque_consumido_ton} toneladas
 Aging médio: {dados.valor_aging_avg} semanas
 SKUs sem estoque: {len(dados.skus_alto_giro_sem_estoque)}
 Risco SKU_1: {dados.risco_desabastecimento_sku1}
 
 Análise:"""
 
+    def _gerar(self, modelo: ModeloCarregado, prompt: str):
+        """Roda o generate do boletim (sem gradientes, a partir do KV cache do prefixo) e devolve os ids da saída"""
+        # Parâmetros determinísticos para resultados consistentes (a seed fica no __init__)
+        return cache_prefixo.gerar(
+            modelo,
+            prompt,
+            _PREFIXO_PROMPT,
+            max_new_tokens=250,
+            temperature=0,  # temperatura zero para determinismo
+            do_sample=False,  # desativa amostragem aleatória
+            repetition_penalty=1.4,
+            no_repeat_ngram_size=4,
+            pad_token_id=modelo.tokenizer.eos_token_id,
+        )
+
+    def gerar_str_boletim(self, dados: DadosBoletimModel) -> str:
+        """Gera o boletim corporativo com análise da IA"""
+        
+        # Primeiro, cria o relatório estruturado
+        relatorio_estruturado = self._formatar_dados_estruturados(dados)
+        prompt = self._montar_prompt(dados)
+
         try:
-            # Usando torch.no_grad() para garantir que não haja atualizações de gradientes
-            with torch.no_grad():
-                input_ids = self.tokenizer(prompt, return_tensors="pt")
-                input_ids = {k: v.to(self.device) for k, v in input_ids.items()}
-
-                # Parâmetros determinísticos para resultados consistentes
-                outputs = self.model.generate(
-                    **input_ids, 
-                    max_new_tokens=250,
-                    temperature=0,  # temperatura zero para determinismo
-                    do_sample=False,  # desativa amostragem aleatória
-                    repetition_penalty=1.4,
-                    no_repeat_ngram_size=4,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    seed=42  # seed fixa para consistência
-                )
-            output_str = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Modelo compartilhado do processo (carregado no primeiro boletim ou no startup)
+            modelo = obter_modelo()
+            outputs = self._gerar(modelo, prompt)
+            output_str = modelo.tokenizer.decode(outputs[0], skip_special_tokens=True)
 
             # Extrai apenas a parte após "Análise:"
             texto_ia = re.split(r'Análise:\s*', output_str, flags=re.IGNORECASE)
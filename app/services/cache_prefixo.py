@@ -0,0 +1,97 @@
+"""KV cache dos começos fixos dos prompts do modelo local.
+
+Os prompts do chat (AgentService) e do boletim (BoletimService) começam com um
+trecho fixo de instruções seguido da parte que muda a cada chamada. O trecho
+fixo passa pelo modelo uma vez por modelo carregado e as chaves/valores de
+atenção (past_key_values) ficam guardados; cada geração parte de uma cópia desse
+cache e só codifica o resto do prompt. Com decodificação gulosa a saída é a
+mesma de sem cache.
+
+O cache só é usado quando os tokens do prompt começam exatamente pelos tokens do
+prefixo (por isso os prefixos terminam em quebra de linha, onde o tokenizer não
+junta o fim do prefixo com o começo da parte variável); senão a geração segue
+sem ele.
+
+Configuração pelo .env:
+- LLM_PREFIX_CACHE=0 desliga o cache;
+- LLM_PREFIX_CACHE_SIZE: quantos prefixos ficam em memória (padrão 8).
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+from dotenv import load_dotenv
+
+from services.modelos import ModeloCarregado
+
+load_dotenv()
+
+ATIVO = os.getenv("LLM_PREFIX_CACHE", "1").lower() in ("1", "true", "sim")
+_TAMANHO = int(os.getenv("LLM_PREFIX_CACHE_SIZE", "8"))
+
+
+class _Prefixo(NamedTuple):
+    ids: list[int]
+    kv: Any  # past_key_values com o prefixo já codificado (nunca alterado: cada geração usa uma cópia)
+    segundos: float
+
+
+_lock = threading.Lock()
+_prefixos: "OrderedDict[tuple[str, str, str, str], _Prefixo]" = OrderedDict()
+_desalinhados: set[tuple[str, str, str, str]] = set()
+
+
+def _codificar(modelo: ModeloCarregado, prefixo: str) -> _Prefixo:
+    import torch
+
+    inicio = time.perf_counter()
+    ids = modelo.tokenizer(prefixo, return_tensors="pt")["input_ids"].to(modelo.device)
+    with torch.no_grad():
+        saida = modelo.model(input_ids=ids, use_cache=True)
+    return _Prefixo(ids[0].tolist(), saida.past_key_values, round(time.perf_counter() - inicio, 3))
+
+
+def _obter(modelo: ModeloCarregado, chave: tuple[str, str, str, str]) -> _Prefixo:
+    with _lock:
+        entrada = _prefixos.get(chave)
+        if entrada is None:
+            entrada = _codificar(modelo, chave[-1])
+            _prefixos[chave] = entrada
+            if len(_prefixos) > _TAMANHO:
+                _prefixos.popitem(last=False)
+        else:
+            _prefixos.move_to_end(chave)
+    return entrada
+
+
+def gerar(modelo: ModeloCarregado, prompt: str, prefixo: str = "", max_length: Optional[int] = None, **parametros):
+    """model.generate de `prompt` partindo do KV cache de `prefixo` (o começo fixo do prompt); devolve os ids da saída"""
+    import torch
+
+    truncar = {"truncation": True, "max_length": max_length} if max_length else {}
+    entradas = modelo.tokenizer(prompt, return_tensors="pt", **truncar)
+    entradas = {k: v.to(modelo.device) for k, v in entradas.items()}
+    with torch.no_grad():
+        if ATIVO and prefixo and prompt.startswith(prefixo):
+            chave = (modelo.modelo_id, modelo.dtype, modelo.dispositivo, prefixo)
+            entrada = _obter(modelo, chave)
+            ids = entradas["input_ids"][0]
+            # precisa sobrar ao menos um token do prompt para o generate codificar
+            if len(ids) > len(entrada.ids) and ids[:len(entrada.ids)].tolist() == entrada.ids:
+                parametros["past_key_values"] = copy.deepcopy(entrada.kv)
+            elif chave not in _desalinhados:
+                _desalinhados.add(chave)
+                print(f"⚠️ [PREFIXO] Tokens do prompt não começam pelos do prefixo; gerando sem cache: {prefixo[:40]!r}...")
+        return modelo.model.generate(**entradas, **parametros)
+
+
+def estatisticas() -> list[dict]:
+    """Prefixos em cache: tamanho em tokens e tempo gasto para codificá-los"""
+    with _lock:
+        return [
+            {"modelo": modelo_id, "dtype": dtype, "dispositivo": dispositivo, "inicio": prefixo[:60],
+             "tokens": len(entrada.ids), "segundos_codificacao": entrada.segundos}
+            for (modelo_id, dtype, dispositivo, prefixo), entrada in _prefixos.items()
+        ]
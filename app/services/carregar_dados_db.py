@@ -18,6 +18,14 @@ class CarregadorDadosDB:
         sql = "SELECT * FROM faturamento;"
         return self.db.fetchall(sql)
 
+    def iter_estoque(self, batch_size: int = 2000):
+        """Mesmo conteúdo de carregar_estoque, mas em lotes via cursor server-side"""
+        yield from self.db.stream("SELECT * FROM estoque;", batch_size=batch_size)
+
+    def iter_faturamento(self, batch_size: int = 2000):
+        """Mesmo conteúdo de carregar_faturamento, mas em lotes via cursor server-side"""
+        yield from self.db.stream("SELECT * FROM faturamento;", batch_size=batch_size)
+
     def obter_primeira_data(self):
         try:
             sql_estoque = "SELECT MIN(data) FROM estoque;"
@@ -1,4 +1,4 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from db.neon_db import NeonDB
 
 class ContextService:
@@ -21,7 +21,7 @@ class ContextService:
                 "tipo": "estoque",
                 "total_registros": len(estoque_data),
                 "dados": estoque_data,
-                "resumo": self._generate_estoque_summary(estoque_data)
+                "resumo": self._resumo_rollup_estoque(db) or self._generate_estoque_summary(estoque_data)
             }
     
     def get_faturamento_context(self, user_id: int, query_type: str = "general") -> Dict[str, Any]:
@@ -38,7 +38,7 @@ class ContextService:
                 "tipo": "faturamento",
                 "total_registros": len(faturamento_data),
                 "dados": faturamento_data,
-                "resumo": self._generate_faturamento_summary(faturamento_data)
+                "resumo": self._resumo_rollup_faturamento(db) or self._generate_faturamento_summary(faturamento_data)
             }
     
     def get_combined_context(self, user_id: int, query_hint: str = "") -> str:
@@ -62,6 +62,31 @@ class ContextService:
         
         return context_text.strip()
     
+    def _resumo_rollup_estoque(self, db: NeonDB) -> Optional[str]:
+        """Resumo das últimas 52 semanas a partir do rollup_estoque (None sem a migração 5)"""
+        if not db.fetchone("SELECT to_regclass('rollup_estoque') IS NOT NULL")[0]:
+            return None
+        total, skus, clientes = db.fetchone("""
+            SELECT COALESCE(SUM(soma_estoque), 0), COUNT(DISTINCT sku), COUNT(DISTINCT cod_cliente)
+            FROM rollup_estoque
+            WHERE semana >= DATE_TRUNC('week', CURRENT_DATE - 364)
+        """)
+        return f"Total em estoque (52 semanas): {float(total):.2f}, SKUs: {skus}, Clientes: {clientes}"
+
+    def _resumo_rollup_faturamento(self, db: NeonDB) -> Optional[str]:
+        """Resumo dos últimos 12 meses a partir do rollup_faturamento (None sem a migração 5)"""
+        if not db.fetchone("SELECT to_regclass('rollup_faturamento') IS NOT NULL")[0]:
+            return None
+        total, giro_soma, giro_qtd, skus, clientes = db.fetchone("""
+            SELECT COALESCE(SUM(soma_peso), 0), COALESCE(SUM(giro_soma), 0), COALESCE(SUM(giro_qtd), 0)::bigint,
+                   COUNT(DISTINCT sku), COUNT(DISTINCT cod_cliente)
+            FROM rollup_faturamento
+            WHERE mes >= DATE_TRUNC('month', CURRENT_DATE - 364)
+        """)
+        giro_medio = float(giro_soma) / giro_qtd if giro_qtd else 0.0
+        return (f"Total peso líquido (12 meses): {float(total):.2f}, Giro médio: {giro_medio:.2f}, "
+                f"SKUs: {skus}, Clientes: {clientes}")
+
     def _generate_estoque_summary(self, data: List[tuple]) -> str:
         """Gera resumo dos dados de estoque"""
         if not data:
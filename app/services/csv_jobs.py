@@ -0,0 +1,224 @@
+"""Jobs de ingestão de CSV em segundo plano.
+
+O upload só copia o arquivo para um temporário e enfileira o job; um pool
+próprio com CSV_JOB_WORKERS threads faz o processamento. Assim vários uploads
+grandes rodam ao mesmo tempo sem ocupar o threadpool do FastAPI (usado pelas
+rotas síncronas, como as do chat) nem mais que CSV_JOB_WORKERS conexões do pool.
+Um job de upload em lote valida num pool de processos e grava com
+INGESTAO_ESCRITORES conexões (services/ingestao_paralela.py).
+
+Os jobs ficam na memória do processo: com mais de um worker do uvicorn, a
+consulta de progresso precisa cair no mesmo processo que recebeu o upload.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from services.esquemas_ingestao import ESQUEMAS
+from services.formatos_upload import extensao, formato_upload
+
+_WORKERS = int(os.getenv("CSV_JOB_WORKERS", "2"))
+# jobs aguardando um worker livre; acima disso o upload é recusado
+_MAX_PENDENTES = int(os.getenv("CSV_JOB_MAX_PENDING", "20"))
+# jobs terminados mantidos para consulta
+_HISTORICO = int(os.getenv("CSV_JOB_HISTORY", "100"))
+
+NA_FILA = "na_fila"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+
+class FilaCheiaError(Exception):
+    """Já há jobs demais em andamento ou na fila"""
+
+
+class JobIngestao:
+    def __init__(self, tabela: str, arquivos: List[str], paralelo: bool = False):
+        self.id = uuid.uuid4().hex
+        self.tabela = tabela
+        self.arquivos = arquivos
+        self.arquivo = arquivos[0] if len(arquivos) == 1 else f"{len(arquivos)} arquivos"
+        # paralelo: validação no pool de processos da ingestao_paralela (upload em lote)
+        self.paralelo = paralelo
+        self.formato = "lote" if paralelo else formato_upload(arquivos[0]) or "csv"
+        self.caminhos: List[str] = []
+        self.bytes_total = 0
+        self.bytes_lidos = 0
+        self.status = NA_FILA
+        self.criado_em = time.time()
+        self.iniciado_em: Optional[float] = None
+        self.concluido_em: Optional[float] = None
+        self.registros_processados = 0
+        self.registros_com_erro = 0
+        self.registros_duplicados = 0
+        self.resultado: Optional[Dict[str, Any]] = None
+        self.erro: Optional[str] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.status in (CONCLUIDO, ERRO)
+
+    def to_dict(self) -> Dict[str, Any]:
+        fim = self.concluido_em or time.time()
+        decorrido = fim - self.iniciado_em if self.iniciado_em else 0.0
+        linhas = self.registros_processados + self.registros_com_erro + self.registros_duplicados
+        progresso = self.bytes_lidos / self.bytes_total if self.bytes_total else (1.0 if self.terminado else 0.0)
+        eta = None
+        if self.status == PROCESSANDO and 0 < progresso < 1:
+            eta = round(decorrido * (1 - progresso) / progresso, 1)
+        elif self.terminado:
+            eta = 0.0
+        return {
+            "job_id": self.id,
+            "tabela": self.tabela,
+            "arquivo": self.arquivo,
+            "arquivos": self.arquivos,
+            "formato": self.formato,
+            "status": self.status,
+            "registros_processados": self.registros_processados,
+            "registros_com_erro": self.registros_com_erro,
+            "registros_duplicados": self.registros_duplicados,
+            "linhas_por_s": round(linhas / decorrido, 1) if decorrido > 0 else 0.0,
+            "progresso": round(min(progresso, 1.0), 4),
+            "eta_s": eta,
+            "criado_em": self.criado_em,
+            "iniciado_em": self.iniciado_em,
+            "concluido_em": self.concluido_em,
+            "resultado": self.resultado,
+            "erro": self.erro,
+        }
+
+
+class GerenciadorJobs:
+    def __init__(self, workers: int = _WORKERS, max_pendentes: int = _MAX_PENDENTES, historico: int = _HISTORICO):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="csv-job")
+        self._limite = workers + max_pendentes
+        self._historico = historico
+        self._jobs: "OrderedDict[str, JobIngestao]" = OrderedDict()
+        self._lock = threading.Lock()
+        # importado aqui (primeiro upload) para o pandas da validação não pesar no startup da API
+        from services.csv_service import CsvService
+        self._servico = CsvService()
+
+    def enviar(self, tabela: str, nome: str, arquivo: BinaryIO) -> JobIngestao:
+        """Copia o arquivo para um temporário e enfileira o job. Bloqueante (rode fora do event loop)."""
+        return self._enfileirar(JobIngestao(tabela, [nome]), [arquivo])
+
+    def enviar_lote(self, tabela: str, arquivos: List[tuple[str, BinaryIO]]) -> JobIngestao:
+        """Um job para vários arquivos [(nome, arquivo)], validados em paralelo (services/ingestao_paralela.py)"""
+        return self._enfileirar(JobIngestao(tabela, [nome for nome, _ in arquivos], paralelo=True),
+                                [arquivo for _, arquivo in arquivos])
+
+    def _enfileirar(self, job: JobIngestao, arquivos: List[BinaryIO]) -> JobIngestao:
+        with self._lock:
+            ativos = sum(not j.terminado for j in self._jobs.values())
+            if ativos >= self._limite:
+                raise FilaCheiaError(f"{ativos} jobs de CSV em andamento; tente novamente mais tarde")
+            # reserva a vaga antes da cópia, que pode demorar
+            self._jobs[job.id] = job
+            self._descartar_antigos()
+
+        try:
+            # o UploadFile é fechado ao fim do request; o job precisa da própria cópia
+            for nome, arquivo in zip(job.arquivos, arquivos):
+                sufixo = extensao(formato_upload(nome) or "csv")
+                with tempfile.NamedTemporaryFile(prefix="csv_job_", suffix=sufixo, delete=False) as destino:
+                    job.caminhos.append(destino.name)
+                    shutil.copyfileobj(arquivo, destino, 1 << 20)
+                job.bytes_total += os.path.getsize(destino.name)
+            print(f"[CSV] Job {job.id} na fila ({job.tabela}, {job.arquivo}, {job.bytes_total} bytes)")
+            job.future = self._executor.submit(self._executar, job)
+        except Exception as e:
+            self._finalizar(job, erro=str(e))
+            raise
+        return job
+
+    def obter(self, job_id: str) -> Optional[JobIngestao]:
+        return self._jobs.get(job_id)
+
+    def encerrar(self) -> None:
+        """Cancela os jobs ainda na fila e espera os que estão rodando"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for job in list(self._jobs.values()):
+            if not job.terminado:
+                self._finalizar(job, erro="Aplicação encerrada antes do processamento")
+
+    def _executar(self, job: JobIngestao) -> JobIngestao:
+        job.status = PROCESSANDO
+        job.iniciado_em = time.time()
+        try:
+            esquema = ESQUEMAS[job.tabela]
+            if job.paralelo:
+                def progresso_lote(processados: int, com_erro: int, duplicados: int, bytes_lidos: int) -> None:
+                    job.registros_processados = processados
+                    job.registros_com_erro = com_erro
+                    job.registros_duplicados = duplicados
+                    job.bytes_lidos = bytes_lidos
+
+                from services.ingestao_paralela import IngestaoParalela
+
+                resultado = IngestaoParalela().ingerir(esquema, list(zip(job.arquivos, job.caminhos)), progresso_lote)
+            else:
+                with open(job.caminhos[0], "rb") as f:
+                    def progresso(processados: int, com_erro: int, duplicados: int) -> None:
+                        job.registros_processados = processados
+                        job.registros_com_erro = com_erro
+                        job.registros_duplicados = duplicados
+                        job.bytes_lidos = f.tell()
+
+                    resultado = self._servico.processar_arquivo(esquema, f, progresso, job.formato)
+            detalhes = resultado["detalhes"]
+            job.registros_processados = detalhes["registros_processados"]
+            job.registros_com_erro = detalhes["registros_com_erro"]
+            job.registros_duplicados = detalhes["registros_duplicados"]
+            job.bytes_lidos = job.bytes_total
+            self._finalizar(job, resultado=resultado, erro=None if resultado["success"] else resultado["message"])
+        except Exception as e:
+            self._finalizar(job, erro=f"Erro ao processar arquivo: {str(e)}")
+        return job
+
+    def _finalizar(self, job: JobIngestao, resultado: Optional[Dict[str, Any]] = None, erro: Optional[str] = None) -> None:
+        job.resultado = resultado
+        job.erro = erro
+        job.status = ERRO if erro else CONCLUIDO
+        job.concluido_em = time.time()
+        for caminho in job.caminhos:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+        print(f"[CSV] Job {job.id} {job.status}: {job.registros_processados} gravados, "
+              f"{job.registros_com_erro} com erro, {job.registros_duplicados} já existentes" + (f" ({erro})" if erro else ""))
+
+    def _descartar_antigos(self) -> None:
+        terminados = [j.id for j in self._jobs.values() if j.terminado]
+        for job_id in terminados[:max(0, len(terminados) - self._historico)]:
+            del self._jobs[job_id]
+
+
+_gerenciador: Optional[GerenciadorJobs] = None
+_gerenciador_lock = threading.Lock()
+
+
+def get_gerenciador() -> GerenciadorJobs:
+    global _gerenciador
+    if _gerenciador is None:
+        with _gerenciador_lock:
+            if _gerenciador is None:
+                _gerenciador = GerenciadorJobs()
+    return _gerenciador
+
+
+def encerrar_jobs() -> None:
+    global _gerenciador
+    if _gerenciador is not None:
+        _gerenciador.encerrar()
+        _gerenciador = None
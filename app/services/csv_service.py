@@ -1,171 +1,309 @@
 import csv
+import hashlib
 import io
-from datetime import datetime
-from typing import List, Dict, Any
+import os
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Iterator, BinaryIO, Optional
+from db.hash_linha import COLUNA as COLUNA_HASH, COLUNAS_HASH, expressao_hash, nome_indice
 from db.neon_db import NeonDB
-from models.csv_models import FaturamentoCsvModel, EstoqueCsvModel
+from services.esquemas_ingestao import EsquemaIngestao
+from services.formatos_upload import FORMATOS_COLUNARES, abrir_csv, ler_lotes_arrow
+from services.validacao_csv import ValidadorLote
+
+# Linhas validadas (em lote, colunarmente) e enviadas por COPY de cada vez
+_COPY_LOTE = int(os.getenv("CSV_COPY_BATCH_SIZE", "10000"))
+_MAX_ERROS = 10
+
+# chamado após cada lote com (registros_processados, registros_com_erro, registros_duplicados) acumulados
+Progresso = Callable[[int, int, int], None]
+
+# sha256 dos arquivos ingeridos sem erro neste processo (cada processo/worker tem o seu), com o período
+# de datas e a contagem de linhas nele: um upload idêntico nem chega ao banco enquanto a contagem for a mesma
+_DIGESTS_MAX = int(os.getenv("CSV_DIGEST_CACHE", "1000"))
+_arquivos_ingeridos: "OrderedDict[tuple[str, str], tuple[tuple | None, int, int]]" = OrderedDict()
+_arquivos_lock = threading.Lock()
+# tabelas em que o índice de hash_linha (migração 4) já foi confirmado
+_com_hash_linha: set[str] = set()
+
+
+def ler_lotes(csv_content: Iterable[str], tamanho: int) -> tuple[List[str], Iterator[tuple[List[List[str]], range]]]:
+    """Lê o CSV (separador |) em lotes de linhas cruas; devolve o cabeçalho e os lotes com os números das linhas.
+
+    A numeração é a do DictReader: começa em 2 e as linhas vazias são puladas sem contar.
+    """
+    csv_reader = csv.reader(csv_content, delimiter='|')
+    cabecalho = next(csv_reader, None) or []
+    nao_vazias = filter(None, csv_reader)
+
+    def lotes():
+        linha_num = 2
+        while linhas := list(islice(nao_vazias, tamanho)):
+            yield linhas, range(linha_num, linha_num + len(linhas))
+            linha_num += len(linhas)
+
+    return cabecalho, lotes()
+
+
+def _digest_arquivo(arquivo: BinaryIO) -> str | None:
+    """sha256 do conteúdo a partir da posição atual, que é restaurada; None se o arquivo não for seekable"""
+    if not arquivo.seekable():
+        return None
+    inicio = arquivo.tell()
+    digest = hashlib.sha256()
+    while bloco := arquivo.read(1 << 20):
+        digest.update(bloco)
+    arquivo.seek(inicio)
+    return digest.hexdigest()
+
+
+def _contar_periodo(tabela: str, periodo: tuple) -> int:
+    """Linhas da tabela entre a menor e a maior data do arquivo (varredura do índice de data)"""
+    with NeonDB() as db:
+        return db.fetchone(f"SELECT COUNT(*) FROM {tabela} WHERE data BETWEEN %s AND %s", list(periodo))[0]
+
+
+def _arquivo_ingerido(tabela: str, digest: str) -> int | None:
+    """Linhas aceitas na ingestão anterior do mesmo arquivo, ou None se ele é novo ou o período dele mudou"""
+    with _arquivos_lock:
+        registro = _arquivos_ingeridos.get((tabela, digest))
+    if registro is None:
+        return None
+    periodo, contagem, linhas = registro
+    # linhas apagadas (ou gravadas por outra carga) no período: o arquivo vai ao banco de novo
+    if periodo and _contar_periodo(tabela, periodo) != contagem:
+        return None
+    return linhas
+
+
+def _registrar_arquivo(tabela: str, digest: str, periodo: tuple | None, linhas: int) -> None:
+    contagem = _contar_periodo(tabela, periodo) if periodo else 0
+    with _arquivos_lock:
+        _arquivos_ingeridos[(tabela, digest)] = (periodo, contagem, linhas)
+        _arquivos_ingeridos.move_to_end((tabela, digest))
+        while len(_arquivos_ingeridos) > _DIGESTS_MAX:
+            _arquivos_ingeridos.popitem(last=False)
+
 
 class CsvService:
+    """Motor de ingestão único: tabela, colunas, tipos e regras vêm do EsquemaIngestao."""
+
     def __init__(self):
         pass
 
-    def processar_csv_faturamento(self, csv_content: str) -> Dict[str, Any]:
-        """Processa CSV de faturamento e salva no banco de dados."""
-        try:
-            registros_processados = 0
-            registros_com_erro = 0
-            erros = []
-
-            csv_reader = csv.DictReader(io.StringIO(csv_content), delimiter='|')
-            
-            with NeonDB() as db:
-                for linha_num, linha in enumerate(csv_reader, start=2):
-                    try:
-                        faturamento = FaturamentoCsvModel(
-                            data=datetime.strptime(linha['data'], '%Y-%m-%d').date(),
-                            cod_cliente=int(linha['cod_cliente']),
-                            lote=linha['lote'].strip(),
-                            origem=linha['origem'].strip(),
-                            zs_gr_mercad=linha['zs_gr_mercad'].strip(),
-                            produto=linha['produto'].strip(),
-                            cod_produto=linha['cod_produto'].strip(),
-                            zs_centro=linha['zs_centro'].strip(),
-                            zs_cidade=linha['zs_cidade'].strip(),
-                            zs_uf=linha['zs_uf'].strip(),
-                            zs_peso_liquido=float(linha['zs_peso_liquido']),
-                            giro_sku_cliente=float(linha['giro_sku_cliente']),
-                            SKU=linha['SKU'].strip()
-                        )
-
-                        query = """
-                        INSERT INTO faturamento 
-                        (data, cod_cliente, lote, origem, zs_gr_mercad, produto, cod_produto, 
-                         zs_centro, zs_cidade, zs_uf, zs_peso_liquido, giro_sku_cliente, SKU)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
-                        
-                        db.execute(query, [
-                            faturamento.data,
-                            faturamento.cod_cliente,
-                            faturamento.lote,
-                            faturamento.origem,
-                            faturamento.zs_gr_mercad,
-                            faturamento.produto,
-                            faturamento.cod_produto,
-                            faturamento.zs_centro,
-                            faturamento.zs_cidade,
-                            faturamento.zs_uf,
-                            faturamento.zs_peso_liquido,
-                            faturamento.giro_sku_cliente,
-                            faturamento.SKU
-                        ])
-                        
-                        registros_processados += 1
-
-                    except Exception as e:
-                        registros_com_erro += 1
-                        erros.append(f"Linha {linha_num}: {str(e)}")
-                        continue
-
-                db.commit()
+    def processar_csv(self, esquema: EsquemaIngestao, csv_content: str,
+                      progresso: Optional[Progresso] = None) -> Dict[str, Any]:
+        """Processa um CSV em texto e salva no banco de dados."""
+        return self._processar_csv(esquema, csv_content, progresso)
 
+    def processar_arquivo(self, esquema: EsquemaIngestao, arquivo: BinaryIO, progresso: Optional[Progresso] = None,
+                          formato: str = "csv") -> Dict[str, Any]:
+        """Processa o arquivo (CSV UTF-8, compactado ou não, Parquet ou Arrow) lendo-o aos poucos."""
+        tabela = esquema.tabela
+        # digest dos bytes enviados (compactados, se for o caso)
+        digest = _digest_arquivo(arquivo) if _DIGESTS_MAX > 0 else None
+        if digest and (linhas := _arquivo_ingerido(tabela, digest)) is not None:
+            print(f"[CSV] Arquivo idêntico a um já ingerido em {tabela} ({digest[:12]}); nada a gravar")
             return {
                 "success": True,
-                "message": "CSV de faturamento processado com sucesso",
-                "detalhes": {
-                    "registros_processados": registros_processados,
-                    "registros_com_erro": registros_com_erro,
-                    "erros": erros[:10]
-                }
-            }
-
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Erro ao processar CSV de faturamento: {str(e)}",
+                "message": f"CSV de {tabela} idêntico a um já processado; nada foi gravado",
                 "detalhes": {
                     "registros_processados": 0,
                     "registros_com_erro": 0,
-                    "erros": [str(e)]
+                    "registros_duplicados": linhas,
+                    "arquivo_repetido": True,
+                    "erros": []
                 }
             }
 
-    def processar_csv_estoque(self, csv_content: str) -> Dict[str, Any]:
-        """Processa CSV de estoque e salva no banco de dados."""
+        # menor e maior data das linhas aceitas, preenchidas pelo _ingerir
+        periodo = []
+        if formato in FORMATOS_COLUNARES:
+            resultado = self._processar_colunar(esquema, arquivo, formato, progresso, periodo)
+        else:
+            # descompacta e decodifica sob demanda: só o lote atual fica em memória
+            binario = abrir_csv(arquivo, formato)
+            texto = io.TextIOWrapper(binario, encoding='utf-8', newline='')
+            try:
+                resultado = self._processar_csv(esquema, texto, progresso, periodo)
+            finally:
+                # devolve o arquivo aberto para quem o criou (o UploadFile fecha depois)
+                texto.detach()
+                if binario is not arquivo:
+                    binario.close()
+        detalhes = resultado["detalhes"]
+        # com linhas recusadas o mesmo arquivo pode ser reenviado depois de corrigir o banco
+        if digest and resultado["success"] and detalhes["registros_com_erro"] == 0:
+            _registrar_arquivo(tabela, digest, tuple(periodo) or None,
+                               detalhes["registros_processados"] + detalhes["registros_duplicados"])
+        return resultado
+
+    def _processar_csv(self, esquema: EsquemaIngestao, csv_content: str | Iterable[str],
+                       progresso: Optional[Progresso] = None, periodo: Optional[list] = None) -> Dict[str, Any]:
+        """Valida em lotes de CSV_COPY_BATCH_SIZE linhas com as regras do esquema e grava as válidas com COPY.
+
+        Linhas com o mesmo conteúdo de uma já gravada são puladas (registros_duplicados).
+        Um UnicodeDecodeError no meio do arquivo é repassado (nada é gravado).
+        """
+        if isinstance(csv_content, str):
+            csv_content = io.StringIO(csv_content)
+
+        def validados():
+            cabecalho, lotes = ler_lotes(csv_content, _COPY_LOTE)
+            validador = ValidadorLote(esquema, cabecalho)
+            for linhas, numeros in lotes:
+                yield validador.validar(linhas, numeros)
+
+        return self._ingerir(esquema, validados(), progresso, periodo)
+
+    def _processar_colunar(self, esquema: EsquemaIngestao, arquivo: BinaryIO, formato: str,
+                           progresso: Optional[Progresso] = None, periodo: Optional[list] = None) -> Dict[str, Any]:
+        """Parquet/Arrow: os lotes de colunas vão para a validação sem virar texto.
+
+        O número da linha nos erros é a posição do registro no arquivo, a partir de 1.
+        """
+        def validados():
+            inicio = 1
+            validador = None
+            for lote in ler_lotes_arrow(arquivo, formato, _COPY_LOTE):
+                if validador is None:
+                    # nomes de colunas do Parquet costumam vir em minúsculas (sku)
+                    validador = ValidadorLote(esquema, lote.schema.names, ignorar_caixa=True)
+                numeros = range(inicio, inicio + lote.num_rows)
+                inicio += lote.num_rows
+                yield validador.validar_arrow(lote, numeros)
+
+        return self._ingerir(esquema, validados(), progresso, periodo)
+
+    def _ingerir(self, esquema: EsquemaIngestao, lotes: Iterator[tuple[List[tuple], List[tuple]]],
+                 progresso: Optional[Progresso] = None, periodo: Optional[list] = None) -> Dict[str, Any]:
+        """Grava os lotes (aceitas, recusadas) já validados numa única transação e monta o relatório.
+
+        Se `periodo` for passado (lista vazia), recebe a menor e a maior data das linhas aceitas.
+        """
+        tabela, colunas = esquema.tabela, esquema.destinos
+        pos_data = colunas.index("data") if periodo is not None and "data" in colunas else None
         try:
             registros_processados = 0
             registros_com_erro = 0
+            registros_duplicados = 0
             erros = []
 
-            csv_reader = csv.DictReader(io.StringIO(csv_content), delimiter='|')
-            
             with NeonDB() as db:
-                for linha_num, linha in enumerate(csv_reader, start=2):
-                    try:
-                        estoque = EstoqueCsvModel(
-                            data=datetime.strptime(linha['data'], '%Y-%m-%d').date(),
-                            cod_cliente=int(linha['cod_cliente']),
-                            es_centro=linha['es_centro'].strip(),
-                            tipo_material=linha['tipo_material'].strip(),
-                            origem=linha['origem'].strip(),
-                            cod_produto=linha['cod_produto'].strip(),
-                            lote=linha['lote'].strip(),
-                            dias_em_estoque=int(linha['dias_em_estoque']),
-                            produto=linha['produto'].strip(),
-                            grupo_mercadoria=linha['grupo_mercadoria'].strip(),
-                            es_totalestoque=float(linha['es_totalestoque']),
-                            SKU=linha['SKU'].strip()
-                        )
-
-                        query = """
-                        INSERT INTO estoque 
-                        (data, cod_cliente, es_centro, tipo_material, origem, cod_produto, 
-                         lote, dias_em_estoque, produto, grupo_mercadoria, es_totalestoque, SKU)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
-                        
-                        db.execute(query, [
-                            estoque.data,
-                            estoque.cod_cliente,
-                            estoque.es_centro,
-                            estoque.tipo_material,
-                            estoque.origem,
-                            estoque.cod_produto,
-                            estoque.lote,
-                            estoque.dias_em_estoque,
-                            estoque.produto,
-                            estoque.grupo_mercadoria,
-                            estoque.es_totalestoque,
-                            estoque.SKU
-                        ])
-                        
-                        registros_processados += 1
-
-                    except Exception as e:
-                        registros_com_erro += 1
-                        erros.append(f"Linha {linha_num}: {str(e)}")
-                        continue
+                staging = self.criar_staging(db, tabela, colunas)
+                for aceitas, recusadas in lotes:
+                    falhas = [f"Linha {linha_num}: {erro}" for linha_num, erro in recusadas]
+                    gravados = duplicados = 0
+                    if aceitas and pos_data is not None:
+                        datas = [valores[pos_data] for _, valores in aceitas] + periodo
+                        periodo[:] = [min(datas), max(datas)]
+                    if aceitas:
+                        gravados, duplicados, falhas_banco = self.gravar_lote(db, tabela, colunas, aceitas, staging)
+                        falhas.extend(falhas_banco)
+                    registros_processados += gravados
+                    registros_duplicados += duplicados
+                    registros_com_erro += len(falhas)
+                    erros.extend(falhas[:_MAX_ERROS - len(erros)])
+                    if progresso:
+                        progresso(registros_processados, registros_com_erro, registros_duplicados)
 
                 db.commit()
 
             return {
                 "success": True,
-                "message": "CSV de estoque processado com sucesso",
+                "message": f"CSV de {tabela} processado com sucesso",
                 "detalhes": {
                     "registros_processados": registros_processados,
                     "registros_com_erro": registros_com_erro,
-                    "erros": erros[:10]
+                    "registros_duplicados": registros_duplicados,
+                    "erros": erros
                 }
             }
 
+        except UnicodeDecodeError:
+            raise
         except Exception as e:
             return {
                 "success": False,
-                "message": f"Erro ao processar CSV de estoque: {str(e)}",
+                "message": f"Erro ao processar CSV de {tabela}: {str(e)}",
                 "detalhes": {
                     "registros_processados": 0,
                     "registros_com_erro": 0,
+                    "registros_duplicados": 0,
                     "erros": [str(e)]
                 }
             }
 
+    def criar_staging(self, db: NeonDB, tabela: str, colunas: List[str]) -> str | None:
+        """Tabela temporária (some no commit) por onde os lotes passam antes do INSERT ... ON CONFLICT.
+
+        Sem o índice de hash_linha (migração 4 pendente) ou sem a tabela em COLUNAS_HASH devolve None
+        e os lotes vão direto com COPY.
+        """
+        if tabela not in _com_hash_linha:
+            if tabela not in COLUNAS_HASH:
+                print(f"⚠️ [CSV] {tabela} fora de COLUNAS_HASH; linhas repetidas não serão detectadas")
+                return None
+            # o hash vem de COLUNAS_HASH, não da ordem do arquivo; faltando coluna, o hash não bate com o do banco
+            faltando = set(COLUNAS_HASH[tabela]) - set(colunas)
+            if faltando:
+                raise ValueError(f"Colunas de {COLUNA_HASH} ausentes no esquema de {tabela}: {sorted(faltando)}")
+            if not db.fetchone("SELECT to_regclass(%s) IS NOT NULL", [nome_indice(tabela)])[0]:
+                print(f"⚠️ [CSV] {tabela} sem {COLUNA_HASH} (rode python -m db.migrations); linhas repetidas não serão detectadas")
+                return None
+            _com_hash_linha.add(tabela)
+        staging = f"csv_staging_{tabela}"
+        db.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {', '.join(colunas)} FROM {tabela} WITH NO DATA")
+        return staging
+
+    def gravar_lote(self, db: NeonDB, tabela: str, colunas: List[str], lote: List[tuple],
+                     staging: str | None = None) -> tuple[int, int, List[str]]:
+        """Grava o lote com COPY; se o banco recusar alguma linha, refaz linha a linha para apontar quais.
+
+        Com `staging`, o COPY vai para a tabela temporária e um único INSERT ... ON CONFLICT
+        move para `tabela` só as linhas cujo hash ainda não existe.
+        Retorna (linhas gravadas, linhas já existentes, mensagens de erro das linhas recusadas).
+        """
+        lista_colunas = ', '.join(colunas)
+        mover = (
+            f"INSERT INTO {tabela} ({lista_colunas}, {COLUNA_HASH}) "
+            f"SELECT {lista_colunas}, {expressao_hash(tabela)} FROM {staging} "
+            f"ON CONFLICT (data, {COLUNA_HASH}) DO NOTHING"
+        ) if staging else None
+        db.execute("SAVEPOINT lote_csv")
+        try:
+            if staging:
+                db.execute(f"TRUNCATE {staging}")
+                enviados = db.copy_rows(staging, colunas, (valores for _, valores in lote))
+                gravados = db.execute(mover)
+            else:
+                enviados = gravados = db.copy_rows(tabela, colunas, (valores for _, valores in lote))
+            db.execute("RELEASE SAVEPOINT lote_csv")
+            return gravados, enviados - gravados, []
+        except Exception as e:
+            db.execute("ROLLBACK TO SAVEPOINT lote_csv")
+            print(f"[CSV] COPY em {tabela} recusado ({str(e).splitlines()[0]}); gravando o lote linha a linha")
+
+        destino = staging or tabela
+        query = f"INSERT INTO {destino} ({lista_colunas}) VALUES ({', '.join(['%s'] * len(colunas))})"
+        gravados = duplicados = 0
+        falhas = []
+        for linha_num, valores in lote:
+            # savepoint por linha: um erro do banco não derruba as linhas já gravadas
+            db.execute("SAVEPOINT linha_csv")
+            try:
+                if staging:
+                    db.execute(f"DELETE FROM {staging}")
+                    db.execute(query, list(valores))
+                    inserida = db.execute(mover)
+                else:
+                    db.execute(query, list(valores))
+                    inserida = 1
+                db.execute("RELEASE SAVEPOINT linha_csv")
+                gravados += inserida
+                duplicados += 1 - inserida
+            except Exception as e:
+                db.execute("ROLLBACK TO SAVEPOINT linha_csv")
+                falhas.append(f"Linha {linha_num}: {str(e).splitlines()[0]}")
+        return gravados, duplicados, falhas
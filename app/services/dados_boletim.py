@@ -0,0 +1,179 @@
+"""Leitura dos dados do boletim: linhas das tabelas fato ou rollups.
+
+`acumular_linhas` percorre estoque/faturamento em lotes (cursor server-side);
+`acumular_rollups` chega aos mesmos indicadores somando os rollups mantidos na
+ingestão (db/rollups.py, migração 5) e lendo da tabela fato só as linhas dos
+baldes incompletos nas bordas da janela.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+
+from db.neon_db import NeonDB
+from db.rollups import ROLLUPS
+from models.dados_boletim_model import AcumuladorBoletim
+from models.estoque_model import EstoqueModel
+from models.faturamento_model import FaturamentoModel
+
+# linhas buscadas por ida ao banco ao montar o boletim
+_BATCH_SIZE = int(os.getenv("BOLETIM_BATCH_SIZE", "2000"))
+
+_COLUNAS_ESTOQUE = [
+    "data", "cod_cliente", "es_centro", "tipo_material", "origem", "cod_produto",
+    "lote", "dias_em_estoque", "produto", "grupo_mercadoria",
+    "es_totalestoque", "SKU"
+]
+_COLUNAS_FATURAMENTO = [
+    "data", "cod_cliente", "lote", "origem", "zs_gr_mercad", "produto",
+    "cod_produto", "zs_centro", "zs_cidade", "zs_uf",
+    "zs_peso_liquido", "giro_sku_cliente", "SKU"
+]
+
+# em ordem de (data, id): o "último" estoque de cada SKU é o da linha mais recente,
+# como o ultimo_valor dos rollups
+_SQL_ESTOQUE_BOLETIM = """
+    SELECT
+        data,
+        cod_cliente,
+        es_centro,
+        tipo_material,
+        origem,
+        cod_produto,
+        lote,
+        dias_em_estoque,
+        produto,
+        grupo_mercadoria,
+        es_totalestoque,
+        sku AS "SKU"
+    FROM estoque
+    WHERE data IS NULL OR data >= %s
+    ORDER BY data, id
+"""
+
+_SQL_FATURAMENTO_BOLETIM = """
+    SELECT
+        data,
+        cod_cliente,
+        lote,
+        origem,
+        zs_gr_mercad,
+        produto,
+        cod_produto,
+        zs_centro,
+        zs_cidade,
+        zs_uf,
+        zs_peso_liquido,
+        giro_sku_cliente,
+        sku AS "SKU"
+    FROM faturamento
+    WHERE data BETWEEN %s AND %s
+"""
+
+# Mesmos indicadores a partir dos rollups (db/rollups.py): semanas/meses inteiros
+# da janela vêm do rollup e só as linhas do balde incompleto na borda, da tabela fato.
+# Uma linha por SKU (estoque) e por (SKU, mês) (faturamento).
+_SQL_ESTOQUE_ROLLUP = """
+    WITH partes AS (
+        SELECT sku, cod_cliente, linhas, soma_estoque, nao_zero, dias_qtd, dias_soma, dias_min, dias_max,
+               ultimo_data, ultimo_id, ultimo_valor
+        FROM rollup_estoque
+        WHERE semana IS NULL OR semana >= %s
+        UNION ALL
+        SELECT sku, cod_cliente, 1, COALESCE(es_totalestoque, 0), (COALESCE(es_totalestoque, 0) <> 0)::int,
+               (dias_em_estoque IS NOT NULL)::int, COALESCE(dias_em_estoque, 0), dias_em_estoque, dias_em_estoque,
+               data, id, COALESCE(es_totalestoque, 0)
+        FROM estoque
+        WHERE data >= %s AND data < %s
+    )
+    SELECT
+        sku,
+        SUM(linhas)::bigint,
+        SUM(soma_estoque),
+        SUM(nao_zero)::bigint,
+        SUM(dias_qtd)::bigint,
+        SUM(dias_soma),
+        MIN(dias_min),
+        MAX(dias_max),
+        (ARRAY_AGG(ultimo_valor ORDER BY COALESCE(ultimo_data, 'infinity') DESC, ultimo_id DESC))[1],
+        ARRAY_AGG(DISTINCT cod_cliente) FILTER (WHERE cod_cliente IS NOT NULL)
+    FROM partes
+    GROUP BY sku
+"""
+
+_SQL_FATURAMENTO_ROLLUP = """
+    WITH partes AS (
+        SELECT sku, mes, com_peso, giro_qtd, giro_soma
+        FROM rollup_faturamento
+        WHERE mes >= %s AND mes < %s
+        UNION ALL
+        SELECT sku, DATE_TRUNC('month', data::timestamp)::date, (COALESCE(zs_peso_liquido, 0) > 0)::int,
+               (giro_sku_cliente IS NOT NULL)::int, COALESCE(giro_sku_cliente, 0)
+        FROM faturamento
+        WHERE data BETWEEN %s AND %s AND NOT (data >= %s AND data < %s)
+    )
+    SELECT sku, mes, SUM(com_peso)::bigint, SUM(giro_qtd)::bigint, SUM(giro_soma)
+    FROM partes
+    GROUP BY sku, mes
+"""
+
+
+def _linha_para_dict(colunas: list[str], row: tuple) -> dict:
+    """Converte a tupla do banco em dict; 'data' (date) vira datetime para comparar com o corte"""
+    data_dict = dict(zip(colunas, row))
+    if isinstance(data_dict['data'], date) and not isinstance(data_dict['data'], datetime):
+        data_dict['data'] = datetime.combine(data_dict['data'], datetime.min.time())
+    return data_dict
+
+
+
+def _primeiro_dia(momento: datetime) -> date:
+    """Primeira data cuja meia-noite é >= momento (como `data >= momento` no SQL)"""
+    dia = momento.date()
+    return dia if momento.time() == time(0) else dia + timedelta(days=1)
+
+
+def tem_rollups(db: NeonDB) -> bool:
+    return db.fetchone(
+        "SELECT to_regclass(%s) IS NOT NULL AND to_regclass(%s) IS NOT NULL",
+        [ROLLUPS["estoque"].nome, ROLLUPS["faturamento"].nome],
+    )[0]
+
+
+def acumular_linhas(db: NeonDB, acumulador: AcumuladorBoletim, data_inicio: datetime, data_fim: datetime) -> tuple[int, int]:
+    """Percorre as linhas das tabelas fato em lotes (cursor server-side); retorna quantas leu de cada"""
+    total_estoque = total_faturamento = 0
+    # 🔹 Query Estoque (o acumulador só considera as últimas 52 semanas)
+    for lote in db.stream(_SQL_ESTOQUE_BOLETIM, [acumulador.cutoff], batch_size=_BATCH_SIZE):
+        if not total_estoque:
+            print("🔍 Exemplo linha estoque:", dict(zip(_COLUNAS_ESTOQUE, lote[0])))
+        total_estoque += len(lote)
+        for row in lote:
+            acumulador.adicionar_estoque(EstoqueModel(**_linha_para_dict(_COLUNAS_ESTOQUE, row)))
+
+    # 🔹 Query Faturamento
+    for lote in db.stream(_SQL_FATURAMENTO_BOLETIM, [data_inicio, data_fim], batch_size=_BATCH_SIZE):
+        if not total_faturamento:
+            print("🔍 Exemplo linha faturamento:", dict(zip(_COLUNAS_FATURAMENTO, lote[0])))
+        total_faturamento += len(lote)
+        for row in lote:
+            acumulador.adicionar_faturamento(FaturamentoModel(**_linha_para_dict(_COLUNAS_FATURAMENTO, row)))
+    return total_estoque, total_faturamento
+
+
+def acumular_rollups(db: NeonDB, acumulador: AcumuladorBoletim, data_inicio: datetime, data_fim: datetime) -> tuple[int, int]:
+    """Mesmos indicadores de acumular_linhas a partir dos rollups; retorna as linhas agregadas lidas"""
+    estoque, faturamento = ROLLUPS["estoque"], ROLLUPS["faturamento"]
+
+    inicio = _primeiro_dia(acumulador.cutoff)
+    semana = estoque.proximo_balde(inicio)
+    por_sku = db.fetchall(_SQL_ESTOQUE_ROLLUP, [semana, inicio, semana])
+    for row in por_sku:
+        acumulador.adicionar_agregado_estoque(*row)
+
+    # o acumulador também descarta faturamento anterior ao corte de 52 semanas
+    inicio = _primeiro_dia(max(data_inicio, acumulador.cutoff))
+    fim = data_fim.date()
+    mes_inicio, mes_fim = faturamento.proximo_balde(inicio), faturamento.balde(fim + timedelta(days=1))
+    por_mes = db.fetchall(_SQL_FATURAMENTO_ROLLUP, [mes_inicio, mes_fim, inicio, fim, mes_inicio, mes_fim])
+    for row in por_mes:
+        acumulador.adicionar_agregado_faturamento(*row)
+    return len(por_sku), len(por_mes)
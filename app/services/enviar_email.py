@@ -1,6 +1,5 @@
 import os
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,15 +9,23 @@ BREVO_KEY = os.getenv("BREVO_KEY")
 BREVO_SENDER_EMAIL = os.getenv("BREVO_SENDER_EMAIL")
 BREVO_SENDER_NAME = os.getenv("BREVO_SENDER_NAME")
 
-configuration = sib_api_v3_sdk.Configuration()
-configuration.api_key['api-key'] = BREVO_KEY
 
-api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-    sib_api_v3_sdk.ApiClient(configuration)
-)
+@lru_cache(maxsize=1)
+def _api_instance():
+    """Cliente do Brevo, criado no primeiro envio (o SDK não é importado no startup da API)"""
+    import sib_api_v3_sdk
+
+    configuration = sib_api_v3_sdk.Configuration()
+    configuration.api_key['api-key'] = BREVO_KEY
+    return sib_api_v3_sdk.TransactionalEmailsApi(
+        sib_api_v3_sdk.ApiClient(configuration)
+    )
 
 def enviar_email(destinatarios: list[str], assunto: str, conteudo_html: str):
     """Envia e-mail para uma lista de destinatários"""
+    import sib_api_v3_sdk
+    from sib_api_v3_sdk.rest import ApiException
+
     try:
         email = sib_api_v3_sdk.SendSmtpEmail(
             to=[{"email": d} for d in destinatarios],
@@ -27,7 +34,7 @@ def enviar_email(destinatarios: list[str], assunto: str, conteudo_html: str):
             html_content=conteudo_html,
         )
 
-        response = api_instance.send_transac_email(email)
+        response = _api_instance().send_transac_email(email)
         print("Resposta do Brevo para envio:", response.to_dict())
 
         return {"status": "sucesso", "response": response.to_dict()}
@@ -0,0 +1,66 @@
+"""Descritores das tabelas fato que aceitam ingestão de arquivo (CSV, Parquet, Arrow).
+
+Cada `EsquemaIngestao` diz, coluna a coluna, o nome no arquivo, o tipo, a regra
+de validação, o conversor (opcional; o padrão vem do tipo) e a coluna de destino
+no banco. O CsvService, as rotas /csv/{tabela}/... e os jobs trabalham só com o
+descritor, então uma tabela nova precisa apenas de uma entrada em ESQUEMAS:
+
+    ESQUEMAS["pedido"] = EsquemaIngestao("pedido", (
+        Coluna("data", date, "data"),
+        Coluna("cod_cliente", int, "cod_cliente"),
+        Coluna("quantidade", float, "quantidade", RegraCampo("nao_negativo", "Quantidade negativa")),
+    ))
+
+Para usar hash_linha (reingestão idempotente) a tabela precisa da coluna e do
+índice criados pela migração 4 e de uma entrada em db.hash_linha.COLUNAS_HASH;
+o hash usa aquela lista, não a ordem das colunas do descritor.
+"""
+from datetime import date
+from typing import Callable, NamedTuple, Optional, Type
+
+from pydantic import BaseModel
+
+from models.csv_models import EstoqueCsvModel, FaturamentoCsvModel, RegraCampo
+
+
+class Coluna(NamedTuple):
+    nome: str  # no cabeçalho do CSV / nome da coluna no Parquet
+    tipo: type  # date, int, float ou str
+    destino: str  # coluna na tabela do banco
+    regra: Optional[RegraCampo] = None
+    # (valores brutos) -> (valores convertidos, {posição: erro}); None usa o conversor do tipo
+    conversor: Optional[Callable] = None
+
+
+class EsquemaIngestao(NamedTuple):
+    tabela: str
+    colunas: tuple[Coluna, ...]
+    # modelo Pydantic equivalente, referência linha a linha nos testes e benchmarks
+    modelo: Optional[Type[BaseModel]] = None
+
+    @property
+    def nomes(self) -> list[str]:
+        return [c.nome for c in self.colunas]
+
+    @property
+    def destinos(self) -> list[str]:
+        return [c.destino for c in self.colunas]
+
+
+def esquema_do_modelo(tabela: str, modelo: Type[BaseModel]) -> EsquemaIngestao:
+    """Descritor a partir dos campos (na ordem declarada) e das REGRAS do modelo; o destino é o nome em minúsculas"""
+    regras = getattr(modelo, "REGRAS", {})
+    colunas = tuple(
+        Coluna(nome, campo.annotation, nome.lower(), regras.get(nome))
+        for nome, campo in modelo.model_fields.items()
+    )
+    for coluna in colunas:
+        if coluna.tipo not in (date, int, float, str):
+            raise ValueError(f"Tipo sem conversor padrão em {tabela}.{coluna.nome}: {coluna.tipo}")
+    return EsquemaIngestao(tabela, colunas, modelo)
+
+
+ESQUEMAS: dict[str, EsquemaIngestao] = {
+    "faturamento": esquema_do_modelo("faturamento", FaturamentoCsvModel),
+    "estoque": esquema_do_modelo("estoque", EstoqueCsvModel),
+}
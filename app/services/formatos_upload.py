@@ -0,0 +1,93 @@
+"""Formatos aceitos no upload de estoque/faturamento.
+
+CSV (separador |, UTF-8) puro ou compactado (.csv.gz, .csv.zst), descompactado
+em streaming, e Parquet/Arrow IPC, lidos em lotes de colunas (RecordBatch) que
+vão direto para a validação colunar, sem passar por texto. zstandard e pyarrow
+só são importados quando um arquivo desses formatos chega.
+"""
+import gzip
+import importlib
+from typing import BinaryIO, Iterator, Optional
+
+# extensão -> formato; a mais longa é testada primeiro (.csv.gz antes de .csv)
+FORMATOS = {
+    ".csv": "csv",
+    ".csv.gz": "csv.gz",
+    ".csv.zst": "csv.zst",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+FORMATOS_COLUNARES = ("parquet", "arrow")
+EXTENSOES = ", ".join(FORMATOS)
+
+
+def formato_upload(nome: str | None) -> str | None:
+    """Formato pelo nome do arquivo, ou None se a extensão não for aceita"""
+    nome = (nome or "").lower()
+    for extensao in sorted(FORMATOS, key=len, reverse=True):
+        if nome.endswith(extensao):
+            return FORMATOS[extensao]
+    return None
+
+
+def extensao(formato: str) -> str:
+    return next(ext for ext, f in FORMATOS.items() if f == formato)
+
+
+def _importar(modulo: str, pacote: str, formato: str):
+    try:
+        return importlib.import_module(modulo)
+    except ImportError:
+        raise ValueError(f"Upload em {formato} precisa do pacote {pacote} (pip install {pacote})")
+
+
+def abrir_csv(arquivo: BinaryIO, formato: str) -> BinaryIO:
+    """Bytes do CSV, descompactando aos poucos; quem chama fecha o retorno se ele não for o próprio `arquivo`"""
+    if formato == "csv":
+        return arquivo
+    if formato == "csv.gz":
+        # fechar o GzipFile não fecha o arquivo de origem
+        return gzip.GzipFile(fileobj=arquivo, mode="rb")
+    if formato == "csv.zst":
+        zstandard = _importar("zstandard", "zstandard", formato)
+        return zstandard.ZstdDecompressor().stream_reader(arquivo, closefd=False)
+    raise ValueError(f"Formato sem CSV: {formato}")
+
+
+def contar_grupos(arquivo: BinaryIO, formato: str) -> Optional[int]:
+    """Row groups do Parquet ou record batches do Arrow IPC; None se o arquivo só pode ser lido em sequência (stream IPC)"""
+    pa = _importar("pyarrow", "pyarrow", formato)
+    if formato == "parquet":
+        parquet = _importar("pyarrow.parquet", "pyarrow", formato)
+        return parquet.ParquetFile(arquivo).num_row_groups
+    try:
+        return pa.ipc.open_file(arquivo).num_record_batches
+    except pa.ArrowInvalid:
+        return None
+
+
+def ler_lotes_arrow(arquivo: BinaryIO, formato: str, tamanho: int, grupos: Optional[range] = None) -> Iterator:
+    """pyarrow.RecordBatch de até `tamanho` linhas, lidos do Parquet (por row group) ou do Arrow IPC.
+
+    `grupos` limita a leitura a esses row groups / record batches (partes da ingestão paralela).
+    """
+    pa = _importar("pyarrow", "pyarrow", formato)
+    if formato == "parquet":
+        parquet = _importar("pyarrow.parquet", "pyarrow", formato)
+        yield from parquet.ParquetFile(arquivo).iter_batches(batch_size=tamanho, row_groups=grupos)
+        return
+    if formato != "arrow":
+        raise ValueError(f"Formato não colunar: {formato}")
+    inicio = arquivo.tell()
+    try:
+        leitor = pa.ipc.open_file(arquivo)
+        lotes = (leitor.get_batch(i) for i in (grupos or range(leitor.num_record_batches)))
+    except pa.ArrowInvalid:
+        # sem o rodapé do formato arquivo: é um stream IPC
+        arquivo.seek(inicio)
+        lotes = iter(pa.ipc.open_stream(arquivo))
+    for lote in lotes:
+        # lotes grandes do IPC são fatiados (sem cópia) no tamanho do lote de gravação
+        for deslocamento in range(0, lote.num_rows, tamanho):
+            yield lote.slice(deslocamento, tamanho)
@@ -0,0 +1,397 @@
+"""Ingestão de vários arquivos (ou de um arquivo grande) usando todos os núcleos.
+
+Cada arquivo é dividido em partes independentes: CSV em faixas de bytes que
+terminam em fim de linha, Parquet em grupos de row groups e Arrow IPC em grupos
+de record batches (.csv.gz/.csv.zst são descompactados antes para um temporário;
+stream IPC vira uma parte só). Um pool de INGESTAO_PROCESSOS processos (padrão:
+um por núcleo) lê e valida as partes com o ValidadorLote. Os lotes validados
+voltam ao processo principal na ordem do arquivo, recebem a numeração de linha
+definitiva e vão para INGESTAO_ESCRITORES conexões (padrão 2), que gravam como
+o CsvService (COPY + INSERT ... ON CONFLICT). Cada linha vai para o escritor do
+balde do rollup da sua data (semana no estoque, mês no faturamento; db/rollups.py):
+linhas iguais e linhas do mesmo balde caem sempre na mesma conexão, então duas
+transações nunca esperam uma pela outra no índice único (data, hash_linha) nem
+na linha do rollup que os gatilhos atualizam.
+
+Cada escritor tem a própria transação e só faz commit depois que todos gravaram
+o último lote sem erro; se um falhar, os outros fazem rollback. O commit não é
+atômico entre as conexões, mas reenviar os arquivos é seguro (hash_linha).
+
+Um CSV com quebra de linha dentro de um campo entre aspas não pode ser dividido
+em faixas de bytes; use INGESTAO_PARTE_MB maior que o arquivo para não dividir.
+
+CLI (a partir de app/):
+
+    python -m services.ingestao_paralela faturamento jan.csv fev.csv.gz mar.parquet --processos 8
+"""
+import argparse
+import csv
+import io
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from db.neon_db import NeonDB
+from db.rollups import ROLLUPS
+from services.csv_service import (
+    _COPY_LOTE, _DIGESTS_MAX, _MAX_ERROS, CsvService, _arquivo_ingerido, _digest_arquivo, _registrar_arquivo,
+)
+from services.esquemas_ingestao import ESQUEMAS, EsquemaIngestao
+from services.formatos_upload import FORMATOS_COLUNARES, abrir_csv, contar_grupos, formato_upload, ler_lotes_arrow
+from services.validacao_csv import ValidadorLote
+
+_PROCESSOS = int(os.getenv("INGESTAO_PROCESSOS", "0")) or os.cpu_count() or 1
+_ESCRITORES = int(os.getenv("INGESTAO_ESCRITORES", "2"))
+_TAMANHO_PARTE = int(float(os.getenv("INGESTAO_PARTE_MB", "16")) * 2**20)
+
+# chamado após cada parte gravada com (processados, com_erro, duplicados, bytes das partes já validadas)
+ProgressoLote = Callable[[int, int, int, int], None]
+
+
+class Parte(NamedTuple):
+    """Trecho de um arquivo validado por um processo do pool"""
+    arquivo: int  # posição na lista de arquivos
+    caminho: str
+    formato: str  # "csv" (já descompactado), "parquet" ou "arrow"
+    inicio: int  # CSV: byte; colunar: primeiro row group / record batch (None = arquivo inteiro)
+    fim: int
+    bytes: int  # peso da parte no progresso
+    cabecalho: Optional[tuple[str, ...]] = None
+
+
+def _dividir_csv(arquivo: int, caminho: str, tamanho_parte: int) -> List[Parte]:
+    """Faixas de ~tamanho_parte bytes depois do cabeçalho, cada uma terminando num fim de linha"""
+    total = os.path.getsize(caminho)
+    partes = []
+    with open(caminho, "rb") as f:
+        linha = f.readline().decode("utf-8")
+        cabecalho = tuple(next(csv.reader([linha], delimiter="|"), []))
+        inicio = f.tell()
+        while inicio < total:
+            f.seek(min(inicio + tamanho_parte, total))
+            f.readline()  # avança até o fim da linha em que o corte caiu
+            fim = f.tell()
+            partes.append(Parte(arquivo, caminho, "csv", inicio, fim, fim - inicio, cabecalho))
+            inicio = fim
+    return partes
+
+
+def _dividir_colunar(arquivo: int, caminho: str, formato: str, tamanho_parte: int) -> List[Parte]:
+    """Grupos de row groups / record batches somando ~tamanho_parte bytes do arquivo"""
+    total = os.path.getsize(caminho)
+    with open(caminho, "rb") as f:
+        grupos = contar_grupos(f, formato)
+    if not grupos:
+        return [Parte(arquivo, caminho, formato, None, None, total)]
+    por_parte = max(1, tamanho_parte * grupos // max(total, 1))
+    return [
+        Parte(arquivo, caminho, formato, inicio, min(inicio + por_parte, grupos),
+              total * (min(inicio + por_parte, grupos) - inicio) // grupos)
+        for inicio in range(0, grupos, por_parte)
+    ]
+
+
+def _separar_por_escritor(esquema: EsquemaIngestao, aceitas: List[tuple], escritores: int) -> List[List[tuple]]:
+    """Aceitas divididas por escritor pelo balde do rollup da data (sem coluna data, tudo vai para o primeiro)"""
+    grupos = [[] for _ in range(escritores)]
+    if "data" not in esquema.destinos:
+        grupos[0] = aceitas
+        return grupos
+    pos = esquema.destinos.index("data")
+    rollup = ROLLUPS.get(esquema.tabela)
+    for item in aceitas:
+        data = item[1][pos]
+        grupos[(rollup.balde(data) if rollup else data).toordinal() % escritores].append(item)
+    return grupos
+
+
+def validar_parte(esquema: EsquemaIngestao, parte: Parte, lote: int, escritores: int) -> tuple[List[tuple], int]:
+    """Roda num processo do pool: lê e valida a parte em lotes de `lote` linhas.
+
+    Devolve ([(aceitas por escritor, recusadas)], linhas lidas); os números de
+    linha são a posição dentro da parte (a partir de 0) e o processo principal
+    os desloca.
+    """
+    validados = []
+    total = 0
+    if parte.formato == "csv":
+        with open(parte.caminho, "rb") as f:
+            f.seek(parte.inicio)
+            texto = f.read(parte.fim - parte.inicio).decode("utf-8")
+        validador = ValidadorLote(esquema, parte.cabecalho)
+        # como no ler_lotes: linhas vazias são puladas sem contar
+        nao_vazias = filter(None, csv.reader(io.StringIO(texto), delimiter="|"))
+        while linhas := list(islice(nao_vazias, lote)):
+            aceitas, recusadas = validador.validar(linhas, range(total, total + len(linhas)))
+            validados.append((_separar_por_escritor(esquema, aceitas, escritores), recusadas))
+            total += len(linhas)
+        return validados, total
+
+    grupos = range(parte.inicio, parte.fim) if parte.inicio is not None else None
+    validador = None
+    with open(parte.caminho, "rb") as f:
+        for lote_arrow in ler_lotes_arrow(f, parte.formato, lote, grupos):
+            if validador is None:
+                validador = ValidadorLote(esquema, lote_arrow.schema.names, ignorar_caixa=True)
+            aceitas, recusadas = validador.validar_arrow(lote_arrow, range(total, total + lote_arrow.num_rows))
+            validados.append((_separar_por_escritor(esquema, aceitas, escritores), recusadas))
+            total += lote_arrow.num_rows
+    return validados, total
+
+
+class _Totais:
+    """Contadores por arquivo, compartilhados entre o processo principal e os escritores"""
+
+    def __init__(self, nomes: List[str]):
+        self.nomes = nomes
+        self.por_arquivo = [{"registros_processados": 0, "registros_com_erro": 0, "registros_duplicados": 0}
+                            for _ in nomes]
+        # menor e maior data das linhas aceitas de cada arquivo (para o cache de digests)
+        self.periodos: List[Optional[tuple]] = [None for _ in nomes]
+        self.erros: List[str] = []
+        self.falha: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def somar(self, arquivo: int, processados: int = 0, duplicados: int = 0, falhas: List[str] = ()) -> None:
+        with self._lock:
+            contadores = self.por_arquivo[arquivo]
+            contadores["registros_processados"] += processados
+            contadores["registros_duplicados"] += duplicados
+            contadores["registros_com_erro"] += len(falhas)
+            self.erros.extend(f"{self.nomes[arquivo]}: {f}" for f in falhas[:_MAX_ERROS - len(self.erros)])
+
+    def ampliar_periodo(self, arquivo: int, datas: List) -> None:
+        with self._lock:
+            atual = self.periodos[arquivo]
+            datas = list(datas) + list(atual or ())
+            self.periodos[arquivo] = (min(datas), max(datas))
+
+    def falhar(self, mensagem: str) -> None:
+        with self._lock:
+            self.falha = self.falha or mensagem
+
+    def total(self, chave: str) -> int:
+        return sum(c[chave] for c in self.por_arquivo)
+
+
+class IngestaoParalela:
+    def __init__(self, processos: int = _PROCESSOS, escritores: int = _ESCRITORES, tamanho_parte: int = _TAMANHO_PARTE):
+        self.processos = max(1, processos)
+        self.escritores = max(1, escritores)
+        self.tamanho_parte = tamanho_parte
+        self._servico = CsvService()
+
+    def ingerir(self, esquema: EsquemaIngestao, arquivos: List[tuple[str, str]],
+                progresso: Optional[ProgressoLote] = None) -> Dict[str, Any]:
+        """Valida e grava os arquivos [(nome, caminho)] na tabela do esquema; relatório como o do CsvService"""
+        nomes = [nome for nome, _ in arquivos]
+        totais = _Totais(nomes)
+        repetidos, digests, temporarios = set(), {}, []
+        iguais = {}  # arquivo repetido nesta chamada -> posição da primeira cópia
+        inicio = time.perf_counter()
+        try:
+            partes = []
+            for i, (nome, caminho) in enumerate(arquivos):
+                formato = formato_upload(nome)
+                if formato is None:
+                    raise ValueError(f"{nome}: formato não aceito")
+                with open(caminho, "rb") as f:
+                    digest = _digest_arquivo(f) if _DIGESTS_MAX > 0 else None
+                if digest and (linhas := _arquivo_ingerido(esquema.tabela, digest)) is not None:
+                    print(f"[CSV] {nome} idêntico a um arquivo já ingerido em {esquema.tabela}; pulando")
+                    repetidos.add(i)
+                    totais.somar(i, duplicados=linhas)
+                    continue
+                if digest and digest in digests.values():
+                    print(f"[CSV] {nome} idêntico a outro arquivo desta ingestão; pulando")
+                    repetidos.add(i)
+                    iguais[i] = next(j for j, d in digests.items() if d == digest)
+                    continue
+                if digest:
+                    digests[i] = digest
+                if formato in FORMATOS_COLUNARES:
+                    partes.extend(_dividir_colunar(i, caminho, formato, self.tamanho_parte))
+                    continue
+                if formato != "csv":
+                    caminho = self._descompactar(caminho, formato)
+                    temporarios.append(caminho)
+                partes.extend(_dividir_csv(i, caminho, self.tamanho_parte))
+
+            print(f"[CSV] Ingestão paralela em {esquema.tabela}: {len(arquivos)} arquivos, {len(partes)} partes, "
+                  f"{self.processos} processos, {self.escritores} escritores")
+            self._executar(esquema, partes, totais, progresso)
+        except Exception as e:
+            totais.falhar(str(e))
+        finally:
+            for caminho in temporarios:
+                os.remove(caminho)
+
+        duracao = time.perf_counter() - inicio
+        if totais.falha:
+            print(f"⚠️ [CSV] Ingestão paralela em {esquema.tabela} falhou em {duracao:.1f}s: {totais.falha}")
+            return {
+                "success": False,
+                "message": f"Erro ao processar arquivos de {esquema.tabela}: {totais.falha}",
+                "detalhes": {
+                    "registros_processados": 0,
+                    "registros_com_erro": 0,
+                    "registros_duplicados": 0,
+                    "erros": [totais.falha]
+                }
+            }
+
+        for i, primeiro in iguais.items():
+            contadores = totais.por_arquivo[primeiro]
+            totais.somar(i, duplicados=contadores["registros_processados"] + contadores["registros_duplicados"])
+        for i, digest in digests.items():
+            contadores = totais.por_arquivo[i]
+            # com linhas recusadas o mesmo arquivo pode ser reenviado depois de corrigir o banco
+            if contadores["registros_com_erro"] == 0:
+                _registrar_arquivo(esquema.tabela, digest, totais.periodos[i],
+                                   contadores["registros_processados"] + contadores["registros_duplicados"])
+        processados = totais.total("registros_processados")
+        print(f"✅ [CSV] Ingestão paralela em {esquema.tabela}: {processados} gravados em {duracao:.1f}s")
+        return {
+            "success": True,
+            "message": f"{len(arquivos)} arquivos de {esquema.tabela} processados com sucesso",
+            "detalhes": {
+                "registros_processados": processados,
+                "registros_com_erro": totais.total("registros_com_erro"),
+                "registros_duplicados": totais.total("registros_duplicados"),
+                "erros": totais.erros,
+                "arquivos": [
+                    dict(arquivo=nome, **contadores, **({"arquivo_repetido": True} if i in repetidos else {}))
+                    for i, (nome, contadores) in enumerate(zip(nomes, totais.por_arquivo))
+                ],
+            }
+        }
+
+    def _descompactar(self, caminho: str, formato: str) -> str:
+        with open(caminho, "rb") as origem, \
+                tempfile.NamedTemporaryFile(prefix="ingestao_", suffix=".csv", delete=False) as destino:
+            binario = abrir_csv(origem, formato)
+            try:
+                shutil.copyfileobj(binario, destino, 1 << 20)
+            finally:
+                binario.close()
+        return destino.name
+
+    def _executar(self, esquema: EsquemaIngestao, partes: List[Parte], totais: _Totais,
+                  progresso: Optional[ProgressoLote]) -> None:
+        # uma fila curta por escritor: se o banco atrasa, a validação espera
+        filas: "List[queue.Queue[Optional[tuple[int, List[tuple]]]]]" = [
+            queue.Queue(maxsize=2) for _ in range(self.escritores)
+        ]
+        barreira = threading.Barrier(self.escritores)
+        escritores = [
+            threading.Thread(target=self._escrever, args=(esquema, fila, totais, barreira), name=f"ingestao-escritor-{n}")
+            for n, fila in enumerate(filas)
+        ]
+        for escritor in escritores:
+            escritor.start()
+        try:
+            self._validar(esquema, partes, filas, totais, progresso)
+        except Exception as e:
+            totais.falhar(str(e))
+        finally:
+            for fila in filas:
+                fila.put(None)
+            for escritor in escritores:
+                escritor.join()
+
+    def _validar(self, esquema: EsquemaIngestao, partes: List[Parte], filas: List[queue.Queue], totais: _Totais,
+                 progresso: Optional[ProgressoLote]) -> None:
+        """Distribui as partes no pool e repassa os lotes aos escritores na ordem do arquivo"""
+        # numeração igual à do caminho sequencial: CSV começa em 2 (linha 1 é o cabeçalho), colunar em 1
+        proxima_linha = {p.arquivo: 1 if p.formato in FORMATOS_COLUNARES else 2 for p in partes}
+        pos_data = esquema.destinos.index("data") if "data" in esquema.destinos else None
+        bytes_lidos = 0
+        # spawn: um fork do processo da API levaria junto as threads e conexões abertas
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.processos, max(len(partes), 1)), mp_context=contexto) as pool:
+            pendentes = deque()
+            restantes = iter(partes)
+            # no máximo duas partes por processo em andamento: a memória não cresce com o número de arquivos
+            for parte in islice(restantes, 2 * self.processos):
+                pendentes.append((parte, pool.submit(validar_parte, esquema, parte, _COPY_LOTE, self.escritores)))
+            try:
+                while pendentes:
+                    parte, futuro = pendentes.popleft()
+                    validados, linhas = futuro.result()
+                    if totais.falha:
+                        break
+                    if (proxima := next(restantes, None)) is not None:
+                        pendentes.append((proxima, pool.submit(validar_parte, esquema, proxima, _COPY_LOTE, self.escritores)))
+                    base = proxima_linha[parte.arquivo]
+                    proxima_linha[parte.arquivo] += linhas
+                    for por_escritor, recusadas in validados:
+                        totais.somar(parte.arquivo, falhas=[f"Linha {base + n}: {erro}" for n, erro in recusadas])
+                        for fila, aceitas in zip(filas, por_escritor):
+                            if not aceitas:
+                                continue
+                            if pos_data is not None:
+                                totais.ampliar_periodo(parte.arquivo, [valores[pos_data] for _, valores in aceitas])
+                            fila.put((parte.arquivo, [(base + n, valores) for n, valores in aceitas]))
+                    bytes_lidos += parte.bytes
+                    if progresso:
+                        progresso(totais.total("registros_processados"), totais.total("registros_com_erro"),
+                                  totais.total("registros_duplicados"), bytes_lidos)
+            finally:
+                # falha num processo ou num escritor: as partes ainda na fila do pool nem começam
+                pool.shutdown(cancel_futures=True)
+
+    def _escrever(self, esquema: EsquemaIngestao, fila: queue.Queue, totais: _Totais, barreira: threading.Barrier) -> None:
+        """Uma conexão: grava os lotes da fila e faz commit só se nenhum escritor falhou"""
+        fila_esvaziada = False
+        try:
+            with NeonDB() as db:
+                staging = self._servico.criar_staging(db, esquema.tabela, esquema.destinos)
+                while (item := fila.get()) is not None:
+                    # depois de uma falha só esvazia a fila, para o processo principal não travar
+                    if totais.falha is None:
+                        arquivo, aceitas = item
+                        gravados, duplicados, falhas = self._servico.gravar_lote(
+                            db, esquema.tabela, esquema.destinos, aceitas, staging)
+                        totais.somar(arquivo, gravados, duplicados, falhas)
+                fila_esvaziada = True
+                barreira.wait()
+                if totais.falha is None:
+                    db.commit()
+        except Exception as e:
+            if not isinstance(e, threading.BrokenBarrierError):
+                totais.falhar(str(e))
+            barreira.abort()
+            while not fila_esvaziada and fila.get() is not None:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão paralela de arquivos CSV/Parquet/Arrow numa tabela")
+    parser.add_argument("tabela", choices=list(ESQUEMAS))
+    parser.add_argument("arquivos", nargs="+", help="arquivos .csv, .csv.gz, .csv.zst, .parquet, .arrow ou .feather")
+    parser.add_argument("--processos", type=int, default=_PROCESSOS, help="processos de validação")
+    parser.add_argument("--escritores", type=int, default=_ESCRITORES, help="conexões gravando no banco")
+    parser.add_argument("--parte-mb", type=float, default=_TAMANHO_PARTE / 2**20, help="tamanho de cada parte")
+    args = parser.parse_args()
+
+    ingestao = IngestaoParalela(args.processos, args.escritores, int(args.parte_mb * 2**20))
+    resultado = ingestao.ingerir(ESQUEMAS[args.tabela], [(os.path.basename(a), a) for a in args.arquivos])
+    detalhes = resultado["detalhes"]
+    for arquivo in detalhes.get("arquivos", []):
+        print(f"  {arquivo['arquivo']}: {arquivo['registros_processados']} gravados, "
+              f"{arquivo['registros_com_erro']} com erro, {arquivo['registros_duplicados']} já existentes")
+    for erro in detalhes["erros"]:
+        print(f"  {erro}")
+    raise SystemExit(0 if resultado["success"] else 1)
+
+
+if __name__ == "__main__":
+    main()
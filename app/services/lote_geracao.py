@@ -0,0 +1,197 @@
+"""Agendador de micro-lotes para o generate do modelo local.
+
+Perguntas simultâneas no chat disputam o mesmo modelo; gerar uma de cada vez
+desperdiça a CPU/GPU, que rende mais com várias sequências por passo. Cada
+combinação de modelo e parâmetros de geração tem uma fila e uma thread: o
+primeiro pedido que chega espera até LLM_BATCH_WAIT_MS pelos próximos (ou até
+juntar LLM_BATCH_SIZE), os prompts são completados com padding à esquerda e
+vão num generate só; cada chamador recebe de volta os ids do seu pedido.
+
+Um pedido que chega sozinho na janela segue pelo cache de prefixo
+(services/cache_prefixo.py); num lote de verdade o cache de prefixo não é usado,
+porque o padding à esquerda desalinha as posições do prefixo entre os prompts.
+Com decodificação gulosa o texto do lote costuma ser o mesmo do pedido sozinho,
+mas o padding muda o formato das contas e pode trocar um token de vez em quando
+(benchmarks/bench_lote_geracao.py mede a concordância).
+
+Se a thread do agendador morrer, os pedidos pendentes falham na hora e o próximo
+pedido sobe uma thread nova; quem espera desiste depois de LLM_BATCH_TIMEOUT_S.
+
+Configuração pelo .env:
+- LLM_BATCH_SIZE: pedidos por lote (padrão 4; 1 desliga o agendador e gera na thread do chamador);
+- LLM_BATCH_WAIT_MS: espera máxima pelo resto do lote (padrão 10);
+- LLM_BATCH_TIMEOUT_S: espera máxima de um pedido pela resposta, incluindo a fila (padrão 300).
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+
+from services import cache_prefixo
+from services.modelos import ModeloCarregado
+
+load_dotenv()
+
+TAMANHO_LOTE = int(os.getenv("LLM_BATCH_SIZE", "4"))
+ESPERA_MS = float(os.getenv("LLM_BATCH_WAIT_MS", "10"))
+TIMEOUT_S = float(os.getenv("LLM_BATCH_TIMEOUT_S", "300"))
+
+
+class _Pedido(NamedTuple):
+    prompt: str
+    prefixo: str
+    futuro: Future
+
+
+class AgendadorGeracao:
+    """Fila + thread que junta pedidos com os mesmos parâmetros num generate em lote"""
+
+    def __init__(self, modelo: ModeloCarregado, parametros: dict, max_length: Optional[int] = None,
+                 tamanho_lote: int = TAMANHO_LOTE, espera_ms: float = ESPERA_MS, timeout_s: float = TIMEOUT_S):
+        self._modelo = modelo
+        self._parametros = parametros
+        self._max_length = max_length
+        self._tamanho_lote = tamanho_lote
+        self._espera = espera_ms / 1000
+        self._timeout = timeout_s
+        self._fila: "queue.Queue[_Pedido]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._ativo = False  # há uma thread consumindo a fila (só muda com _lock)
+        self._threads = 0
+        self._pedidos = 0
+        self._lotes = 0
+        self._maior_lote = 0
+
+    def gerar(self, prompt: str, prefixo: str = "") -> list[int]:
+        """Enfileira o prompt e espera o lote dele; devolve os ids da saída (prompt + texto gerado)"""
+        pedido = _Pedido(prompt, prefixo, Future())
+        with self._lock:
+            # a thread sobe no primeiro pedido e de novo se a anterior morreu
+            if not self._ativo:
+                self._ativo = True
+                self._threads += 1
+                threading.Thread(target=self._rodar, name="llm-lote", daemon=True).start()
+            self._fila.put(pedido)
+        try:
+            return pedido.futuro.result(timeout=self._timeout)
+        except TimeoutError:
+            # ainda na fila: a thread descarta o pedido cancelado
+            pedido.futuro.cancel()
+            raise
+
+    def _juntar(self) -> list[_Pedido]:
+        lote = [self._fila.get()]
+        prazo = time.monotonic() + self._espera
+        while len(lote) < self._tamanho_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        # descarta quem desistiu por timeout; os demais passam a "em execução" e não podem mais ser cancelados
+        return [p for p in lote if p.futuro.set_running_or_notify_cancel()]
+
+    def _rodar(self) -> None:
+        lote: list[_Pedido] = []
+        erro: BaseException = RuntimeError("Agendador de geração parado")
+        try:
+            while True:
+                lote = self._juntar()
+                if not lote:
+                    continue
+                with self._lock:
+                    self._pedidos += len(lote)
+                    self._lotes += 1
+                    self._maior_lote = max(self._maior_lote, len(lote))
+                try:
+                    saidas = self._gerar(lote)
+                except Exception as e:
+                    for pedido in lote:
+                        pedido.futuro.set_exception(e)
+                    lote = []
+                    continue
+                for pedido, saida in zip(lote, saidas):
+                    pedido.futuro.set_result(saida)
+                lote = []
+        except BaseException as e:
+            erro = e
+            print(f"⚠️ [LOTE] Thread do agendador de {self._modelo.modelo_id} parou: {e!r}")
+            raise
+        finally:
+            # nenhum pedido fica esperando uma thread que não existe mais; o próximo gerar sobe outra
+            pendentes = list(lote)
+            with self._lock:
+                self._ativo = False
+                while not self._fila.empty():
+                    pendentes.append(self._fila.get_nowait())
+            for pedido in pendentes:
+                futuro = pedido.futuro
+                if futuro.done():
+                    continue
+                # os do lote já estão em execução; os da fila podem ter sido cancelados por timeout
+                if futuro.running() or futuro.set_running_or_notify_cancel():
+                    futuro.set_exception(RuntimeError(f"Agendador de geração parado: {erro!r}"))
+
+    def _gerar(self, lote: list[_Pedido]) -> list[list[int]]:
+        modelo = self._modelo
+        if len(lote) == 1:
+            pedido = lote[0]
+            saida = cache_prefixo.gerar(modelo, pedido.prompt, pedido.prefixo, self._max_length, **self._parametros)
+            return [saida[0].tolist()]
+
+        import torch
+
+        truncar = {"truncation": True, "max_length": self._max_length} if self._max_length else {}
+        entradas = modelo.tokenizer([p.prompt for p in lote], return_tensors="pt", padding=True,
+                                    padding_side="left", **truncar)
+        # padding à esquerda de cada linha, para devolver só os ids do pedido
+        padding = (entradas["attention_mask"] == 0).sum(dim=1).tolist()
+        entradas = {k: v.to(modelo.device) for k, v in entradas.items()}
+        with torch.no_grad():
+            saidas = modelo.model.generate(**entradas, **self._parametros)
+        # as linhas que terminam antes seguem com pad_token_id até o fim do lote; o decode com
+        # skip_special_tokens descarta esse complemento
+        return [linha[inicio:].tolist() for linha, inicio in zip(saidas, padding)]
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "modelo": self._modelo.modelo_id, "dtype": self._modelo.dtype,
+                "tamanho_lote": self._tamanho_lote, "espera_ms": self._espera * 1000,
+                "pedidos": self._pedidos, "lotes": self._lotes, "maior_lote": self._maior_lote,
+                "ativo": self._ativo, "threads_iniciadas": self._threads,
+                "media_por_lote": round(self._pedidos / self._lotes, 2) if self._lotes else 0.0,
+                "na_fila": self._fila.qsize(),
+            }
+
+
+_lock = threading.Lock()
+_agendadores: dict[tuple, AgendadorGeracao] = {}
+
+
+def gerar(modelo: ModeloCarregado, prompt: str, prefixo: str = "", max_length: Optional[int] = None,
+          **parametros) -> list[int]:
+    """Gera pelo agendador do (modelo, parâmetros); devolve os ids da saída (prompt + texto gerado)"""
+    if TAMANHO_LOTE <= 1:
+        return cache_prefixo.gerar(modelo, prompt, prefixo, max_length, **parametros)[0].tolist()
+    # repr: parâmetros como eos_token_id podem ser listas
+    chave = (modelo.modelo_id, modelo.dtype, modelo.dispositivo, max_length, repr(sorted(parametros.items())))
+    agendador = _agendadores.get(chave)
+    if agendador is None:
+        with _lock:
+            agendador = _agendadores.get(chave)
+            if agendador is None:
+                agendador = AgendadorGeracao(modelo, parametros, max_length)
+                _agendadores[chave] = agendador
+    return agendador.gerar(prompt, prefixo)
+
+
+def estatisticas() -> list[dict]:
+    """Pedidos, lotes e tamanho médio dos lotes de cada agendador"""
+    with _lock:
+        return [a.estatisticas() for a in _agendadores.values()]
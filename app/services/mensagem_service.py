@@ -1,17 +1,25 @@
 from db.neon_db import NeonDB  
+from db.async_neon_db import AsyncNeonDB
 from services.auth_service import get_password_hash  
 from typing import List, Dict, Any, Optional
 
+_SQL_MENSAGENS_USUARIO = "SELECT id, mensagem, ia, envio FROM mensagem WHERE id_usuario = %s"
+
 class MensagemService:
     """Serviço para gerenciar mensagens"""
     
     def get_mensagens(self, id_user: int, db: NeonDB) -> List[Dict[str, Any]]:
         """Lista um usuário específico"""
-        mensagens = db.fetchall(
-            "SELECT id, mensagem, ia, envio FROM mensagem WHERE id_usuario = %s",
-            [id_user]
-        )
-        
+        mensagens = db.fetchall(_SQL_MENSAGENS_USUARIO, [id_user])
+        return self._ordenar(mensagens)
+
+    async def get_mensagens_async(self, id_user: int, db: AsyncNeonDB) -> List[Dict[str, Any]]:
+        """Versão assíncrona de get_mensagens"""
+        mensagens = await db.fetchall(_SQL_MENSAGENS_USUARIO, [id_user])
+        return self._ordenar(mensagens)
+
+    @staticmethod
+    def _ordenar(mensagens: list[tuple]) -> List[Dict[str, Any]]:
         sorted_mensagens = sorted(
             [
                 {
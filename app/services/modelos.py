@@ -0,0 +1,168 @@
+"""Registro dos modelos de linguagem locais (transformers) do processo.
+
+Cada combinação (modelo, dtype, dispositivo) é carregada uma vez por processo e
+compartilhada: o BoletimService e o AgentService pegam o mesmo modelo e o mesmo
+tokenizer em vez de chamar from_pretrained a cada boletim ou pergunta. O
+carregamento guarda o tempo e o RSS do processo antes/depois, expostos em
+GET /admin/modelos.
+
+Configuração pelo .env:
+- LLM_MODELO: modelo padrão (google/gemma-3-1b-pt);
+- LLM_DTYPE: modo de inferência, float32, bfloat16 ou int8 (quantização dinâmica
+  dos Linear, só na CPU). Sem ele: bfloat16 na GPU e float32 na CPU. bfloat16 na
+  CPU só vale com instruções nativas (AVX512-BF16/AMX); sem elas cai para float32;
+- LLM_PRELOAD_ON_STARTUP=1: carrega o modelo padrão ao iniciar a API.
+
+    python -m services.modelos     # carrega o modelo padrão e mostra tempo e memória
+"""
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODELO_PADRAO = os.getenv("LLM_MODELO", "google/gemma-3-1b-pt")
+DTYPES = ("float32", "bfloat16", "int8")
+_DTYPE_LLM = os.getenv("LLM_DTYPE", "").lower()
+
+
+class ModeloCarregado(NamedTuple):
+    """Modelo + tokenizer compartilhados e as medições do carregamento"""
+    modelo_id: str
+    dtype: str
+    dispositivo: str
+    model: Any
+    tokenizer: Any
+    segundos: float
+    rss_antes_mb: Optional[float]
+    rss_depois_mb: Optional[float]
+
+    @property
+    def device(self):
+        import torch
+        return torch.device(self.dispositivo)
+
+
+_lock = threading.Lock()
+_modelos: dict[tuple[str, str, str], ModeloCarregado] = {}
+
+
+def _rss_mb() -> Optional[float]:
+    """RSS atual do processo (None fora do Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def dispositivo_padrao() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def cpu_suporta_bf16() -> bool:
+    """CPU com bfloat16 nativo (AVX512-BF16, AMX ou BF16 no ARM); sem ele o bfloat16 é emulado e fica lento"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = {flag for linha in f if linha.startswith(("flags", "Features")) for flag in linha.split()}
+    except OSError:
+        return False
+    return bool(flags & {"avx512_bf16", "amx_bf16", "bf16"})
+
+
+def dtype_padrao(dispositivo: str) -> str:
+    """LLM_DTYPE ou, sem ele, bfloat16 na GPU e float32 na CPU"""
+    if not _DTYPE_LLM:
+        return "bfloat16" if dispositivo == "cuda" else "float32"
+    if _DTYPE_LLM not in DTYPES:
+        raise ValueError(f"LLM_DTYPE inválido: {_DTYPE_LLM} (use {', '.join(DTYPES)})")
+    return _DTYPE_LLM
+
+
+@lru_cache(maxsize=None)
+def _resolver_dtype(dtype: str, dispositivo: str) -> str:
+    """Troca combinações sem suporte pela mais próxima que funciona (avisa uma vez)"""
+    if dtype == "int8" and dispositivo != "cpu":
+        print("⚠️ [MODELO] Quantização int8 dinâmica só roda na CPU; usando bfloat16")
+        return "bfloat16"
+    if dtype == "bfloat16" and dispositivo == "cpu" and not cpu_suporta_bf16():
+        print("⚠️ [MODELO] CPU sem bfloat16 nativo; usando float32")
+        return "float32"
+    return dtype
+
+
+def _carregar(modelo_id: str, dtype: str, dispositivo: str) -> ModeloCarregado:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    print(f"[MODELO] Carregando {modelo_id} ({dtype}, {dispositivo})...")
+    rss_antes = _rss_mb()
+    inicio = time.perf_counter()
+    if dispositivo == "cuda":
+        model = AutoModelForCausalLM.from_pretrained(modelo_id, device_map="auto", dtype=getattr(torch, dtype))
+    else:
+        model = AutoModelForCausalLM.from_pretrained(modelo_id, low_cpu_mem_usage=True)
+        # int8: carrega em float32 e quantiza os Linear logo abaixo
+        model.to(dispositivo, dtype=torch.float32 if dtype == "int8" else getattr(torch, dtype))
+    # Modo de avaliação: desativa dropout e garante consistência
+    model.eval()
+    if dtype == "int8":
+        # pesos dos Linear em int8, ativações quantizadas a cada chamada; inplace evita uma segunda cópia
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    tokenizer = AutoTokenizer.from_pretrained(modelo_id)
+    segundos = round(time.perf_counter() - inicio, 2)
+    rss_depois = _rss_mb()
+    print(f"✅ [MODELO] {modelo_id} carregado em {segundos}s (RSS {rss_antes} -> {rss_depois} MB)")
+    return ModeloCarregado(modelo_id, dtype, dispositivo, model, tokenizer, segundos, rss_antes, rss_depois)
+
+
+def obter_modelo(modelo_id: str = MODELO_PADRAO, dtype: Optional[str] = None,
+                 dispositivo: Optional[str] = None) -> ModeloCarregado:
+    """Modelo compartilhado do processo; carrega na primeira chamada de cada (modelo, dtype, dispositivo)"""
+    dispositivo = dispositivo or dispositivo_padrao()
+    dtype = _resolver_dtype(dtype or dtype_padrao(dispositivo), dispositivo)
+    chave = (modelo_id, dtype, dispositivo)
+    carregado = _modelos.get(chave)
+    if carregado is not None:
+        return carregado
+    # um carregamento por vez: duas requisições simultâneas não carregam duas cópias
+    with _lock:
+        carregado = _modelos.get(chave)
+        if carregado is None:
+            carregado = _carregar(modelo_id, dtype, dispositivo)
+            _modelos[chave] = carregado
+    return carregado
+
+
+def precarregar() -> None:
+    """Carrega o modelo padrão (chamado no startup com LLM_PRELOAD_ON_STARTUP=1)"""
+    obter_modelo()
+
+
+def estatisticas() -> dict:
+    """Modelos carregados no processo, com tempo de carga e RSS"""
+    return {
+        "rss_atual_mb": _rss_mb(),
+        "modelos": [
+            {
+                "modelo": m.modelo_id, "dtype": m.dtype, "dispositivo": m.dispositivo,
+                "segundos_carga": m.segundos, "rss_antes_mb": m.rss_antes_mb, "rss_depois_mb": m.rss_depois_mb,
+            }
+            for m in _modelos.values()
+        ],
+    }
+
+
+if __name__ == "__main__":
+    import json
+    precarregar()
+    # a segunda chamada devolve o mesmo objeto, sem carregar de novo
+    inicio = time.perf_counter()
+    obter_modelo()
+    print(f"Segunda chamada: {(time.perf_counter() - inicio) * 1000:.3f} ms")
+    print(json.dumps(estatisticas(), indent=2, ensure_ascii=False))
@@ -2,8 +2,6 @@ import os
 import secrets
 import string
 from dotenv import load_dotenv
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 from db.neon_db import NeonDB  # ✅ Use a classe NeonDB
 from services.auth_service import get_password_hash
 
@@ -49,6 +47,10 @@ class PasswordRecoveryService:
 
     def send_email(self, to_email: str, new_password: str):
         """Envia e-mail com a nova senha via SendGrid"""
+        # importado só no envio: o SDK não pesa no startup da API
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
+
         html_content = f"""
         <html>
             <body style="font-family: Arial, sans-serif; padding: 20px;">
@@ -2,18 +2,37 @@ from db.neon_db import NeonDB
 from services.auth_service import get_password_hash  
 from typing import List, Dict, Any
 from services.auth_service import get_password_hash
+from db.async_neon_db import AsyncNeonDB
 import traceback
 
+_SQL_USER_POR_ID = "SELECT id, email, recebe_boletim, admin FROM usuario WHERE id = %s"
+_SQL_USERS_PAGINADO = "SELECT id, email, recebe_boletim, admin FROM usuario ORDER BY id OFFSET %s LIMIT %s"
+
 class UserService:
     """Serviço para gerenciar usuários"""
         
     def get_user(self, id: int, db: NeonDB) -> List[Dict[str, Any]]:
         """Lista usuários com paginação"""
-        user = db.fetchall(
-            "SELECT id, email, recebe_boletim, admin FROM usuario WHERE id = %s",
-            [id]
-        )[0]
-        
+        user = db.fetchall(_SQL_USER_POR_ID, [id])[0]
+        return self._user_to_dict(user)
+
+    async def get_user_async(self, id: int, db: AsyncNeonDB) -> Dict[str, Any]:
+        """Versão assíncrona de get_user"""
+        user = (await db.fetchall(_SQL_USER_POR_ID, [id]))[0]
+        return self._user_to_dict(user)
+    
+    def get_users(self, skip: int, limit: int, db: NeonDB) -> List[Dict[str, Any]]:
+        """Lista usuários com paginação"""
+        users = db.fetchall(_SQL_USERS_PAGINADO, [skip, limit])
+        return [self._user_to_dict(user) for user in users]
+
+    async def get_users_async(self, skip: int, limit: int, db: AsyncNeonDB) -> List[Dict[str, Any]]:
+        """Versão assíncrona de get_users"""
+        users = await db.fetchall(_SQL_USERS_PAGINADO, [skip, limit])
+        return [self._user_to_dict(user) for user in users]
+
+    @staticmethod
+    def _user_to_dict(user: tuple) -> Dict[str, Any]:
         return {
             "id": user[0],
             "email": user[1], 
@@ -22,24 +41,6 @@ class UserService:
             "admin": bool(user[3])
         }
     
-    def get_users(self, skip: int, limit: int, db: NeonDB) -> List[Dict[str, Any]]:
-        """Lista usuários com paginação"""
-        users = db.fetchall(
-            "SELECT id, email, recebe_boletim, admin FROM usuario ORDER BY id OFFSET %s LIMIT %s",
-            [skip, limit]
-        )
-               
-        return [
-            {
-                "id": user[0],
-                "email": user[1], 
-                "username": user[1].split('@')[0],
-                "recebe_boletim": user[2],
-                "admin": bool(user[3])
-            }
-            for user in users
-        ]
-    
     def alterar_status_boletim(self, user_id: int, recebe_boletim: bool, admin_user_id: int, db: NeonDB) -> Dict[str, Any]:
         """
         Altera o status de recebimento de boletim de um usuário.
@@ -0,0 +1,247 @@
+"""Validação colunar de lotes de ingestão, equivalente aos modelos Pydantic.
+
+Tipos e regras vêm do descritor da tabela (services/esquemas_ingestao.py). Os
+conversores e as regras de cada coluna são compilados uma vez por esquema
+(`compilar`) e o `ValidadorLote` resolve as posições no cabeçalho uma vez por
+arquivo; depois cada lote só aplica as funções já escolhidas.
+
+Cada coluna é convertida de uma vez com pandas/NumPy e as regras viram máscaras;
+só os valores fora do formato comum (data que não é AAAA-MM-DD, número que o
+NumPy recusa, campo ausente) passam pela mesma conversão Python do caminho linha
+a linha, então as linhas aceitas e recusadas são as mesmas.
+
+`ValidadorLote.validar_arrow` faz o mesmo para lotes Arrow (uploads Parquet/Arrow):
+colunas já tipadas são convertidas pelo pyarrow sem passar por texto; as de texto,
+ou com valores que não cabem no tipo, usam o conversor da coluna como no CSV.
+"""
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import zip_longest
+from typing import Any, Callable, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from services.esquemas_ingestao import Coluna, EsquemaIngestao
+
+_RE_DATA_ISO = r"[0-9]{4}-[0-9]{2}-[0-9]{2}"
+
+# (valores brutos) -> (valores convertidos como objeto NumPy, {posição: erro})
+Conversor = Callable[[tuple], tuple[np.ndarray, dict[int, str]]]
+
+# conversão de um valor isolado, idêntica à dos campos antes do modelo Pydantic
+# (paridade conferida em tests/test_validacao_csv.py)
+_ANALISADORES: dict[type, Callable[[Any], Any]] = {
+    date: lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+    int: int,
+    float: float,
+    str: lambda v: v.strip(),
+}
+
+
+def _ausentes(brutos: tuple) -> np.ndarray:
+    if None in brutos:
+        return np.fromiter((v is None for v in brutos), dtype=bool, count=len(brutos))
+    return np.zeros(len(brutos), dtype=bool)
+
+
+def _revisar(analisar: Callable, brutos: tuple, valores: np.ndarray, posicoes: np.ndarray) -> dict[int, str]:
+    """Converte valor a valor as posições que a conversão em lote não resolveu"""
+    erros: dict[int, str] = {}
+    for i in posicoes:
+        try:
+            valores[i] = analisar(brutos[i])
+        except Exception as e:
+            valores[i] = None
+            erros[int(i)] = str(e)
+    return erros
+
+
+def _converter_datas(brutos: tuple) -> tuple[np.ndarray, dict[int, str]]:
+    serie = pd.Series(brutos, dtype=object)
+    iso = serie.str.fullmatch(_RE_DATA_ISO).fillna(False).to_numpy(dtype=bool)
+    datas = pd.to_datetime(serie.where(iso), format="%Y-%m-%d", errors="coerce")
+    # cópia: com copy-on-write o pandas devolve arrays somente leitura
+    valores = np.array(datas.dt.date, dtype=object)
+    return valores, _revisar(_ANALISADORES[date], brutos, valores, np.flatnonzero(datas.isna().to_numpy()))
+
+
+def _conversor_numerico(tipo: type) -> Conversor:
+    dtype = np.int64 if tipo is int else np.float64
+    analisar = _ANALISADORES[tipo]
+
+    def converter(brutos: tuple) -> tuple[np.ndarray, dict[int, str]]:
+        ausentes = _ausentes(brutos)
+        valores = np.empty(len(brutos), dtype=object)
+        try:
+            # astype de objeto usa int()/float() do Python; o ausente é tratado à parte
+            valores[~ausentes] = np.array(brutos, dtype=object)[~ausentes].astype(dtype).tolist()
+            revisar = np.flatnonzero(ausentes)
+        except (ValueError, TypeError, OverflowError):
+            revisar = np.arange(len(brutos))
+        return valores, _revisar(analisar, brutos, valores, revisar)
+
+    return converter
+
+
+def _converter_textos(brutos: tuple) -> tuple[np.ndarray, dict[int, str]]:
+    ausentes = _ausentes(brutos)
+    valores = np.empty(len(brutos), dtype=object)
+    # str.strip direto é bem mais rápido que serie.str.strip() em colunas de objeto
+    if ausentes.any():
+        valores[:] = [v if v is None else v.strip() for v in brutos]
+    else:
+        valores[:] = list(map(str.strip, brutos))
+    return valores, _revisar(_ANALISADORES[str], brutos, valores, np.flatnonzero(ausentes))
+
+
+CONVERSORES_PADRAO: dict[type, Conversor] = {
+    date: _converter_datas,
+    int: _conversor_numerico(int),
+    float: _conversor_numerico(float),
+    str: _converter_textos,
+}
+
+
+def _falha_nao_negativo(valores: np.ndarray) -> np.ndarray:
+    return valores.astype(np.float64) < 0
+
+
+def _falha_uf(valores: np.ndarray) -> np.ndarray:
+    return pd.Series(valores, dtype=object).str.len().to_numpy() != 2
+
+
+def _maiusculas(valores: np.ndarray) -> np.ndarray:
+    return pd.Series(valores, dtype=object).str.upper().to_numpy(dtype=object)
+
+
+# tipo da RegraCampo -> (falha nos valores válidos, transformação dos que passaram)
+_REGRAS = {
+    "nao_negativo": (_falha_nao_negativo, None),
+    "uf": (_falha_uf, _maiusculas),
+}
+
+
+class _ColunaCompilada(NamedTuple):
+    coluna: Coluna
+    converter: Conversor
+    falha: Optional[Callable[[np.ndarray], np.ndarray]]
+    transformar: Optional[Callable[[np.ndarray], np.ndarray]]
+
+
+@lru_cache(maxsize=None)
+def compilar(esquema: EsquemaIngestao) -> tuple[_ColunaCompilada, ...]:
+    """Escolhe uma vez o conversor e as funções de regra de cada coluna do esquema"""
+    compiladas = []
+    for coluna in esquema.colunas:
+        falha = transformar = None
+        if coluna.regra is not None:
+            if coluna.regra.tipo not in _REGRAS:
+                raise ValueError(f"Regra desconhecida: {coluna.regra.tipo}")
+            falha, transformar = _REGRAS[coluna.regra.tipo]
+        conversor = coluna.conversor or CONVERSORES_PADRAO[coluna.tipo]
+        compiladas.append(_ColunaCompilada(coluna, conversor, falha, transformar))
+    return tuple(compiladas)
+
+
+def _converter_arrow(compilada: _ColunaCompilada, coluna) -> tuple[np.ndarray, dict[int, str]]:
+    """Converte uma coluna Arrow para o tipo do campo; devolve os valores (objeto NumPy) e os erros por posição"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    tipo = compilada.coluna.tipo
+    if pa.types.is_dictionary(coluna.type):
+        coluna = coluna.dictionary_decode()
+    nulos = coluna.is_null().to_numpy(zero_copy_only=False)
+    destino = {date: pa.date32(), int: pa.int64(), float: pa.float64(), str: pa.string()}[tipo]
+    texto = pa.types.is_string(coluna.type) or pa.types.is_large_string(coluna.type)
+    try:
+        if texto and (tipo is not str or compilada.coluna.conversor):
+            raise pa.ArrowInvalid("coluna de texto")
+        convertida = pc.cast(coluna, destino)
+        if tipo is date and pa.types.is_timestamp(coluna.type):
+            # o cast trunca o horário; data com horário é recusada, como no CSV
+            if pc.all(pc.equal(pc.cast(convertida, coluna.type), coluna)).as_py() is False:
+                raise pa.ArrowInvalid("data com horário")
+        valores = np.array(convertida.to_pylist(), dtype=object)
+        if tipo is str:
+            valores[~nulos] = [v.strip() for v in valores[~nulos]]
+        erros = {}
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # texto ou valor fora do tipo (ex.: 2.5 numa coluna inteira): o conversor da coluna aponta as linhas
+        brutos = coluna if texto else pc.cast(coluna, pa.string())
+        valores, erros = compilada.converter(tuple(brutos.to_pylist()))
+    for i in np.flatnonzero(nulos):
+        valores[i] = None
+        erros[int(i)] = "valor ausente"
+    return valores, erros
+
+
+class ValidadorLote:
+    """Validação de um arquivo: colunas compiladas do esquema e posição de cada uma no cabeçalho.
+
+    Retorno de `validar`/`validar_arrow`: ([(número, valores na ordem do esquema)], [(número, erro)]).
+    """
+
+    def __init__(self, esquema: EsquemaIngestao, cabecalho: Sequence[str], ignorar_caixa: bool = False):
+        self.esquema = esquema
+        self.colunas = compilar(esquema)
+        # como no DictReader: se o nome se repete no cabeçalho, vale a última ocorrência
+        posicoes = {nome: i for i, nome in enumerate(cabecalho)}
+        minusculas = {nome.lower(): i for i, nome in enumerate(cabecalho)} if ignorar_caixa else {}
+        self.posicoes = [posicoes.get(c.coluna.nome, minusculas.get(c.coluna.nome.lower())) for c in self.colunas]
+
+    def validar(self, linhas: list[list[str]], numeros: Sequence[int]) -> tuple[list[tuple[int, tuple]], list[tuple[int, str]]]:
+        """Valida as linhas cruas do csv.reader; `numeros` é o número de cada linha no arquivo"""
+        total = len(linhas)
+        # transpõe de uma vez; linhas curtas ficam com None nas colunas que faltam
+        colunas_brutas = list(zip_longest(*linhas, fillvalue=None))
+
+        def brutos(pos: int) -> tuple:
+            return colunas_brutas[pos] if pos < len(colunas_brutas) else (None,) * total
+
+        return self._validar(total, numeros, lambda compilada, pos: compilada.converter(brutos(pos)))
+
+    def validar_arrow(self, lote, numeros: Sequence[int]) -> tuple[list[tuple[int, tuple]], list[tuple[int, str]]]:
+        """Valida um pyarrow.RecordBatch com o mesmo esquema de colunas do cabeçalho"""
+        return self._validar(lote.num_rows, numeros, lambda compilada, pos: _converter_arrow(compilada, lote.column(pos)))
+
+    def _validar(self, total: int, numeros: Sequence[int], converter: Callable) -> tuple[list[tuple[int, tuple]], list[tuple[int, str]]]:
+        convertidos: list[np.ndarray] = []
+        primeiro_erro: dict[int, str] = {}
+        for compilada, pos in zip(self.colunas, self.posicoes):
+            if pos is None:
+                # coluna ausente no cabeçalho: o caminho linha a linha dá KeyError em todas
+                for i in range(total):
+                    primeiro_erro.setdefault(i, repr(compilada.coluna.nome))
+                convertidos.append(np.full(total, None, dtype=object))
+                continue
+            valores, erros = converter(compilada, pos)
+            convertidos.append(valores)
+            for i, mensagem in erros.items():
+                primeiro_erro.setdefault(i, mensagem)
+
+        invalidos = np.zeros(total, dtype=bool)
+        if primeiro_erro:
+            invalidos[list(primeiro_erro)] = True
+
+        # regras na ordem das colunas (mesma ordem dos validadores do Pydantic)
+        for compilada, valores in zip(self.colunas, convertidos):
+            if compilada.falha is None:
+                continue
+            validos = ~invalidos
+            falhou = np.zeros(total, dtype=bool)
+            falhou[validos] = compilada.falha(valores[validos])
+            mensagem = f"{compilada.coluna.nome}: {compilada.coluna.regra.mensagem}"
+            for i in np.flatnonzero(falhou):
+                primeiro_erro.setdefault(int(i), mensagem)
+            invalidos |= falhou
+            if compilada.transformar is not None:
+                validos = ~invalidos
+                valores[validos] = compilada.transformar(valores[validos])
+
+        validos = ~invalidos
+        numeros_validos = np.asarray(numeros)[validos].tolist()
+        aceitas = list(zip(numeros_validos, zip(*(valores[validos].tolist() for valores in convertidos))))
+        recusadas = [(numeros[i], primeiro_erro[i]) for i in sorted(primeiro_erro)]
+        return aceitas, recusadas
@@ -0,0 +1,91 @@
+"""Boletim a partir dos rollups x a partir das linhas das tabelas fato.
+
+Para várias janelas (datas de referência em dias da semana diferentes, para
+cair no meio de uma semana/mês, e períodos curtos de faturamento), monta o
+AcumuladorBoletim pelos dois caminhos de services/dados_boletim.py, confere que
+os indicadores são os mesmos e mede o tempo e as linhas lidas de cada um.
+Precisa da migração 5 (python -m db.migrations).
+
+    DB_BACKEND=local python benchmarks/bench_boletim_rollup.py
+    python benchmarks/bench_boletim_rollup.py --janelas 3 --repeticoes 5
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/boletim_rollup.jsonl.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+# importar o bench de ingestão já coloca app/ no sys.path
+from bench_csv_ingestao import RAIZ
+from db.backend import DB_BACKEND
+from db.neon_db import NeonDB
+from models.dados_boletim_model import AcumuladorBoletim
+from services.dados_boletim import acumular_linhas, acumular_rollups, tem_rollups
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "boletim_rollup.jsonl"
+
+
+def _janelas(quantidade: int) -> list[tuple[datetime, datetime, datetime]]:
+    """(referência, início, fim): 52 semanas terminando em dias seguidos e períodos curtos no meio do mês"""
+    agora = datetime.now()
+    janelas = []
+    for i in range(quantidade):
+        referencia = agora - timedelta(days=i, hours=5 * i)
+        janelas.append((referencia, referencia - timedelta(weeks=52), referencia))
+        inicio = referencia - timedelta(days=40 + 9 * i)
+        janelas.append((referencia, inicio, inicio + timedelta(days=7 + 11 * i)))
+    return janelas
+
+
+def _medir(db: NeonDB, acumular, referencia: datetime, inicio: datetime, fim: datetime, repeticoes: int):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        acumulador = AcumuladorBoletim(referencia)
+        t0 = time.perf_counter()
+        lidas = acumular(db, acumulador, inicio, fim)
+        modelo = acumulador.gerar_modelo()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor, sum(lidas), vars(modelo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Boletim pelos rollups x pelas linhas das tabelas fato")
+    parser.add_argument("--janelas", type=int, default=7, help="datas de referência (dias seguidos)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--rotulo", default="atual")
+    args = parser.parse_args()
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "backend": DB_BACKEND, "janelas": []}
+    divergencias = 0
+    with NeonDB() as db:
+        if not tem_rollups(db):
+            raise SystemExit("Rollups não encontrados: rode python -m db.migrations")
+        for referencia, inicio, fim in _janelas(args.janelas):
+            t_linhas, n_linhas, modelo_linhas = _medir(db, acumular_linhas, referencia, inicio, fim, args.repeticoes)
+            t_rollup, n_rollup, modelo_rollup = _medir(db, acumular_rollups, referencia, inicio, fim, args.repeticoes)
+            igual = modelo_linhas == modelo_rollup
+            divergencias += not igual
+            print(f"{'✅' if igual else '❌'} {inicio:%Y-%m-%d %H:%M} a {fim:%Y-%m-%d %H:%M}: "
+                  f"linhas {t_linhas * 1000:8.1f}ms ({n_linhas} lidas)  "
+                  f"rollups {t_rollup * 1000:7.1f}ms ({n_rollup} lidas)  {t_linhas / t_rollup:5.1f}x")
+            if not igual:
+                for campo in modelo_linhas:
+                    if modelo_linhas[campo] != modelo_rollup[campo]:
+                        print(f"   {campo}: {modelo_linhas[campo]!r} x {modelo_rollup[campo]!r}")
+            resultado["janelas"].append({
+                "inicio": inicio.isoformat(timespec="minutes"), "fim": fim.isoformat(timespec="minutes"),
+                "linhas_ms": round(t_linhas * 1000, 1), "linhas_lidas": n_linhas,
+                "rollups_ms": round(t_rollup * 1000, 1), "rollups_lidas": n_rollup, "iguais": igual,
+            })
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    if divergencias:
+        raise SystemExit(f"{divergencias} janelas com indicadores diferentes")
+
+
+if __name__ == "__main__":
+    main()
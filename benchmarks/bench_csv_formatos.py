@@ -0,0 +1,125 @@
+"""Formatos de upload: CSV puro x .csv.gz x .csv.zst x Parquet x Arrow IPC.
+
+Tamanho de cada formato e tempo de ler + validar o arquivo inteiro como o
+CsvService faz (descompactação em streaming ou lotes de colunas), conferindo que
+todos aceitam o mesmo número de linhas; sem banco. A paridade linha a linha com
+o CSV está em tests/test_validacao_csv.py.
+
+    python benchmarks/bench_csv_formatos.py --linhas 200000
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/csv_formatos.jsonl.
+"""
+import argparse
+import gzip
+import io
+import json
+import time
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import zstandard
+
+# importar o bench de ingestão já coloca app/ no sys.path
+from bench_csv_ingestao import RAIZ, gerar_csv
+from services.csv_service import ler_lotes
+from services.esquemas_ingestao import ESQUEMAS
+from services.formatos_upload import abrir_csv, ler_lotes_arrow
+from services.validacao_csv import ValidadorLote
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "csv_formatos.jsonl"
+_TIPOS_ARROW = {date: pa.date32(), int: pa.int64(), float: pa.float64(), str: pa.string()}
+
+
+def _tabela_tipada(csv_content: str, tabela: str) -> pa.Table:
+    """CSV lido pelo pyarrow com os tipos do esquema (como um export Parquet do ERP)"""
+    tipos = {c.nome: _TIPOS_ARROW[c.tipo] for c in ESQUEMAS[tabela].colunas}
+    return pa_csv.read_csv(
+        io.BytesIO(csv_content.encode("utf-8")),
+        parse_options=pa_csv.ParseOptions(delimiter="|"),
+        convert_options=pa_csv.ConvertOptions(column_types=tipos, strings_can_be_null=False),
+    )
+
+
+def _serializar(tabela_arrow: pa.Table, formato: str) -> bytes:
+    buffer = io.BytesIO()
+    if formato == "parquet":
+        pq.write_table(tabela_arrow, buffer, row_group_size=50000)
+    else:
+        with pa.ipc.new_file(buffer, tabela_arrow.schema) as escritor:
+            escritor.write_table(tabela_arrow, max_chunksize=50000)
+    return buffer.getvalue()
+
+
+def _validadores_arrow(tabela: str):
+    """Como o CsvService: o validador é montado com as colunas do primeiro lote e reaproveitado"""
+    validador = None
+
+    def validar(lote_arrow, numeros):
+        nonlocal validador
+        if validador is None:
+            validador = ValidadorLote(ESQUEMAS[tabela], lote_arrow.schema.names, ignorar_caixa=True)
+        return validador.validar_arrow(lote_arrow, numeros)
+
+    return validar
+
+
+def _ler_e_validar(conteudo: bytes, formato: str, tabela: str, lote: int) -> int:
+    aceitas = 0
+    if formato in ("parquet", "arrow"):
+        validar = _validadores_arrow(tabela)
+        for lote_arrow in ler_lotes_arrow(io.BytesIO(conteudo), formato, lote):
+            aceitas += len(validar(lote_arrow, range(lote_arrow.num_rows))[0])
+        return aceitas
+    texto = io.TextIOWrapper(abrir_csv(io.BytesIO(conteudo), formato), encoding="utf-8", newline="")
+    cabecalho, lotes = ler_lotes(texto, lote)
+    validador = ValidadorLote(ESQUEMAS[tabela], cabecalho)
+    for linhas, numeros in lotes:
+        aceitas += len(validador.validar(linhas, numeros)[0])
+    return aceitas
+
+
+def medir(tabela: str, linhas: int, lote: int, semente: int) -> dict:
+    csv_content = gerar_csv(tabela, linhas, 0.0, semente)
+    bruto = csv_content.encode("utf-8")
+    tipada = _tabela_tipada(csv_content, tabela)
+    arquivos = {
+        "csv": bruto,
+        "csv.gz": gzip.compress(bruto, compresslevel=6),
+        "csv.zst": zstandard.ZstdCompressor(level=3).compress(bruto),
+        "parquet": _serializar(tipada, "parquet"),
+        "arrow": _serializar(tipada, "arrow"),
+    }
+    medicoes, referencia = {}, None
+    for formato, conteudo in arquivos.items():
+        inicio = time.perf_counter()
+        aceitas = _ler_e_validar(conteudo, formato, tabela, lote)
+        duracao = time.perf_counter() - inicio
+        referencia = aceitas if referencia is None else referencia
+        if aceitas != referencia:
+            raise SystemExit(f"[{tabela} {formato}] {aceitas} linhas aceitas; no CSV foram {referencia}")
+        medicoes[formato] = {"mb": round(len(conteudo) / 2**20, 2), "segundos": round(duracao, 3)}
+        print(f"[{tabela}] {formato:<8} {len(conteudo) / 2**20:7.2f} MB  {duracao:6.2f}s  ({linhas / duracao:.0f} linhas/s)")
+    return medicoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamanho e tempo de leitura dos formatos de upload")
+    parser.add_argument("--linhas", type=int, default=200000, help="linhas da medição de desempenho")
+    parser.add_argument("--lote", type=int, default=10000, help="linhas por lote (CSV_COPY_BATCH_SIZE)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--rotulo", default="atual")
+    args = parser.parse_args()
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo}
+    for tabela in ESQUEMAS:
+        resultado[tabela] = medir(tabela, args.linhas, args.lote, args.semente)
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Benchmark da ingestão de CSV: INSERT por linha (método antigo) x COPY em lotes.
+
+Gera um CSV sintético (mesmo gerador do `db.seed`), com uma fração de linhas
+inválidas, e grava pelos dois caminhos, conferindo que o relatório de erros é o
+mesmo. As linhas inseridas são apagadas ao final. Rode contra o banco local:
+
+    DB_BACKEND=local python benchmarks/bench_csv_ingestao.py --linhas 200000
+    python benchmarks/bench_csv_ingestao.py --comparar
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/csv_ingestao.jsonl.
+"""
+import argparse
+import csv
+import io
+import json
+import pathlib
+import random
+import sys
+import time
+from datetime import date, datetime
+
+RAIZ = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ / "app"))
+
+from db.backend import DB_BACKEND  # noqa: E402
+from db.neon_db import NeonDB  # noqa: E402
+from db.seed import _COLUNAS, gerar_linhas  # noqa: E402
+from services.csv_service import _COPY_LOTE, CsvService, ler_lotes  # noqa: E402
+from services.esquemas_ingestao import ESQUEMAS  # noqa: E402
+from services.validacao_csv import ValidadorLote  # noqa: E402
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "csv_ingestao.jsonl"
+
+# conversão de cada campo no CsvService antigo, antes do modelo Pydantic
+_CONVERSOES = {
+    date: lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+    int: int,
+    float: float,
+    str: lambda v: v.strip(),
+}
+
+
+def validar_linha(esquema, linha: dict) -> tuple:
+    """Validação do método antigo: converte os campos da linha do DictReader e monta o modelo Pydantic"""
+    registro = esquema.modelo(**{c.nome: _CONVERSOES[c.tipo](linha[c.nome]) for c in esquema.colunas})
+    return tuple(getattr(registro, c.nome) for c in esquema.colunas)
+
+
+def gerar_csv(tabela: str, linhas: int, invalidas: float, semente: int) -> str:
+    """CSV no formato do upload (separador |, cabeçalho com SKU) com `invalidas` de linhas ruins"""
+    rng = random.Random(semente)
+    cabecalho = ["SKU" if c == "sku" else c for c in _COLUNAS[tabela]]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter="|", lineterminator="\n")
+    writer.writerow(cabecalho)
+    for valores in gerar_linhas(tabela, linhas, 365, rng):
+        valores = list(valores)
+        if rng.random() < invalidas:
+            valores[1] = "cliente?"  # cod_cliente não numérico
+        writer.writerow(valores)
+    return buffer.getvalue()
+
+
+def inserir_linha_a_linha(csv_content: str, tabela: str) -> dict:
+    """Caminho antigo do CsvService: valida com o modelo Pydantic e faz um INSERT por linha"""
+    esquema = ESQUEMAS[tabela]
+    colunas = esquema.destinos
+    query = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(colunas))})"
+    processados, com_erro = 0, 0
+    with NeonDB() as db:
+        for linha in csv.DictReader(io.StringIO(csv_content), delimiter="|"):
+            try:
+                db.execute(query, list(validar_linha(esquema, linha)))
+                processados += 1
+            except Exception:
+                com_erro += 1
+        db.commit()
+    return {"registros_processados": processados, "registros_com_erro": com_erro}
+
+
+def _max_id(tabela: str) -> int:
+    with NeonDB() as db:
+        return db.fetchone(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}")[0]
+
+
+def _limpar(tabela: str, id_inicial: int) -> None:
+    with NeonDB() as db:
+        db.execute(f"DELETE FROM {tabela} WHERE id > %s", [id_inicial])
+        db.commit()
+
+
+def _medir(nome: str, funcao, csv_content: str, tabela: str, linhas: int) -> dict:
+    id_inicial = _max_id(tabela)
+    inicio = time.perf_counter()
+    detalhes = funcao(csv_content, tabela)
+    duracao = time.perf_counter() - inicio
+    _limpar(tabela, id_inicial)
+    resultado = {
+        "metodo": nome,
+        "linhas": linhas,
+        "segundos": round(duracao, 3),
+        "linhas_por_s": round(linhas / duracao, 1),
+        "registros_processados": detalhes["registros_processados"],
+        "registros_com_erro": detalhes["registros_com_erro"],
+    }
+    print(f"  {nome:<15} {resultado['segundos']:>8.2f}s  {resultado['linhas_por_s']:>10.0f} linhas/s  "
+          f"ok={resultado['registros_processados']} erro={resultado['registros_com_erro']}")
+    return resultado
+
+
+def _medir_validacao(csv_content: str, tabela: str, linhas: int) -> tuple[float, float]:
+    """Tempo só de ler e validar o CSV em cada método (Pydantic por linha x colunar), sem banco"""
+    esquema = ESQUEMAS[tabela]
+    inicio = time.perf_counter()
+    for linha in csv.DictReader(io.StringIO(csv_content), delimiter="|"):
+        try:
+            validar_linha(esquema, linha)
+        except Exception:
+            pass
+    por_linha = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cabecalho, lotes = ler_lotes(io.StringIO(csv_content), _COPY_LOTE)
+    validador = ValidadorLote(esquema, cabecalho)
+    for lote, numeros in lotes:
+        validador.validar(lote, numeros)
+    colunar = time.perf_counter() - inicio
+    print(f"  {'validacao':<15} {por_linha:>8.2f}s por linha, {colunar:.2f}s colunar ({linhas} linhas, sem banco)")
+    return por_linha, colunar
+
+
+def _via_copy(csv_content: str, tabela: str) -> dict:
+    resposta = CsvService().processar_csv(ESQUEMAS[tabela], csv_content)
+    if not resposta["success"]:
+        raise RuntimeError(resposta["message"])
+    return resposta["detalhes"]
+
+
+def rodar(args) -> dict:
+    print(f"Gerando CSV de {args.tabela} com {args.linhas} linhas...")
+    csv_completo = gerar_csv(args.tabela, args.linhas, args.invalidas, args.semente)
+    # o método antigo é lento demais para o arquivo inteiro: mede numa amostra
+    amostra = min(args.amostra_antigo, args.linhas)
+    csv_amostra = "".join(csv_completo.splitlines(keepends=True)[: amostra + 1])
+
+    print(f"Backend: {DB_BACKEND}")
+    antigo = _medir("linha_a_linha", inserir_linha_a_linha, csv_amostra, args.tabela, amostra)
+    copy_amostra = _medir("copy (amostra)", _via_copy, csv_amostra, args.tabela, amostra)
+    copy_total = _medir("copy", _via_copy, csv_completo, args.tabela, args.linhas)
+
+    # mesmo relatório de erros nos dois caminhos
+    for campo in ("registros_processados", "registros_com_erro"):
+        if antigo[campo] != copy_amostra[campo]:
+            raise SystemExit(f"Divergência em {campo}: {antigo[campo]} x {copy_amostra[campo]}")
+
+    ganho = copy_total["linhas_por_s"] / antigo["linhas_por_s"]
+    # descontando a validação de cada método: o ganho só na gravação
+    validacao, validacao_colunar = _medir_validacao(csv_amostra, args.tabela, amostra)
+    ganho_banco = (antigo["segundos"] - validacao) / max(copy_amostra["segundos"] - validacao_colunar, 1e-9)
+    print(f"Ganho do COPY: {ganho:.1f}x no total, {ganho_banco:.1f}x só na gravação")
+    return {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "rotulo": args.rotulo,
+        "backend": DB_BACKEND,
+        "tabela": args.tabela,
+        "resultados": [antigo, copy_amostra, copy_total],
+        "validacao_s": round(validacao, 3),
+        "validacao_colunar_s": round(validacao_colunar, 3),
+        "ganho": round(ganho, 1),
+        "ganho_gravacao": round(ganho_banco, 1),
+    }
+
+
+def comparar() -> None:
+    if not RESULTADOS.exists():
+        print("Nenhum resultado gravado ainda")
+        return
+    for linha in RESULTADOS.read_text(encoding="utf-8").splitlines():
+        r = json.loads(linha)
+        taxas = "  ".join(f"{m['metodo']}={m['linhas_por_s']:.0f}/s" for m in r["resultados"])
+        print(f"{r['quando']}  {r['rotulo']:<12} {r['backend']:<6} {r['tabela']:<12} {taxas}  ganho={r['ganho']}x gravação={r.get('ganho_gravacao')}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ingestão de CSV (INSERT por linha x COPY)")
+    parser.add_argument("--tabela", choices=list(ESQUEMAS), default="faturamento")
+    parser.add_argument("--linhas", type=int, default=200000)
+    parser.add_argument("--amostra-antigo", type=int, default=20000, help="linhas medidas no método antigo")
+    parser.add_argument("--invalidas", type=float, default=0.001, help="fração de linhas inválidas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--comparar", action="store_true", help="mostra os resultados gravados")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="permite rodar contra DATABASE_URL (grava e apaga linhas na tabela)")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar()
+        return
+    if DB_BACKEND != "local" and not args.permitir_remoto:
+        parser.error("DB_BACKEND não é 'local'; use --permitir-remoto para medir contra DATABASE_URL")
+
+    resultado = rodar(args)
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Pico de memória do upload de CSV: arquivo inteiro em memória x leitura em streaming.
+
+Para cada tamanho gera um CSV sintético em disco e mede com tracemalloc o pico
+de memória Python de processar o arquivo como a rota fazia antes (read + decode
++ StringIO) e como faz agora (CsvService.processar_arquivo, lendo aos poucos).
+As linhas inseridas são apagadas ao final. Rode contra o banco local:
+
+    DB_BACKEND=local python benchmarks/bench_csv_memoria.py --linhas 50000 200000 500000
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/csv_memoria.jsonl.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# importar o bench de ingestão já coloca app/ no sys.path
+from bench_csv_ingestao import RAIZ, _limpar, _max_id, gerar_csv
+from db.backend import DB_BACKEND
+from services.csv_service import CsvService
+from services.esquemas_ingestao import ESQUEMAS
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "csv_memoria.jsonl"
+
+
+def _arquivo_inteiro(servico: CsvService, caminho: str, tabela: str) -> dict:
+    """Como a rota fazia antes: bytes + str do arquivo inteiro em memória"""
+    with open(caminho, "rb") as f:
+        conteudo = f.read().decode("utf-8")
+    return servico.processar_csv(ESQUEMAS[tabela], conteudo)
+
+
+def _streaming(servico: CsvService, caminho: str, tabela: str) -> dict:
+    with open(caminho, "rb") as f:
+        return servico.processar_arquivo(ESQUEMAS[tabela], f)
+
+
+def _medir(funcao, caminho: str, tabela: str) -> dict:
+    servico = CsvService()
+    id_inicial = _max_id(tabela)
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resposta = funcao(servico, caminho, tabela)
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _limpar(tabela, id_inicial)
+    if not resposta["success"]:
+        raise RuntimeError(resposta["message"])
+    return {
+        "pico_mb": round(pico / 2**20, 1),
+        "segundos": round(duracao, 2),
+        "registros_processados": resposta["detalhes"]["registros_processados"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pico de memória do processamento de upload de CSV")
+    parser.add_argument("--tabela", choices=["faturamento", "estoque"], default="faturamento")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="permite rodar contra DATABASE_URL (grava e apaga linhas na tabela)")
+    args = parser.parse_args()
+    if DB_BACKEND != "local" and not args.permitir_remoto:
+        parser.error("DB_BACKEND não é 'local'; use --permitir-remoto para medir contra DATABASE_URL")
+
+    medicoes = []
+    for linhas in args.linhas:
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", delete=False) as f:
+            f.write(gerar_csv(args.tabela, linhas, 0.0, 42))
+            caminho = f.name
+        try:
+            tamanho_mb = os.path.getsize(caminho) / 2**20
+            antes = _medir(_arquivo_inteiro, caminho, args.tabela)
+            depois = _medir(_streaming, caminho, args.tabela)
+        finally:
+            os.remove(caminho)
+        if antes["registros_processados"] != depois["registros_processados"]:
+            raise SystemExit(f"Divergência em {linhas} linhas: {antes} x {depois}")
+        print(f"{linhas:>8} linhas ({tamanho_mb:6.1f} MB)  inteiro: pico {antes['pico_mb']:7.1f} MB  "
+              f"streaming: pico {depois['pico_mb']:7.1f} MB")
+        medicoes.append({"linhas": linhas, "arquivo_mb": round(tamanho_mb, 1), "inteiro": antes, "streaming": depois})
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "quando": datetime.now().isoformat(timespec="seconds"),
+            "rotulo": args.rotulo,
+            "backend": DB_BACKEND,
+            "tabela": args.tabela,
+            "medicoes": medicoes,
+        }, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Validação de CSV: modelos Pydantic linha a linha x validação colunar (ValidadorLote).
+
+Mede o tempo dos dois caminhos num CSV sintético limpo. A paridade (mesmas
+linhas aceitas e recusadas, com os mesmos valores) é conferida em
+tests/test_validacao_csv.py. Não usa o banco:
+
+    python benchmarks/bench_csv_validacao.py --linhas 200000
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/csv_validacao.jsonl.
+"""
+import argparse
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+# importar o bench de ingestão já coloca app/ no sys.path
+from bench_csv_ingestao import RAIZ, gerar_csv, validar_linha
+from services.csv_service import ler_lotes
+from services.esquemas_ingestao import ESQUEMAS
+from services.validacao_csv import ValidadorLote
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "csv_validacao.jsonl"
+
+
+def por_linha(csv_content: str, tabela: str) -> tuple[dict, set]:
+    """Caminho de referência: DictReader + modelo Pydantic por linha"""
+    esquema = ESQUEMAS[tabela]
+    aceitas, recusadas = {}, set()
+    for linha_num, linha in enumerate(csv.DictReader(io.StringIO(csv_content), delimiter="|"), start=2):
+        try:
+            aceitas[linha_num] = validar_linha(esquema, linha)
+        except Exception:
+            recusadas.add(linha_num)
+    return aceitas, recusadas
+
+
+def colunar(csv_content: str, tabela: str, lote: int) -> tuple[dict, set]:
+    """Mesmo fatiamento do CsvService: ler_lotes + ValidadorLote"""
+    cabecalho, lotes = ler_lotes(io.StringIO(csv_content), lote)
+    validador = ValidadorLote(ESQUEMAS[tabela], cabecalho)
+    aceitas, recusadas = {}, set()
+    for linhas, numeros in lotes:
+        ok, erros = validador.validar(linhas, numeros)
+        aceitas.update(ok)
+        recusadas.update(n for n, _ in erros)
+    return aceitas, recusadas
+
+
+def medir(tabela: str, linhas: int, lote: int, semente: int) -> dict:
+    csv_content = gerar_csv(tabela, linhas, 0.001, semente)
+    inicio = time.perf_counter()
+    ref_ok, _ = por_linha(csv_content, tabela)
+    t_linha = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    col_ok, _ = colunar(csv_content, tabela, lote)
+    t_colunar = time.perf_counter() - inicio
+    if len(ref_ok) != len(col_ok):
+        raise SystemExit(f"[{tabela}] contagens diferentes: {len(ref_ok)} x {len(col_ok)}")
+    print(f"[{tabela}] {linhas} linhas  pydantic: {t_linha:.2f}s ({linhas / t_linha:.0f}/s)  "
+          f"colunar: {t_colunar:.2f}s ({linhas / t_colunar:.0f}/s)  ganho {t_linha / t_colunar:.1f}x")
+    return {"linhas": linhas, "pydantic_s": round(t_linha, 3), "colunar_s": round(t_colunar, 3),
+            "ganho": round(t_linha / t_colunar, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desempenho da validação colunar de CSV")
+    parser.add_argument("--linhas", type=int, default=200000, help="linhas da medição de desempenho")
+    parser.add_argument("--lote", type=int, default=10000, help="linhas por lote (CSV_COPY_BATCH_SIZE)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--rotulo", default="atual")
+    args = parser.parse_args()
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo}
+    for tabela in ESQUEMAS:
+        resultado[tabela] = {"desempenho": medir(tabela, args.linhas, args.lote, args.semente)}
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
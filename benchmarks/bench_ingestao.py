@@ -0,0 +1,159 @@
+"""Suíte de throughput da ingestão: CsvService com arquivos de 10 mil, 100 mil e 1 milhão de linhas.
+
+Para cada tabela e tamanho, gera o CSV em disco (benchmarks/gerador_csv.py, com
+uma fração de linhas inválidas) e roda CsvService.processar_arquivo num processo
+filho novo, que mede:
+
+- linhas por segundo (de todo o arquivo, válidas e inválidas);
+- pico de RSS do processo (ru_maxrss) e o RSS já depois dos imports, para
+  separar o custo da ingestão do custo de carregar pandas/pydantic;
+- idas ao banco: execuções registradas pelo NeonDB em db.query_stats (COPY,
+  INSERT ... ON CONFLICT, SAVEPOINTs, COMMIT...).
+
+As linhas inseridas são apagadas depois de cada medição. Rode contra o banco local:
+
+    DB_BACKEND=local python benchmarks/bench_ingestao.py
+    DB_BACKEND=local python benchmarks/bench_ingestao.py --tamanhos 10000 100000 --tabelas estoque --invalidas 0.05
+    python benchmarks/bench_ingestao.py --comparar     # histórico por tabela e tamanho
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/ingestao.jsonl.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# importar o bench de ingestão já coloca app/ no sys.path
+from bench_csv_ingestao import RAIZ, _limpar, _max_id
+from db.backend import DB_BACKEND
+from gerador_csv import gravar_csv
+from services.esquemas_ingestao import ESQUEMAS
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "ingestao.jsonl"
+
+
+def _rss_mb() -> float:
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_filho(tabela: str, caminho: str, saida: str) -> None:
+    """Roda no processo filho: uma ingestão e as medições, gravadas em JSON em `saida`"""
+    from db import query_stats
+    from db.pool import get_pool
+    from services.csv_service import CsvService
+
+    # pool aberto e módulos carregados antes de medir
+    get_pool()
+    servico = CsvService()
+    rss_base = _rss_mb()
+    idas_inicio = query_stats.total_execucoes()
+    inicio = time.perf_counter()
+    with open(caminho, "rb") as f:
+        resposta = servico.processar_arquivo(ESQUEMAS[tabela], f)
+    duracao = time.perf_counter() - inicio
+    detalhes = resposta["detalhes"]
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump({
+            "success": resposta["success"],
+            "message": resposta["message"],
+            "segundos": round(duracao, 3),
+            "registros_processados": detalhes["registros_processados"],
+            "registros_com_erro": detalhes["registros_com_erro"],
+            "registros_duplicados": detalhes["registros_duplicados"],
+            "idas_ao_banco": query_stats.total_execucoes() - idas_inicio,
+            "rss_base_mb": round(rss_base, 1),
+            "rss_pico_mb": round(_rss_mb(), 1),
+        }, f)
+
+
+def medir(tabela: str, caminho: str, linhas: int) -> dict:
+    id_inicial = _max_id(tabela)
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        saida = f.name
+    try:
+        # processo novo por medição: o pico de RSS de uma não contamina a outra
+        subprocess.run([sys.executable, __file__, "--filho", tabela, caminho, saida], check=True,
+                       stdout=subprocess.DEVNULL)
+        with open(saida, encoding="utf-8") as f:
+            medicao = json.load(f)
+    finally:
+        os.remove(saida)
+        _limpar(tabela, id_inicial)
+    if not medicao.pop("success"):
+        raise RuntimeError(medicao["message"])
+    medicao.pop("message")
+    medicao["linhas"] = linhas
+    medicao["linhas_por_s"] = round(linhas / medicao["segundos"], 1)
+    medicao["idas_por_mil_linhas"] = round(medicao["idas_ao_banco"] * 1000 / linhas, 2)
+    return medicao
+
+
+def comparar() -> None:
+    if not RESULTADOS.exists():
+        print("Nenhum resultado gravado ainda")
+        return
+    historico: dict[tuple[str, int], list[tuple[dict, dict]]] = {}
+    for linha in RESULTADOS.read_text(encoding="utf-8").splitlines():
+        execucao = json.loads(linha)
+        for m in execucao["medicoes"]:
+            historico.setdefault((m["tabela"], m["linhas"]), []).append((execucao, m))
+    for (tabela, linhas), medicoes in sorted(historico.items()):
+        print(f"{tabela} {linhas} linhas")
+        anterior = None
+        for execucao, m in medicoes:
+            variacao = f"{(m['linhas_por_s'] / anterior - 1) * 100:+6.1f}%" if anterior else "       "
+            print(f"  {execucao['quando']}  {execucao['rotulo']:<12} {m['linhas_por_s']:>10.0f} linhas/s {variacao}  "
+                  f"pico {m['rss_pico_mb']:>7.1f} MB  {m['idas_ao_banco']:>6} idas ao banco")
+            anterior = m["linhas_por_s"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, memória e idas ao banco da ingestão de CSV")
+    parser.add_argument("--tabelas", nargs="+", choices=list(ESQUEMAS), default=list(ESQUEMAS))
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--invalidas", type=float, default=0.01, help="fração de linhas inválidas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--comparar", action="store_true", help="mostra o histórico gravado")
+    parser.add_argument("--filho", nargs=3, metavar=("TABELA", "CSV", "SAIDA"), help=argparse.SUPPRESS)
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="permite rodar contra DATABASE_URL (grava e apaga linhas na tabela)")
+    args = parser.parse_args()
+
+    if args.filho:
+        medir_filho(*args.filho)
+        return
+    if args.comparar:
+        comparar()
+        return
+    if DB_BACKEND != "local" and not args.permitir_remoto:
+        parser.error("DB_BACKEND não é 'local'; use --permitir-remoto para medir contra DATABASE_URL")
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "backend": DB_BACKEND, "invalidas": args.invalidas, "medicoes": []}
+    with tempfile.TemporaryDirectory(prefix="bench_ingestao_") as pasta:
+        for tabela in args.tabelas:
+            for linhas in args.tamanhos:
+                caminho = gravar_csv(os.path.join(pasta, f"{tabela}_{linhas}.csv"), tabela, linhas,
+                                     args.invalidas, args.semente)
+                medicao = {"tabela": tabela, **medir(tabela, str(caminho), linhas)}
+                os.remove(caminho)
+                print(f"{tabela:<12} {linhas:>8} linhas: {medicao['segundos']:7.2f}s  "
+                      f"{medicao['linhas_por_s']:>9.0f} linhas/s  pico {medicao['rss_pico_mb']:6.1f} MB "
+                      f"(base {medicao['rss_base_mb']:.1f})  {medicao['idas_ao_banco']} idas ao banco  "
+                      f"ok={medicao['registros_processados']} erro={medicao['registros_com_erro']}")
+                resultado["medicoes"].append(medicao)
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
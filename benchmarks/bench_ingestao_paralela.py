@@ -0,0 +1,138 @@
+"""Ingestão paralela: escala com o número de processos (e de escritores).
+
+Gera alguns CSVs sintéticos em disco e, para cada número de processos, mede:
+- só a validação (as partes passando pelo pool, sem banco), que deve escalar
+  quase linearmente até o número de núcleos;
+- com --banco, a ingestão completa (IngestaoParalela.ingerir) contra o banco,
+  comparada ao CsvService arquivo a arquivo. As linhas inseridas são apagadas.
+
+    python benchmarks/bench_ingestao_paralela.py --arquivos 8 --linhas 100000 --processos 1 2 4 8
+    DB_BACKEND=local python benchmarks/bench_ingestao_paralela.py --banco --escritores 2
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/ingestao_paralela.jsonl.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# importar o bench de ingestão já coloca app/ no sys.path
+from bench_csv_ingestao import RAIZ, _limpar, _max_id, gerar_csv
+from db.backend import DB_BACKEND
+from services.csv_service import _COPY_LOTE, CsvService, _arquivos_ingeridos
+from services.esquemas_ingestao import ESQUEMAS
+from services.ingestao_paralela import IngestaoParalela, _dividir_csv, validar_parte
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "ingestao_paralela.jsonl"
+
+
+def so_validacao(caminhos: list[str], tabela: str, processos: int, tamanho_parte: int) -> tuple[float, int]:
+    """Tempo de validar todas as partes dos arquivos no pool; devolve (segundos, linhas aceitas)"""
+    esquema = ESQUEMAS[tabela]
+    partes = [p for i, c in enumerate(caminhos) for p in _dividir_csv(i, c, tamanho_parte)]
+    with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # sobe os processos (com spawn todos importam este módulo, e com ele pandas/pydantic) fora da medição
+        list(pool.map(abs, range(processos)))
+        inicio = time.perf_counter()
+        aceitas = sum(
+            len(grupo)
+            for validados, _ in pool.map(validar_parte, [esquema] * len(partes), partes,
+                                         [_COPY_LOTE] * len(partes), [1] * len(partes))
+            for por_escritor, _ in validados
+            for grupo in por_escritor
+        )
+    return time.perf_counter() - inicio, aceitas
+
+
+def com_banco(caminhos: list[str], tabela: str, processos: int, escritores: int, tamanho_parte: int) -> dict:
+    id_inicial = _max_id(tabela)
+    inicio = time.perf_counter()
+    ingestao = IngestaoParalela(processos, escritores, tamanho_parte)
+    resposta = ingestao.ingerir(ESQUEMAS[tabela], [(os.path.basename(c), c) for c in caminhos])
+    duracao = time.perf_counter() - inicio
+    _limpar(tabela, id_inicial)
+    _arquivos_ingeridos.clear()
+    if not resposta["success"]:
+        raise RuntimeError(resposta["message"])
+    return {"segundos": round(duracao, 2), "registros_processados": resposta["detalhes"]["registros_processados"]}
+
+
+def sequencial(caminhos: list[str], tabela: str) -> dict:
+    """Referência: CsvService, um arquivo depois do outro numa conexão"""
+    id_inicial = _max_id(tabela)
+    servico, processados = CsvService(), 0
+    inicio = time.perf_counter()
+    for caminho in caminhos:
+        with open(caminho, "rb") as f:
+            processados += servico.processar_arquivo(ESQUEMAS[tabela], f)["detalhes"]["registros_processados"]
+    duracao = time.perf_counter() - inicio
+    _limpar(tabela, id_inicial)
+    # as linhas foram apagadas: o próximo envio dos mesmos arquivos não pode ser pulado pelo sha256
+    _arquivos_ingeridos.clear()
+    return {"segundos": round(duracao, 2), "registros_processados": processados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escala da ingestão paralela com o número de processos")
+    parser.add_argument("--tabela", choices=list(ESQUEMAS), default="faturamento")
+    parser.add_argument("--arquivos", type=int, default=4)
+    parser.add_argument("--linhas", type=int, default=100000, help="linhas por arquivo")
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--escritores", type=int, default=2)
+    parser.add_argument("--parte-mb", type=float, default=16)
+    parser.add_argument("--banco", action="store_true", help="mede também a ingestão completa no banco")
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="permite rodar contra DATABASE_URL (grava e apaga linhas na tabela)")
+    args = parser.parse_args()
+    if args.banco and DB_BACKEND != "local" and not args.permitir_remoto:
+        parser.error("DB_BACKEND não é 'local'; use --permitir-remoto para medir contra DATABASE_URL")
+
+    tamanho_parte = int(args.parte_mb * 2**20)
+    caminhos = []
+    for n in range(args.arquivos):
+        # sementes diferentes: arquivos com conteúdo distinto, como meses diferentes
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", delete=False) as f:
+            f.write(gerar_csv(args.tabela, args.linhas, 0.001, 42 + n))
+            caminhos.append(f.name)
+    total = args.arquivos * args.linhas
+    print(f"{args.arquivos} arquivos x {args.linhas} linhas de {args.tabela} ({os.cpu_count()} núcleos)")
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "tabela": args.tabela, "linhas": total, "nucleos": os.cpu_count(), "validacao": {}}
+    try:
+        base = None
+        for processos in args.processos:
+            duracao, aceitas = so_validacao(caminhos, args.tabela, processos, tamanho_parte)
+            base = base or duracao
+            print(f"  validação  {processos:>3} processos: {duracao:6.2f}s  {total / duracao:>9.0f} linhas/s  "
+                  f"ganho {base / duracao:.1f}x  ({aceitas} aceitas)")
+            resultado["validacao"][processos] = {"segundos": round(duracao, 2), "ganho": round(base / duracao, 2)}
+
+        if args.banco:
+            resultado["backend"] = DB_BACKEND
+            resultado["sequencial"] = sequencial(caminhos, args.tabela)
+            print(f"  banco      sequencial:   {resultado['sequencial']['segundos']:6.2f}s")
+            resultado["paralelo"] = {}
+            for processos in args.processos:
+                medicao = com_banco(caminhos, args.tabela, processos, args.escritores, tamanho_parte)
+                if medicao["registros_processados"] != resultado["sequencial"]["registros_processados"]:
+                    raise SystemExit(f"Divergência: {medicao} x {resultado['sequencial']}")
+                print(f"  banco      {processos:>3} processos: {medicao['segundos']:6.2f}s  "
+                      f"({args.escritores} escritores)")
+                resultado["paralelo"][processos] = medicao
+    finally:
+        for caminho in caminhos:
+            os.remove(caminho)
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Modos de inferência do modelo local na CPU: float32 x int8 (quantização dinâmica) x bfloat16.
+
+Para cada modo (o mesmo valor de LLM_DTYPE), num processo novo, carrega o
+modelo pelo registro (services/modelos.py), roda o generate do boletim
+(BoletimService._gerar, 250 tokens) sobre o prompt do boletim com indicadores
+fixos e mede:
+
+- tokens gerados por segundo (mediana de --repeticoes, depois de uma rodada de aquecimento);
+- tempo de carga, RSS logo depois da carga e pico de RSS (ru_maxrss). O int8 é
+  quantizado a partir do float32, então o pico inclui os pesos em float32;
+- concordância com o primeiro modo da lista (float32 por padrão): tokens
+  idênticos, tamanho do prefixo comum e similaridade do texto (difflib).
+
+bfloat16 só roda em CPU com bfloat16 nativo; sem ele o registro cai para
+float32 e a medição sai marcada com o dtype efetivo.
+
+    python benchmarks/bench_llm_cpu.py
+    python benchmarks/bench_llm_cpu.py --modos float32 int8 --repeticoes 3
+    python benchmarks/bench_llm_cpu.py --comparar
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/llm_cpu.jsonl.
+"""
+import argparse
+import difflib
+import json
+import os
+import pathlib
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = pathlib.Path(__file__).resolve().parents[1]
+if str(RAIZ / "app") not in sys.path:
+    sys.path.insert(0, str(RAIZ / "app"))
+
+from services.modelos import DTYPES, MODELO_PADRAO  # noqa: E402
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "llm_cpu.jsonl"
+
+# indicadores fixos: o prompt é sempre o mesmo entre modos e execuções
+DADOS = dict(
+    qtd_estoque_consumido_ton=1520,
+    freq_compra=11,
+    valor_aging_min=1,
+    valor_aging_avg=6,
+    valor_aging_max=19,
+    qtd_consomem_sku1=37,
+    skus_alto_giro_sem_estoque=[101, 204, 318],
+    itens_a_repor=["SKU_4", "SKU_9"],
+    risco_desabastecimento_sku1="Alto",
+)
+
+
+def _rss_pico_mb() -> float:
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_filho(modo: str, repeticoes: int, saida: str) -> None:
+    """Roda no processo filho: carrega o modelo no modo pedido e gera o boletim `repeticoes` vezes"""
+    from models.dados_boletim_model import DadosBoletimModel
+    from services.boletim_service import BoletimService
+    from services.modelos import obter_modelo
+
+    servico = BoletimService()
+    prompt = servico._montar_prompt(DadosBoletimModel(**DADOS))
+    modelo = obter_modelo(dtype=modo, dispositivo="cpu")
+    tokens_prompt = modelo.tokenizer(prompt, return_tensors="pt")["input_ids"].shape[1]
+
+    servico._gerar(modelo, prompt)  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        ids = servico._gerar(modelo, prompt)
+        tempos.append(time.perf_counter() - inicio)
+    gerados = ids[0][tokens_prompt:].tolist()
+    mediana = statistics.median(tempos)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump({
+            "modo": modo,
+            "dtype": modelo.dtype,
+            "segundos_carga": modelo.segundos,
+            "rss_carga_mb": modelo.rss_depois_mb,
+            "rss_pico_mb": round(_rss_pico_mb(), 1),
+            "tokens_prompt": tokens_prompt,
+            "tokens_gerados": len(gerados),
+            "segundos_geracao": round(mediana, 3),
+            "tokens_por_s": round(len(gerados) / mediana, 2),
+            "ids": gerados,
+            "texto": modelo.tokenizer.decode(gerados, skip_special_tokens=True),
+        }, f, ensure_ascii=False)
+
+
+def medir(modo: str, repeticoes: int) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        saida = f.name
+    try:
+        # processo novo por modo: o pico de RSS de um não contamina o outro
+        subprocess.run([sys.executable, __file__, "--filho", modo, str(repeticoes), saida], check=True)
+        with open(saida, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(saida)
+
+
+def concordancia(referencia: dict, medicao: dict) -> dict:
+    a, b = referencia["ids"], medicao["ids"]
+    prefixo = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+    return {
+        "tokens_identicos": a == b,
+        "prefixo_comum": prefixo,
+        "similaridade_texto": round(difflib.SequenceMatcher(None, referencia["texto"], medicao["texto"]).ratio(), 3),
+    }
+
+
+def comparar() -> None:
+    if not RESULTADOS.exists():
+        print("Nenhum resultado gravado ainda")
+        return
+    for linha in RESULTADOS.read_text(encoding="utf-8").splitlines():
+        execucao = json.loads(linha)
+        print(f"{execucao['quando']}  {execucao['rotulo']}  ({execucao['modelo']})")
+        for m in execucao["medicoes"]:
+            print(f"  {m['modo']:<9} ({m['dtype']:<8}) {m['tokens_por_s']:7.2f} tokens/s  "
+                  f"RSS {m['rss_carga_mb']} MB (pico {m['rss_pico_mb']})  "
+                  f"prefixo comum {m['prefixo_comum']}/{m['tokens_gerados']}  texto {m['similaridade_texto']:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens/s, memória e concordância dos modos de inferência na CPU")
+    parser.add_argument("--modos", nargs="+", choices=DTYPES, default=list(DTYPES),
+                        help="o primeiro é a referência da concordância")
+    parser.add_argument("--repeticoes", type=int, default=2)
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--comparar", action="store_true", help="mostra o histórico gravado")
+    parser.add_argument("--filho", nargs=3, metavar=("MODO", "REPETICOES", "SAIDA"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        modo, repeticoes, saida = args.filho
+        medir_filho(modo, int(repeticoes), saida)
+        return
+    if args.comparar:
+        comparar()
+        return
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "modelo": MODELO_PADRAO, "repeticoes": args.repeticoes, "medicoes": []}
+    referencia = None
+    for modo in args.modos:
+        medicao = medir(modo, args.repeticoes)
+        referencia = referencia or medicao
+        medicao.update(concordancia(referencia, medicao))
+        print(f"{modo:<9} ({medicao['dtype']:<8}) {medicao['tokens_por_s']:7.2f} tokens/s "
+              f"({medicao['tokens_gerados']} tokens em {medicao['segundos_geracao']:.2f}s)  "
+              f"carga {medicao['segundos_carga']:.1f}s  RSS {medicao['rss_carga_mb']} MB (pico {medicao['rss_pico_mb']})  "
+              f"{'✅ tokens idênticos' if medicao['tokens_identicos'] else '⚠️ diverge'} "
+              f"(prefixo comum {medicao['prefixo_comum']}, texto {medicao['similaridade_texto']:.0%})")
+        # os ids ficam só em memória (a referência ainda é comparada com os próximos modos)
+        resultado["medicoes"].append({k: v for k, v in medicao.items() if k != "ids"})
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
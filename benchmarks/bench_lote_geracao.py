@@ -0,0 +1,157 @@
+"""Vazão x latência do agendador de micro-lotes do modelo local sob carga concorrente.
+
+Carrega o modelo pelo registro (LLM_DTYPE vale) e, para cada tamanho de lote
+(--lotes), espera máxima (--esperas, ms) e concorrência (--concorrencias),
+cria um AgendadorGeracao (services/lote_geracao.py) e dispara --pedidos
+perguntas do chat (prompt da pergunta simples e parâmetros de geração do
+AgentService, com --max-tokens para a medição caber no tempo) a partir de N
+threads em loop fechado. Mede pedidos/s, tokens gerados/s, latência p50/p95 por
+pedido e o tamanho médio dos lotes, e confere o texto de cada resposta com o
+gerado sozinho (lote 1, um pedido por vez).
+
+    python benchmarks/bench_lote_geracao.py
+    python benchmarks/bench_lote_geracao.py --lotes 1 4 --esperas 10 --concorrencias 4 8 --pedidos 32
+    python benchmarks/bench_lote_geracao.py --comparar
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/lote_geracao.jsonl.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from datetime import datetime
+
+# importar o bench dos modos de CPU já coloca app/ no sys.path
+from bench_llm_cpu import RAIZ
+from services.agent_service import _PARAMETROS_GERACAO, _PREFIXO_PERGUNTA_SIMPLES, AgentService
+from services.lote_geracao import AgendadorGeracao
+from services.modelos import obter_modelo
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "lote_geracao.jsonl"
+
+PERGUNTAS = [
+    "Qual o estoque total de bobinas?",
+    "Quais SKUs tiveram maior faturamento no último mês?",
+    "Como está o aging do estoque?",
+    "Quantos clientes compraram chapas em São Paulo?",
+    "Qual a tendência de vendas de rolos no trimestre?",
+    "Existe risco de faltar o SKU_1 nas próximas semanas?",
+    "Compare o faturamento de janeiro e fevereiro.",
+    "Quais produtos estão parados há mais de 10 semanas?",
+]
+
+
+def _percentil(valores: list[float], perc: float) -> float:
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, int(round(perc / 100.0 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def carga(agendador: AgendadorGeracao, tokenizer, concorrencia: int, pedidos: int) -> tuple[dict, dict[int, str]]:
+    """`pedidos` perguntas por `concorrencia` threads em loop fechado; devolve as medições e o texto por pergunta"""
+    prompts = [AgentService._montar_prompt_simples(p) for p in PERGUNTAS]
+    tokens_prompt = [len(tokenizer(p)["input_ids"]) for p in prompts]
+    especiais = set(tokenizer.all_special_ids)
+    proximo = itertools.count()
+    lock = threading.Lock()
+    latencias: list[float] = []
+    textos: dict[int, str] = {}
+    gerados = 0
+
+    def cliente():
+        nonlocal gerados
+        while (i := next(proximo)) < pedidos:
+            j = i % len(prompts)
+            inicio = time.perf_counter()
+            ids = agendador.gerar(prompts[j], _PREFIXO_PERGUNTA_SIMPLES)
+            latencia = time.perf_counter() - inicio
+            # o complemento das linhas que terminam antes no lote não conta como token gerado
+            novos = [t for t in ids[tokens_prompt[j]:] if t not in especiais]
+            with lock:
+                latencias.append(latencia)
+                gerados += len(novos)
+                textos[j] = tokenizer.decode(novos)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+    estatisticas = agendador.estatisticas()
+    return {
+        "pedidos": len(latencias),
+        "pedidos_por_s": round(len(latencias) / decorrido, 3),
+        "tokens_por_s": round(gerados / decorrido, 2),
+        "p50_ms": round(_percentil(latencias, 50) * 1000, 1),
+        "p95_ms": round(_percentil(latencias, 95) * 1000, 1),
+        "media_por_lote": estatisticas["media_por_lote"],
+        "maior_lote": estatisticas["maior_lote"],
+    }, textos
+
+
+def comparar() -> None:
+    if not RESULTADOS.exists():
+        print("Nenhum resultado gravado ainda")
+        return
+    for linha in RESULTADOS.read_text(encoding="utf-8").splitlines():
+        execucao = json.loads(linha)
+        print(f"{execucao['quando']}  {execucao['rotulo']}  ({execucao['modelo']} {execucao['dtype']}, "
+              f"{execucao['max_tokens']} tokens)")
+        for m in execucao["medicoes"]:
+            print(f"  lote {m['tamanho_lote']:>2} espera {m['espera_ms']:>5.0f}ms conc {m['concorrencia']:>2}: "
+                  f"{m['pedidos_por_s']:7.3f} pedidos/s {m['tokens_por_s']:8.2f} tokens/s  "
+                  f"p50 {m['p50_ms']:>8.1f}ms p95 {m['p95_ms']:>8.1f}ms  lote médio {m['media_por_lote']:.2f}  "
+                  f"textos iguais {m['textos_iguais']:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão e latência do generate em micro-lotes sob carga concorrente")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 2, 4, 8], help="tamanhos máximos de lote")
+    parser.add_argument("--esperas", type=float, nargs="+", default=[5, 20], help="espera máxima pelo lote (ms)")
+    parser.add_argument("--concorrencias", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--pedidos", type=int, default=16, help="pedidos por medição")
+    parser.add_argument("--max-tokens", type=int, default=32, help="max_new_tokens (o chat usa 100)")
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--comparar", action="store_true", help="mostra o histórico gravado")
+    args = parser.parse_args()
+    if args.comparar:
+        comparar()
+        return
+
+    modelo = obter_modelo()
+    eos = modelo.tokenizer.eos_token_id
+    parametros = dict(_PARAMETROS_GERACAO, max_new_tokens=args.max_tokens, pad_token_id=eos, eos_token_id=eos)
+
+    # referência: um pedido por vez, sem lote (a primeira rodada também aquece o modelo)
+    referencia = AgendadorGeracao(modelo, parametros, 512, tamanho_lote=1, espera_ms=0)
+    carga(referencia, modelo.tokenizer, 1, 1)
+    _, textos_referencia = carga(referencia, modelo.tokenizer, 1, len(PERGUNTAS))
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "modelo": modelo.modelo_id, "dtype": modelo.dtype, "dispositivo": modelo.dispositivo,
+                 "max_tokens": args.max_tokens, "medicoes": []}
+    for tamanho_lote in args.lotes:
+        # com lote 1 a espera não muda nada: mede só a primeira
+        for espera in args.esperas[:1] if tamanho_lote == 1 else args.esperas:
+            for concorrencia in args.concorrencias:
+                agendador = AgendadorGeracao(modelo, parametros, 512, tamanho_lote=tamanho_lote, espera_ms=espera)
+                medicao, textos = carga(agendador, modelo.tokenizer, concorrencia, args.pedidos)
+                iguais = sum(textos[j] == textos_referencia[j] for j in textos) / len(textos)
+                medicao = {"tamanho_lote": tamanho_lote, "espera_ms": espera, "concorrencia": concorrencia,
+                           **medicao, "textos_iguais": round(iguais, 3)}
+                print(f"lote {tamanho_lote:>2} espera {espera:>5.0f}ms conc {concorrencia:>2}: "
+                      f"{medicao['pedidos_por_s']:7.3f} pedidos/s {medicao['tokens_por_s']:8.2f} tokens/s  "
+                      f"p50 {medicao['p50_ms']:>8.1f}ms p95 {medicao['p95_ms']:>8.1f}ms  "
+                      f"lote médio {medicao['media_por_lote']:.2f}  textos iguais {iguais:.0%}")
+                resultado["medicoes"].append(medicao)
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Tempo até o primeiro token (TTFT) com e sem o KV cache dos prefixos de prompt.
+
+Carrega o modelo pelo registro (LLM_DTYPE vale) e, para o prompt do boletim
+(indicadores fixos do bench_llm_cpu.py) e o da pergunta simples do chat com
+algumas perguntas, mede o TTFT (generate de um token: codificação do prompt +
+primeiro token) com o cache ligado e desligado (services/cache_prefixo.py), em
+mediana de --repeticoes. A codificação de cada prefixo, paga uma vez por
+processo, aparece à parte. Também confere que a saída completa de cada serviço
+(os 250 tokens do boletim, a resposta limpa do chat) é a mesma com e sem cache.
+
+    python benchmarks/bench_prefixo_kv.py
+    python benchmarks/bench_prefixo_kv.py --repeticoes 20 --sem-conferencia
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/prefixo_kv.jsonl.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+
+# importar o bench dos modos de CPU já coloca app/ no sys.path
+from bench_llm_cpu import DADOS, RAIZ
+from models.dados_boletim_model import DadosBoletimModel
+from services import cache_prefixo
+from services.agent_service import _PREFIXO_PERGUNTA_SIMPLES, AgentService
+from services.boletim_service import _PREFIXO_PROMPT, BoletimService
+from services.modelos import obter_modelo
+
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "prefixo_kv.jsonl"
+
+PERGUNTAS = [
+    "Qual o estoque total de bobinas?",
+    "Quais SKUs tiveram maior faturamento no último mês?",
+    "Como está o aging do estoque?",
+]
+
+
+def _ttft(modelo, prompt: str, prefixo: str, ativo: bool, repeticoes: int) -> float:
+    cache_prefixo.ATIVO = ativo
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        cache_prefixo.gerar(modelo, prompt, prefixo, max_new_tokens=1, do_sample=False,
+                            pad_token_id=modelo.tokenizer.eos_token_id)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def _com_e_sem_cache(funcao):
+    """Resultado de `funcao()` com o cache desligado e ligado"""
+    cache_prefixo.ATIVO = False
+    sem = funcao()
+    cache_prefixo.ATIVO = True
+    return sem, funcao()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTFT com e sem o KV cache dos prefixos de prompt")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--sem-conferencia", action="store_true", help="não compara as saídas completas")
+    parser.add_argument("--rotulo", default="atual")
+    args = parser.parse_args()
+
+    boletim = BoletimService()
+    agente = AgentService()
+    modelo = obter_modelo()
+    casos = [("boletim", _PREFIXO_PROMPT, boletim._montar_prompt(DadosBoletimModel(**DADOS)))]
+    casos += [(f"chat: {p}", _PREFIXO_PERGUNTA_SIMPLES, AgentService._montar_prompt_simples(p)) for p in PERGUNTAS]
+
+    # aquecimento: a primeira chamada do modelo paga alocações que não são do prompt
+    _ttft(modelo, casos[0][2], casos[0][1], False, 1)
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "modelo": modelo.modelo_id, "dtype": modelo.dtype, "dispositivo": modelo.dispositivo,
+                 "repeticoes": args.repeticoes, "casos": []}
+    for nome, prefixo, prompt in casos:
+        _ttft(modelo, prompt, prefixo, True, 1)  # codifica o prefixo, se ainda não estiver em cache
+        codificacao = next(p for p in cache_prefixo.estatisticas() if prefixo.startswith(p["inicio"]))
+        sem = _ttft(modelo, prompt, prefixo, False, args.repeticoes)
+        com = _ttft(modelo, prompt, prefixo, True, args.repeticoes)
+        tokens = len(modelo.tokenizer(prompt)["input_ids"])
+        print(f"{nome:<62} {tokens:4d} tokens ({codificacao['tokens']} no prefixo)  "
+              f"TTFT {sem * 1000:7.1f}ms -> {com * 1000:7.1f}ms  economia {(sem - com) * 1000:6.1f}ms "
+              f"({(1 - com / sem) * 100:4.1f}%)")
+        resultado["casos"].append({
+            "caso": nome, "tokens_prompt": tokens, "tokens_prefixo": codificacao["tokens"],
+            "codificacao_prefixo_ms": round(codificacao["segundos_codificacao"] * 1000, 1),
+            "ttft_sem_cache_ms": round(sem * 1000, 1), "ttft_com_cache_ms": round(com * 1000, 1),
+            "economia_ms": round((sem - com) * 1000, 1),
+        })
+
+    if not args.sem_conferencia:
+        sem, com = _com_e_sem_cache(lambda: boletim._gerar(modelo, casos[0][2])[0].tolist())
+        iguais = {"boletim": sem == com}
+        for pergunta in PERGUNTAS:
+            prompt = AgentService._montar_prompt_simples(pergunta)
+            sem, com = _com_e_sem_cache(lambda: agente._generate_response(prompt, _PREFIXO_PERGUNTA_SIMPLES))
+            iguais[f"chat: {pergunta}"] = sem == com
+        for nome, igual in iguais.items():
+            print(f"{'✅' if igual else '❌'} saída completa {'igual' if igual else 'diferente'} com e sem cache: {nome}")
+        resultado["saidas_iguais"] = iguais
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    if not all(resultado.get("saidas_iguais", {}).values()):
+        raise SystemExit("Saídas diferentes com e sem o cache de prefixo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Startup da API: custo dos imports e tempo até servir GET / e POST /token.
+
+1. Importa app/main.py num processo novo com `python -X importtime` e soma o
+   tempo próprio de cada pacote de topo (pandas inclui pandas.core...), listando
+   os que mais custam e avisando se alguma dependência pesada (torch,
+   transformers, google.genai, nltk, pandas, sendgrid, sib_api_v3_sdk...) foi
+   importada no boot. Elas só devem carregar no primeiro uso (chat, boletim,
+   upload, e-mail).
+2. Sobe o uvicorn com um worker e mede o tempo desde o início do processo até a
+   primeira resposta de GET / e de POST /token (com credenciais inválidas: o 401
+   já mostra que a rota serve), e o RSS do servidor nesse momento. O lifespan
+   roda inteiro antes da primeira resposta, então o pool de conexões entra na
+   conta. O servidor usa o banco do .env: rode com o banco local.
+
+    DB_BACKEND=local python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --sem-servidor      # só o relatório de imports
+    python benchmarks/bench_startup.py --comparar
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/startup.jsonl.
+"""
+import argparse
+import json
+import pathlib
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+RAIZ = pathlib.Path(__file__).resolve().parents[1]
+APP = RAIZ / "app"
+RESULTADOS = RAIZ / "benchmarks" / "resultados" / "startup.jsonl"
+
+PESADOS = ("torch", "transformers", "google.genai", "nltk", "pandas", "numpy", "pyarrow", "sendgrid",
+           "sib_api_v3_sdk")
+
+# "import time:       123 |        456 |   pacote.modulo"
+_RE_LINHA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def relatorio_imports(top: int) -> dict:
+    """Roda `import main` com -X importtime e agrega o tempo próprio por pacote de topo"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=APP,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"import main falhou:\n{proc.stderr[-2000:]}")
+    por_pacote: dict[str, int] = defaultdict(int)
+    modulos = set()
+    total_main = 0
+    for linha in proc.stderr.splitlines():
+        m = _RE_LINHA.match(linha)
+        if not m:
+            continue
+        proprio, cumulativo, recuo, nome = int(m[1]), int(m[2]), m[3], m[4]
+        modulos.add(nome)
+        por_pacote[nome.split(".")[0]] += proprio
+        if nome == "main" and not recuo:
+            total_main = cumulativo
+    pesados = [p for p in PESADOS if any(n == p or n.startswith(p + ".") for n in modulos)]
+    return {
+        "import_main_ms": round(total_main / 1000, 1),
+        "modulos": len(modulos),
+        "pesados_no_boot": pesados,
+        "pacotes_ms": {p: round(us / 1000, 1)
+                       for p, us in sorted(por_pacote.items(), key=lambda i: -i[1])[:top]},
+    }
+
+
+def _rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return round(int(linha.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def medir_servidor(porta: int, limite: float) -> dict:
+    """Sobe o uvicorn e mede o tempo até a primeira resposta de / e /token"""
+    url = f"http://127.0.0.1:{porta}"
+    with tempfile.TemporaryFile(mode="w+") as log:
+        inicio = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(porta),
+                                 "--log-level", "warning"], cwd=APP, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            with httpx.Client(base_url=url, timeout=limite) as client:
+                while True:
+                    if proc.poll() is not None or time.perf_counter() - inicio > limite:
+                        log.seek(0)
+                        raise SystemExit(f"O servidor não respondeu em {limite}s:\n{log.read()[-2000:]}")
+                    try:
+                        raiz = client.get("/")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.01)
+                t_raiz = time.perf_counter() - inicio
+                t0 = time.perf_counter()
+                token = client.post("/token", data={"username": "bench@startup.invalido", "password": "x"})
+                t_token = time.perf_counter()
+            return {
+                "raiz_s": round(t_raiz, 3),
+                "raiz_status": raiz.status_code,
+                "token_s": round(t_token - inicio, 3),
+                "token_ms": round((t_token - t0) * 1000, 1),
+                "token_status": token.status_code,
+                "rss_mb": _rss_mb(proc.pid),
+            }
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+def comparar() -> None:
+    if not RESULTADOS.exists():
+        print("Nenhum resultado gravado ainda")
+        return
+    for linha in RESULTADOS.read_text(encoding="utf-8").splitlines():
+        r = json.loads(linha)
+        servidor = r.get("servidor")
+        extra = (f"  / em {servidor['raiz_s']:.2f}s  /token em {servidor['token_s']:.2f}s  "
+                 f"RSS {servidor['rss_mb']} MB") if servidor else ""
+        print(f"{r['quando']}  {r['rotulo']:<12} import main {r['imports']['import_main_ms']:>7.1f}ms  "
+              f"pesados: {', '.join(r['imports']['pesados_no_boot']) or '-'}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de import e de boot da API")
+    parser.add_argument("--top", type=int, default=15, help="pacotes listados no relatório de imports")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--limite", type=float, default=120.0, help="espera máxima pelo servidor (s)")
+    parser.add_argument("--sem-servidor", action="store_true", help="só o relatório de imports")
+    parser.add_argument("--rotulo", default="atual")
+    parser.add_argument("--comparar", action="store_true", help="mostra o histórico gravado")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="permite subir o servidor contra DATABASE_URL (o boot agenda o boletim semanal)")
+    args = parser.parse_args()
+    if args.comparar:
+        comparar()
+        return
+
+    sys.path.insert(0, str(APP))
+    from db.backend import DB_BACKEND
+    if not args.sem_servidor and DB_BACKEND != "local" and not args.permitir_remoto:
+        parser.error("DB_BACKEND não é 'local'; use --permitir-remoto ou --sem-servidor")
+
+    imports = relatorio_imports(args.top)
+    print(f"import main: {imports['import_main_ms']:.1f}ms ({imports['modulos']} módulos)")
+    for pacote, ms in imports["pacotes_ms"].items():
+        print(f"  {pacote:<28} {ms:8.1f}ms")
+    if imports["pesados_no_boot"]:
+        print(f"⚠️ Dependências pesadas importadas no boot: {', '.join(imports['pesados_no_boot'])}")
+    else:
+        print("✅ Nenhuma dependência pesada importada no boot")
+
+    resultado = {"quando": datetime.now().isoformat(timespec="seconds"), "rotulo": args.rotulo,
+                 "backend": DB_BACKEND, "imports": imports, "servidor": None}
+    if not args.sem_servidor:
+        servidor = medir_servidor(args.porta, args.limite)
+        print(f"GET / respondeu {servidor['raiz_status']} em {servidor['raiz_s']:.3f}s após iniciar o processo; "
+              f"POST /token respondeu {servidor['token_status']} em {servidor['token_s']:.3f}s "
+              f"({servidor['token_ms']:.1f}ms); RSS {servidor['rss_mb']} MB")
+        resultado["servidor"] = servidor
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark de concorrência da rota GET /users/me.
+
+Mede quantas requisições concorrentes um único worker uvicorn sustenta,
+aumentando a concorrência por níveis. Para comparar antes/depois, suba o
+servidor em cada versão do código e rode o benchmark com rótulos diferentes:
+
+    python app/main.py                      # em outro terminal
+    python benchmarks/bench_users_me.py --email admin@empresa.com --senha *** --rotulo depois
+    python benchmarks/bench_users_me.py --comparar
+
+Cada execução acrescenta uma linha JSON em benchmarks/resultados/users_me.jsonl.
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+
+RESULTADOS = pathlib.Path(__file__).resolve().parent / "resultados" / "users_me.jsonl"
+
+
+def _percentil(valores: list[float], perc: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, int(round(perc / 100.0 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+async def _login(client: httpx.AsyncClient, email: str, senha: str) -> str:
+    resp = await client.post("/token", data={"username": email, "password": senha})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def _rodar_nivel(client: httpx.AsyncClient, token: str, concorrencia: int, duracao: float) -> dict:
+    """Dispara `concorrencia` clientes em loop fechado durante `duracao` segundos"""
+    headers = {"Authorization": f"Bearer {token}"}
+    latencias: list[float] = []
+    erros = 0
+    fim = time.perf_counter() + duracao
+
+    async def cliente():
+        nonlocal erros
+        while time.perf_counter() < fim:
+            t0 = time.perf_counter()
+            try:
+                resp = await client.get("/users/me", headers=headers)
+                if resp.status_code == 200:
+                    latencias.append(time.perf_counter() - t0)
+                else:
+                    erros += 1
+            except httpx.HTTPError:
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+
+    return {
+        "concorrencia": concorrencia,
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "req_por_s": round(len(latencias) / decorrido, 1),
+        "p50_ms": round(_percentil(latencias, 50) * 1000, 1),
+        "p95_ms": round(_percentil(latencias, 95) * 1000, 1),
+        "p99_ms": round(_percentil(latencias, 99) * 1000, 1),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 1) if latencias else 0.0,
+    }
+
+
+async def executar(args) -> dict:
+    niveis = [int(n) for n in args.niveis.split(",")]
+    limites = httpx.Limits(max_connections=max(niveis), max_keepalive_connections=max(niveis))
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=args.timeout) as client:
+        token = await _login(client, args.email, args.senha)
+        resultados = []
+        for concorrencia in niveis:
+            r = await _rodar_nivel(client, token, concorrencia, args.duracao)
+            resultados.append(r)
+            print(f"  c={r['concorrencia']:>4}  {r['req_por_s']:>8} req/s  "
+                  f"p50={r['p50_ms']:>7}ms  p95={r['p95_ms']:>7}ms  erros={r['erros']}")
+
+    # Maior concorrência que ainda respeita o SLO de latência sem erros
+    sustentada = 0
+    for r in resultados:
+        if r["erros"] == 0 and r["p95_ms"] <= args.slo_ms:
+            sustentada = r["concorrencia"]
+
+    return {
+        "rotulo": args.rotulo,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "url": args.url,
+        "duracao_por_nivel_s": args.duracao,
+        "slo_p95_ms": args.slo_ms,
+        "concorrencia_sustentada": sustentada,
+        "niveis": resultados,
+    }
+
+
+def comparar() -> None:
+    """Mostra a última execução de cada rótulo lado a lado"""
+    if not RESULTADOS.exists():
+        print("Nenhum resultado registrado ainda.")
+        return
+    por_rotulo = {}
+    for linha in RESULTADOS.read_text(encoding="utf-8").splitlines():
+        if linha.strip():
+            r = json.loads(linha)
+            por_rotulo[r["rotulo"]] = r
+    for rotulo, r in por_rotulo.items():
+        pico = max(r["niveis"], key=lambda n: n["req_por_s"])
+        print(f"{rotulo:>12}: concorrência sustentada={r['concorrencia_sustentada']:>4} "
+              f"(p95 <= {r['slo_p95_ms']}ms)  pico={pico['req_por_s']} req/s em c={pico['concorrencia']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência de GET /users/me")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", help="email de um usuário existente")
+    parser.add_argument("--senha", help="senha do usuário")
+    parser.add_argument("--rotulo", default="atual", help="identifica a versão medida (ex.: antes, depois)")
+    parser.add_argument("--niveis", default="1,8,32,64,128,256", help="níveis de concorrência separados por vírgula")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por nível")
+    parser.add_argument("--slo-ms", type=float, default=200.0, help="p95 máximo para considerar o nível sustentado")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--comparar", action="store_true", help="apenas compara os resultados já gravados")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar()
+        return
+    if not args.email or not args.senha:
+        parser.error("--email e --senha são obrigatórios para medir")
+
+    print(f"Medindo GET /users/me em {args.url} (rótulo: {args.rotulo})")
+    resultado = asyncio.run(executar(args))
+    print(f"Concorrência sustentada (p95 <= {args.slo_ms}ms, sem erros): {resultado['concorrencia_sustentada']}")
+
+    RESULTADOS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTADOS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Gerador de CSVs sintéticos de estoque/faturamento no formato do upload.
+
+As linhas válidas vêm do mesmo gerador do `db.seed` (combinações sorteadas dos
+CSVs de exemplo, então a cardinalidade das colunas é parecida com a real). Uma
+fração `invalidas` das linhas é estragada de um dos jeitos que aparecem em
+arquivos reais, escolhidos a partir do descritor da tabela
+(services/esquemas_ingestao.py):
+
+- tipo: valor fora do formato numa coluna de data ou número (31/12/2024, 12a, 1,5);
+- regra: valor que viola a regra da coluna (número negativo, UF com 3 letras);
+- coluna: linha com um campo a menos.
+
+Os exemplos do faturamento já trazem algumas linhas com peso negativo
+(devoluções), recusadas pela regra da coluna: cerca de 1% a mais de erros.
+
+O arquivo é escrito aos poucos, então 1 milhão de linhas não passa pela memória.
+
+    python benchmarks/gerador_csv.py faturamento 1000000 --invalidas 0.01 -o faturamento_1m.csv
+    python benchmarks/gerador_csv.py estoque 100000 -o estoque.csv.gz
+"""
+import argparse
+import csv
+import gzip
+import pathlib
+import random
+import sys
+from datetime import date
+from typing import Iterator, TextIO
+
+RAIZ = pathlib.Path(__file__).resolve().parents[1]
+if str(RAIZ / "app") not in sys.path:
+    sys.path.insert(0, str(RAIZ / "app"))
+
+from db.seed import _COLUNAS, gerar_linhas  # noqa: E402
+from services.esquemas_ingestao import ESQUEMAS, Coluna  # noqa: E402
+
+TIPOS_INVALIDOS = ("tipo", "regra", "coluna")
+
+_FORA_DO_TIPO = {date: ("31/12/2024", "2024-02-30", ""), int: ("12a", "1.5", ""), float: ("1,5", "abc", "")}
+_FORA_DA_REGRA = {"nao_negativo": ("-1", "-0.5"), "uf": ("XYZ", "S")}
+
+
+def _estragar(colunas: tuple[Coluna, ...], valores: list[str], rng: random.Random) -> list[str]:
+    tipo = rng.choice(TIPOS_INVALIDOS)
+    if tipo == "coluna":
+        return valores[:-1]
+    if tipo == "regra":
+        candidatas = [i for i, c in enumerate(colunas) if c.regra is not None]
+        if candidatas:
+            i = rng.choice(candidatas)
+            valores[i] = rng.choice(_FORA_DA_REGRA[colunas[i].regra.tipo])
+            return valores
+    candidatas = [i for i, c in enumerate(colunas) if c.tipo in _FORA_DO_TIPO]
+    i = rng.choice(candidatas)
+    valores[i] = rng.choice(_FORA_DO_TIPO[colunas[i].tipo])
+    return valores
+
+
+def gerar_linhas_csv(tabela: str, linhas: int, invalidas: float = 0.0, semente: int = 42,
+                     dias: int = 365) -> Iterator[list[str]]:
+    """Cabeçalho e depois `linhas` linhas (listas de texto) na ordem das colunas do descritor"""
+    esquema = ESQUEMAS[tabela]
+    # o seed gera na ordem de _COLUNAS; o arquivo segue a ordem do descritor
+    posicoes = [_COLUNAS[tabela].index(destino) for destino in esquema.destinos]
+    rng = random.Random(semente)
+    yield esquema.nomes
+    for gerada in gerar_linhas(tabela, linhas, dias, rng):
+        valores = [str(gerada[p]) for p in posicoes]
+        if invalidas and rng.random() < invalidas:
+            valores = _estragar(esquema.colunas, valores, rng)
+        yield valores
+
+
+def escrever_csv(destino: TextIO, tabela: str, linhas: int, invalidas: float = 0.0, semente: int = 42) -> None:
+    writer = csv.writer(destino, delimiter="|", lineterminator="\n")
+    writer.writerows(gerar_linhas_csv(tabela, linhas, invalidas, semente))
+
+
+def gravar_csv(caminho: str | pathlib.Path, tabela: str, linhas: int, invalidas: float = 0.0,
+               semente: int = 42) -> pathlib.Path:
+    """Grava o CSV em `caminho` (.csv.gz sai compactado)"""
+    caminho = pathlib.Path(caminho)
+    abrir = gzip.open if caminho.suffix == ".gz" else open
+    with abrir(caminho, "wt", encoding="utf-8", newline="") as f:
+        escrever_csv(f, tabela, linhas, invalidas, semente)
+    return caminho
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera CSV sintético de estoque/faturamento")
+    parser.add_argument("tabela", choices=list(ESQUEMAS))
+    parser.add_argument("linhas", type=int)
+    parser.add_argument("--invalidas", type=float, default=0.001, help="fração de linhas inválidas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("-o", "--saida", help="arquivo de saída (.csv ou .csv.gz); sem ele, vai para a saída padrão")
+    args = parser.parse_args()
+    if args.saida:
+        gravar_csv(args.saida, args.tabela, args.linhas, args.invalidas, args.semente)
+    else:
+        escrever_csv(sys.stdout, args.tabela, args.linhas, args.invalidas, args.semente)
+
+
+if __name__ == "__main__":
+    main()
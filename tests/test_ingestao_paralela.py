@@ -0,0 +1,113 @@
+"""IngestaoParalela.ingerir de ponta a ponta com o banco trocado por uma tabela em memória.
+
+A validação roda de verdade no pool de processos; só as conexões dos escritores
+(NeonDB, staging e gravar_lote) e a contagem do período do cache de digests são
+substituídas.
+"""
+import csv
+import random
+
+import pytest
+
+from db.hash_linha import COLUNAS_HASH
+from db.seed import gerar_linhas
+from services import csv_service, ingestao_paralela
+from services.csv_service import CsvService
+from services.esquemas_ingestao import ESQUEMAS
+from services.ingestao_paralela import IngestaoParalela
+
+ESQUEMA = ESQUEMAS["estoque"]
+
+
+class _BancoFalso:
+    """Conexão que só aceita commit; as linhas ficam em `tabela` (conjunto, como o índice de hash_linha)"""
+    tabela: set = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def commit(self):
+        pass
+
+
+def _gravar_lote(self, db, tabela, colunas, lote, staging=None):
+    novas = {valores for _, valores in lote} - _BancoFalso.tabela
+    _BancoFalso.tabela |= novas
+    return len(novas), len(lote) - len(novas), []
+
+
+def _contar_periodo(tabela, periodo):
+    pos = ESQUEMA.destinos.index("data")
+    return sum(periodo[0] <= valores[pos] <= periodo[1] for valores in _BancoFalso.tabela)
+
+
+@pytest.fixture(autouse=True)
+def banco(monkeypatch):
+    monkeypatch.setattr(_BancoFalso, "tabela", set())
+    monkeypatch.setattr(ingestao_paralela, "NeonDB", _BancoFalso)
+    monkeypatch.setattr(CsvService, "criar_staging", lambda self, db, tabela, colunas: None)
+    monkeypatch.setattr(CsvService, "gravar_lote", _gravar_lote)
+    monkeypatch.setattr(csv_service, "_contar_periodo", _contar_periodo)
+    monkeypatch.setattr(csv_service, "_arquivos_ingeridos", type(csv_service._arquivos_ingeridos)())
+
+
+def _escrever_csv(caminho, linhas: int, semente: int, extras=()) -> None:
+    posicoes = [COLUNAS_HASH[ESQUEMA.tabela].index(destino) for destino in ESQUEMA.destinos]
+    with open(caminho, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="|", lineterminator="\n")
+        writer.writerow(ESQUEMA.nomes)
+        for valores in gerar_linhas(ESQUEMA.tabela, linhas, 30, random.Random(semente)):
+            writer.writerow([valores[p] for p in posicoes])
+        writer.writerows(extras)
+
+
+def test_arquivo_limpo_e_reenvio(tmp_path):
+    caminho = tmp_path / "e1.csv"
+    _escrever_csv(caminho, 300, semente=7)
+    ingestao = IngestaoParalela(processos=2, escritores=2)
+
+    resultado = ingestao.ingerir(ESQUEMA, [("e1.csv", str(caminho))])
+    assert resultado["success"], resultado["message"]
+    detalhes = resultado["detalhes"]
+    assert (detalhes["registros_processados"], detalhes["registros_com_erro"], detalhes["registros_duplicados"]) \
+        == (300, 0, 0)
+    assert len(_BancoFalso.tabela) == 300
+
+    # o mesmo arquivo de novo: o cache de digests responde sem validar nem gravar
+    executar = ingestao._executar
+
+    def sem_partes(esquema, partes, *args):
+        assert not partes, "arquivo repetido foi validado de novo"
+        executar(esquema, partes, *args)
+    ingestao._executar = sem_partes
+    resultado = ingestao.ingerir(ESQUEMA, [("e1.csv", str(caminho))])
+    assert resultado["success"], resultado["message"]
+    assert resultado["detalhes"]["registros_duplicados"] == 300
+    assert resultado["detalhes"]["arquivos"][0]["arquivo_repetido"]
+
+
+def test_mesmo_arquivo_duas_vezes_na_mesma_chamada(tmp_path):
+    caminho = tmp_path / "e1.csv"
+    _escrever_csv(caminho, 200, semente=3)
+    resultado = IngestaoParalela(processos=2, escritores=2).ingerir(
+        ESQUEMA, [("e1.csv", str(caminho)), ("copia.csv", str(caminho))])
+    assert resultado["success"], resultado["message"]
+    primeiro, copia = resultado["detalhes"]["arquivos"]
+    assert (primeiro["registros_processados"], primeiro["registros_duplicados"]) == (200, 0)
+    assert (copia["registros_processados"], copia["registros_duplicados"]) == (0, 200)
+    assert copia["arquivo_repetido"]
+
+
+def test_arquivo_com_linha_recusada_nao_entra_no_cache(tmp_path):
+    caminho = tmp_path / "e1.csv"
+    _escrever_csv(caminho, 50, semente=5, extras=[["2024-13-01"] + ["x"] * (len(ESQUEMA.nomes) - 1)])
+    ingestao = IngestaoParalela(processos=1, escritores=1)
+    for _ in range(2):
+        resultado = ingestao.ingerir(ESQUEMA, [("e1.csv", str(caminho))])
+        assert resultado["success"], resultado["message"]
+        assert resultado["detalhes"]["registros_com_erro"] == 1
+        assert "arquivo_repetido" not in resultado["detalhes"]["arquivos"][0]
+    assert not csv_service._arquivos_ingeridos
@@ -0,0 +1,36 @@
+"""Modo protegido do execute_query: só um SELECT passa, e ; em literais ou comentários não conta."""
+import pytest
+
+from db.neon_db import ConsultaBloqueadaError, _sql_protegida
+
+
+@pytest.mark.parametrize("sql, esperado", [
+    ("SELECT 1;", "SELECT 1"),
+    ("SELECT 1 ;; ", "SELECT 1"),
+    ("SELECT 'a;b' AS x", "SELECT 'a;b' AS x"),
+    ("SELECT 'it''s;' ;", "SELECT 'it''s;'"),
+    ("SELECT E'\\';'", "SELECT E'\\';'"),
+    ("SELECT $$;$$, $t$ a;$ $t$", "SELECT $$;$$, $t$ a;$ $t$"),
+    ('SELECT 1 AS "a;b"', 'SELECT 1 AS "a;b"'),
+    ("SELECT 1 -- fim; x", "SELECT 1"),
+    ("SELECT 1 /* ; */", "SELECT 1"),
+    ("-- comentário\nSELECT 1", "-- comentário\nSELECT 1"),
+    ("WITH a AS (SELECT 1) SELECT * FROM a", "WITH a AS (SELECT 1) SELECT * FROM a"),
+])
+def test_aceita_um_select(sql, esperado):
+    assert _sql_protegida(sql, 10) == f"SELECT * FROM ({esperado}\n) AS consulta_limitada LIMIT 11"
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM usuario",
+    "SELECT 1; DELETE FROM usuario",
+    "SELECT 'a'; DROP TABLE estoque",
+    "SELECT '\\'; DELETE FROM usuario; --'",
+    "SELECT 1 /* */; UPDATE usuario SET admin = true",
+    "SELECT $a$ x $a$; DELETE FROM usuario",
+    "/* SELECT */ DELETE FROM usuario",
+])
+def test_recusa_outros_comandos(sql):
+    with pytest.raises(ConsultaBloqueadaError) as erro:
+        _sql_protegida(sql, 10)
+    assert erro.value.motivo == "somente_leitura"
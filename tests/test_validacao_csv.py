@@ -0,0 +1,161 @@
+"""Paridade da validação colunar (ValidadorLote) com os modelos Pydantic linha a linha.
+
+CSVs sintéticos com valores de borda em todos os campos (datas fora do padrão,
+números com espaço/sinal/expoente, UF curta/minúscula, campos ausentes, linhas
+vazias ou com colunas a mais) precisam ter exatamente as mesmas linhas aceitas,
+com os mesmos valores, e as mesmas recusadas nos dois caminhos: CSV
+(`validar`) e lotes Arrow (`validar_arrow`, com colunas de texto ou tipadas, lidas
+de arquivos Parquet e Arrow IPC).
+"""
+import csv
+import io
+import random
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from db.hash_linha import COLUNAS_HASH
+from db.seed import gerar_linhas
+from services.csv_service import ler_lotes
+from services.esquemas_ingestao import ESQUEMAS
+from services.formatos_upload import ler_lotes_arrow
+from services.validacao_csv import ValidadorLote
+
+_BORDAS = {
+    "data": ["2024-1-5", "2024-02-30", "2024-13-01", " 2024-01-10", "2024-01-10 ", "20240110",
+             "", "2024-01-1", "2024-01-10T00:00", "10/01/2024", "0001-01-01"],
+    int: ["+5", " 366", "1_000", "1.0", "-3", "", "abc", "99999999999999999999", "٣", "0x10"],
+    float: ["-0.0", "-1", "nan", "inf", "-inf", "1e3", "", "x", " 2.5 ", "1_0.5", "-1e-9", ".5"],
+    str: ["", "  com espaços  ", "ção", "a|b"],
+    "zs_uf": ["pr", "P", "PRR", "", " pr ", "ß", "p r"],
+}
+
+# conversão de cada campo no CsvService antes da validação colunar
+_CONVERSOES = {
+    date: lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+    int: int,
+    float: float,
+    str: lambda v: v.strip(),
+}
+_TIPOS_ARROW = {date: pa.date32(), int: pa.int64(), float: pa.float64(), str: pa.string()}
+
+
+def validar_linha(esquema, linha: dict) -> tuple:
+    """Referência: converte os campos da linha do DictReader e valida com o modelo Pydantic do esquema"""
+    registro = esquema.modelo(**{c.nome: _CONVERSOES[c.tipo](linha[c.nome]) for c in esquema.colunas})
+    return tuple(getattr(registro, c.nome) for c in esquema.colunas)
+
+
+def _csv_com_bordas(tabela: str, linhas: int, semente: int) -> str:
+    """CSV limpo com valores de borda em parte das linhas, além de linhas curtas, longas e vazias"""
+    esquema = ESQUEMAS[tabela]
+    rng = random.Random(semente)
+    # o seed gera na ordem de COLUNAS_HASH; o arquivo segue a ordem do descritor
+    posicoes = [COLUNAS_HASH[tabela].index(destino) for destino in esquema.destinos]
+    saida = io.StringIO()
+    writer = csv.writer(saida, delimiter="|", lineterminator="\n")
+    writer.writerow(esquema.nomes)
+    for valores in gerar_linhas(tabela, linhas, 365, rng):
+        linha = [str(valores[p]) for p in posicoes]
+        sorteio = rng.random()
+        if sorteio < 0.03:
+            writer.writerow(linha[: rng.randrange(len(linha))])  # colunas faltando
+            continue
+        if sorteio < 0.05:
+            writer.writerow(linha + ["extra"])
+            continue
+        if sorteio < 0.06:
+            saida.write("\n")  # linha vazia: não conta na numeração
+        for _ in range(rng.choice([0, 1, 1, 2])):
+            i = rng.randrange(len(esquema.colunas))
+            coluna = esquema.colunas[i]
+            linha[i] = rng.choice(_BORDAS[coluna.nome if coluna.nome in ("data", "zs_uf") else coluna.tipo])
+        writer.writerow(linha)
+    return saida.getvalue()
+
+
+def _por_linha(esquema, csv_content: str) -> tuple[dict, set]:
+    aceitas, recusadas = {}, set()
+    for linha_num, linha in enumerate(csv.DictReader(io.StringIO(csv_content), delimiter="|"), start=2):
+        try:
+            aceitas[linha_num] = validar_linha(esquema, linha)
+        except Exception:
+            recusadas.add(linha_num)
+    return aceitas, recusadas
+
+
+def _juntar(resultados) -> tuple[dict, set]:
+    aceitas, recusadas = {}, set()
+    for ok, erros in resultados:
+        aceitas.update(ok)
+        recusadas.update(n for n, _ in erros)
+    return aceitas, recusadas
+
+
+def _conferir(referencia: tuple[dict, set], obtido: tuple[dict, set]) -> None:
+    (ref_ok, ref_erro), (ok, erro) = referencia, obtido
+    assert erro == ref_erro
+    # repr para comparar NaN com NaN e distinguir 1 de 1.0
+    assert {n: repr(v) for n, v in ok.items()} == {n: repr(v) for n, v in ref_ok.items()}
+
+
+@pytest.fixture(scope="module", params=sorted(ESQUEMAS))
+def caso(request):
+    esquema = ESQUEMAS[request.param]
+    csv_content = _csv_com_bordas(esquema.tabela, 3000, semente=42)
+    referencia = _por_linha(esquema, csv_content)
+    # o sorteio precisa produzir os dois desfechos
+    assert referencia[0] and referencia[1]
+    return esquema, csv_content, referencia
+
+
+@pytest.mark.parametrize("lote", [1000, 37])
+def test_csv_aceita_e_recusa_as_mesmas_linhas(caso, lote):
+    esquema, csv_content, referencia = caso
+    cabecalho, lotes = ler_lotes(io.StringIO(csv_content), lote)
+    validador = ValidadorLote(esquema, cabecalho)
+    _conferir(referencia, _juntar(validador.validar(linhas, numeros) for linhas, numeros in lotes))
+
+
+def test_arrow_com_colunas_de_texto(caso):
+    esquema, csv_content, referencia = caso
+    cabecalho, *linhas = filter(None, csv.reader(io.StringIO(csv_content), delimiter="|"))
+    # linhas curtas viram nulos; a coluna a mais fica de fora do lote
+    colunas = [pa.array([l[i] if i < len(l) else None for l in linhas], pa.string()) for i in range(len(cabecalho))]
+    lote = pa.RecordBatch.from_arrays(colunas, names=cabecalho)
+    validador = ValidadorLote(esquema, cabecalho)
+    _conferir(referencia, _juntar([validador.validar_arrow(lote, range(2, 2 + len(linhas)))]))
+
+
+def _serializar(tabela: pa.Table, formato: str) -> bytes:
+    buffer = io.BytesIO()
+    if formato == "parquet":
+        pq.write_table(tabela, buffer, row_group_size=700)
+    else:
+        with pa.ipc.new_file(buffer, tabela.schema) as escritor:
+            escritor.write_table(tabela, max_chunksize=700)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("formato", ["parquet", "arrow"])
+def test_arquivo_com_colunas_tipadas(caso, formato):
+    esquema, _, (ref_ok, _) = caso
+    # inteiros fora do int64 (ex.: 99999999999999999999) não existem numa coluna tipada
+    numeros = sorted(n for n, v in ref_ok.items() if all(abs(x) < 2 ** 63 for x in v if type(x) is int))
+    # as linhas aceitas como colunas já tipadas, com um estoque/peso negativo para a regra recusar
+    regra = next(i for i, c in enumerate(esquema.colunas) if c.tipo is float and c.regra)
+    valores = [list(col) for col in zip(*(ref_ok[n] for n in numeros))]
+    valores[regra][0] = -1.0
+    tabela = pa.table({c.nome.lower(): pa.array(v, _TIPOS_ARROW[c.tipo]) for c, v in zip(esquema.colunas, valores)})
+
+    # mesmo caminho do CsvService: lotes lidos do arquivo e validador montado com as colunas do primeiro
+    validador, inicio, resultados = None, 0, []
+    for lote in ler_lotes_arrow(io.BytesIO(_serializar(tabela, formato)), formato, 500):
+        validador = validador or ValidadorLote(esquema, lote.schema.names, ignorar_caixa=True)
+        resultados.append(validador.validar_arrow(lote, numeros[inicio:inicio + lote.num_rows]))
+        inicio += lote.num_rows
+    ok, erro = _juntar(resultados)
+    assert erro == set(numeros[:1])
+    assert {n: repr(v) for n, v in ok.items()} == {n: repr(ref_ok[n]) for n in numeros[1:]}